@@ -0,0 +1,6 @@
+"""
+Benchmarks for the SlytherLisp interpreter. Each module is runnable on its
+own, for example::
+
+    python -m benchmarks.memory
+"""
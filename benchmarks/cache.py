@@ -0,0 +1,51 @@
+"""
+Compare running a library file from source (lexing and parsing it) and
+from its ``.slyc`` cache.
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.lexer import generate
+from benchmarks.timing import best_of
+from slyther.cache import read_cache, write_cache
+from slyther.parser import lex, parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=1024 * 1024,
+                        help='size of the generated source in bytes')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    source = generate(args.size).encode('utf-8')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'lib.scm')
+        with open(path, 'wb') as f:
+            f.write(source)
+        forms = list(parse(lex(source.decode('utf-8'))))
+        write_cache(path, source, forms)
+        cache_size = os.path.getsize(
+            os.path.join(tmp, '__slycache__', 'lib.scm.slyc'))
+
+        def from_source():
+            with open(path, 'rb') as f:
+                list(parse(lex(f.read().decode('utf-8'))))
+
+        def from_cache():
+            with open(path, 'rb') as f:
+                assert read_cache(path, f.read()) is not None
+
+        parse_time = best_of(args.repeat, from_source)
+        cache_time = best_of(args.repeat, from_cache)
+
+    print('{} forms, {} bytes of source, {} bytes of cache'.format(
+        len(forms), len(source), cache_size))
+    print('parse {:9.3f}s'.format(parse_time))
+    print('cache {:9.3f}s ({:.1f}x)'.format(
+        cache_time, parse_time / cache_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Time comparing and hashing long and deeply nested lists.
+
+Each row compares two lists built separately (so not the same object), or
+hashes one. Once a list is hashed its hash is recorded (and the list locked
+against changes), so hashing it again is O(1), and comparing lists whose
+recorded hashes differ returns at once.
+Deeply nested lists are compared without recursion, so they do not
+overflow the stack.
+"""
+import argparse
+
+from slyther.types import ConsList, NIL
+
+from benchmarks.timing import best_of
+
+
+def nested(depth, leaf):
+    result = ConsList(leaf)
+    for _ in range(depth):
+        result = ConsList(result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--length', type=int, default=10 ** 6,
+                        help='elements in the long lists')
+    parser.add_argument('--depth', type=int, default=10 ** 5,
+                        help='nesting of the deep lists')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    n = args.length
+    equal = ConsList.from_iterable(range(n))
+    other = ConsList.from_iterable(range(n))
+    last = ConsList.from_iterable(list(range(n - 1)) + [-1])
+    first = ConsList.from_iterable([-1] + list(range(1, n)))
+    deep, other_deep = nested(args.depth, 1), nested(args.depth, 1)
+
+    rows = [
+        ('equal', lambda: equal == other),
+        ('differ last', lambda: equal == last),
+        ('differ first', lambda: equal == first),
+    ]
+    for name, run in rows:
+        print('{:<16} {:>9.4f}s'.format(name, best_of(args.repeat, run)))
+    # a list can only be hashed afresh once, so time that just once
+    rows = [
+        ('hash', lambda: hash(equal)),
+        ('hash again', lambda: hash(equal)),
+    ]
+    for name, run in rows:
+        print('{:<16} {:>9.4f}s'.format(name, best_of(1, run)))
+    hash(last)
+    print('{:<16} {:>9.4f}s'.format(
+        'differ, hashed', best_of(args.repeat, lambda: equal == last)))
+    print('{:<16} {:>9.4f}s'.format(
+        'deep equal', best_of(args.repeat, lambda: deep == other_deep)))
+    assert equal == other and equal != last and deep == other_deep
+    assert nested(args.depth, 2) != deep and equal != NIL
+
+
+if __name__ == '__main__':
+    main()
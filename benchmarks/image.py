@@ -0,0 +1,56 @@
+"""
+Compare starting an interpreter cold (constructing it and loading a
+prelude) with starting it from an image of the same prelude.
+"""
+import argparse
+import os
+import tempfile
+
+from slyther.interpreter import Interpreter
+
+from benchmarks.timing import best_of
+
+definitions = [
+    '(define (f{0} x) (if (< x {0}) (+ x {0}) (* x 2)))',
+    '(define (g{0} a b) (let ((c (+ a b))) (list a b c {0})))',
+    "(define d{0} '(item {0} \"name {0}\" {0}.5))",
+    '(define (h{0} n) (cond ((= n 0) {0}) (#t (h{0} (- n 1)))))',
+]
+
+
+def prelude(count):
+    return '\n'.join(definitions[i % len(definitions)].format(i)
+                     for i in range(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--definitions', type=int, default=4000,
+                        help='number of definitions in the prelude')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    code = prelude(args.definitions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'prelude.img')
+        print('{:<10} {:>10} {:>10} {:>8}'.format(
+            'engine', 'cold', 'image', 'speedup'))
+        for engine in Interpreter.engines:
+            def cold():
+                Interpreter(engine).exec(code)
+
+            def warm():
+                Interpreter.from_image(path)
+
+            interp = Interpreter(engine)
+            interp.exec(code)
+            interp.save_image(path)
+            cold_time = best_of(args.repeat, cold)
+            image_time = best_of(args.repeat, warm)
+            print('{:<10} {:>9.3f}s {:>9.3f}s {:>7.1f}x'.format(
+                engine, cold_time, image_time, cold_time / image_time))
+        print('image size: {} bytes'.format(os.path.getsize(path)))
+
+
+if __name__ == '__main__':
+    main()
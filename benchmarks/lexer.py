@@ -0,0 +1,53 @@
+"""
+Measure the throughput of ``slyther.parser.lex`` in tokens per second, on a
+generated source file of several megabytes.
+"""
+import argparse
+import random
+import time
+
+from slyther.parser import lex
+
+snippets = [
+    '(define (fib n)\n  (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))\n',
+    "(print \"hello, \\\"world\\\"\\n\" 'quoted-symbol -12 3.25)\n",
+    '; a comment line (with parens) "and a string"\n',
+    "(let ((x 10) (y -2.5e)) (list x y '(1 2 3) .5 -7.))\n",
+    '(map (lambda (λ) (* λ λ)) (list 1 2 3 4 5 6 7 8 9 10))\n',
+    '#(1 2 3) (vector-ref v 0)\n',
+]
+
+
+def generate(size, seed=0):
+    """
+    Return a source string of at least ``size`` characters.
+    """
+    rng = random.Random(seed)
+    chunks = []
+    total = 0
+    while total < size:
+        chunk = rng.choice(snippets)
+        chunks.append(chunk)
+        total += len(chunk)
+    return ''.join(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=4 * 1024 * 1024,
+                        help='size of the generated source in bytes')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    code = generate(args.size)
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in lex(code))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print('{} chars, {} tokens, {:.3f} s, {:,.0f} tokens/s'.format(
+        len(code), count, best, count / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Compare lexing, parsing and evaluating with source locations turned off
+(the default) and on. Turned off, the figures should match those from
+before locations existed.
+"""
+import argparse
+
+from benchmarks.lexer import generate
+from benchmarks.timing import best_of
+from slyther.interpreter import Interpreter
+from slyther.locations import SourceMap
+from slyther.parser import lex, parse
+
+program = '''
+(define (fib n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))
+(fib 18)
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=1024 * 1024,
+                        help='size of the generated source in bytes')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    code = generate(args.size)
+
+    def parse_off():
+        for _ in parse(lex(code)):
+            pass
+
+    def parse_on():
+        srcmap = SourceMap()
+        for _ in parse(lex(code, srcmap=srcmap), srcmap):
+            pass
+
+    def run(locations):
+        interp = Interpreter(locations=locations)
+        return lambda: interp.exec(program)
+
+    print('{:<12} {:>10} {:>10}'.format('', 'off', 'on'))
+    for name, off, on in (('lex+parse', parse_off, parse_on),
+                          ('fib 18', run(False), run(True))):
+        print('{:<12} {:>9.3f}s {:>9.3f}s'.format(
+            name, best_of(args.repeat, off), best_of(args.repeat, on)))
+
+
+if __name__ == '__main__':
+    main()
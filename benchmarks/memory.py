@@ -0,0 +1,66 @@
+"""
+Measure the memory used by the cons cells of a large list.
+
+The "before" figures use subclasses which add back an instance
+``__dict__``, giving the layout the AST types had prior to declaring
+``__slots__``; the "after" figures use the types as they are.
+"""
+import argparse
+import tracemalloc
+
+from slyther.types import ConsList, Quoted, Symbol, NIL
+
+
+class DictConsList(ConsList):
+    """A ``ConsList`` with an instance ``__dict__``."""
+    __slots__ = ('__dict__', )
+
+
+class DictQuoted(Quoted):
+    """A ``Quoted`` with an instance ``__dict__``."""
+    __slots__ = ('__dict__', )
+
+
+def build_list(cls, n):
+    result = NIL
+    for i in range(n):
+        result = cls(i, result)
+    return result
+
+
+def build_quoted(cls, n):
+    return [cls(Symbol('x')) for _ in range(n)]
+
+
+def measure(build, cls, n):
+    """
+    Return the bytes allocated per element by ``build(cls, n)``.
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = build(cls, n)
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return (after - before) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', type=int, default=100000,
+                        help='number of elements to allocate')
+    args = parser.parse_args()
+    rows = [
+        ('ConsList', build_list, DictConsList, ConsList),
+        ('Quoted', build_quoted, DictQuoted, Quoted),
+    ]
+    print('{:<10} {:>12} {:>12}'.format('type', 'before', 'after'))
+    for name, build, old, new in rows:
+        print('{:<10} {:>10.1f} B {:>10.1f} B'.format(
+            name, measure(build, old, args.n), measure(build, new, args.n)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure ``slyther.parser.parse`` on deeply nested and very wide
+expressions. The tokens are generated up front, so only the parser is
+timed, and like ``timeit`` the garbage collector is disabled meanwhile.
+"""
+import argparse
+import gc
+import time
+
+from slyther.parser import parse, LParen, RParen, Quote
+from slyther.types import Symbol
+
+
+def deep(depth):
+    """
+    Tokens for ``(f '(f '(f ... x)))``, nested ``depth`` levels.
+    """
+    lp, rp, q, f = LParen(), RParen(), Quote(), Symbol('f')
+    return [lp, f, q] * depth + [Symbol('x')] + [rp] * depth
+
+
+def wide(width):
+    """
+    Tokens for ``(list 0 1 2 ...)`` with ``width`` elements.
+    """
+    return [LParen(), Symbol('list')] + list(range(width)) + [RParen()]
+
+
+def measure(tokens, repeat):
+    best = None
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in parse(iter(tokens)):
+                pass
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        gc.enable()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--depth', type=int, default=10000)
+    parser.add_argument('--width', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    print('{:<8} {:>10} {:>10} {:>14}'.format(
+        'shape', 'tokens', 'seconds', 'tokens/s'))
+    for name, build, n in (('deep', deep, args.depth // 2),
+                           ('deep', deep, args.depth),
+                           ('wide', wide, args.width // 2),
+                           ('wide', wide, args.width)):
+        tokens = build(n)
+        elapsed = measure(tokens, args.repeat)
+        print('{:<8} {:>10} {:>10.3f} {:>14,.0f}'.format(
+            name, len(tokens), elapsed, len(tokens) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Time a loop which evaluates a long quoted list on each iteration, on each
+engine.
+
+The value of a quoted list is made the first time it is evaluated and
+shared after, so each iteration should cost the same whatever the length
+of the list. For comparison, the last row makes the list again each time,
+as evaluating it did before.
+"""
+import argparse
+
+from slyther.evaluator import unquote
+from slyther.interpreter import Interpreter
+from slyther.parser import lisp
+
+from benchmarks.timing import best_of
+
+setup = '''
+(define (walk n acc)
+  (if (= n 0) acc (walk (- n 1) (car (cdr '({items}))))))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--length', type=int, default=1000,
+                        help='elements in the quoted list')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    items = ' '.join(str(i) for i in range(args.length))
+
+    expr = '(walk {} 0)'.format(args.iterations)
+    for engine in Interpreter.engines:
+        interp = Interpreter(engine)
+        interp.exec(setup.format(items=items))
+        elapsed = best_of(args.repeat, lambda: interp.exec(expr))
+        print('{:<10} {:>9.4f}s {:>9.2f}us per iteration'.format(
+            engine, elapsed, elapsed / args.iterations * 1e6))
+
+    quoted = lisp("'({})".format(items)).elem
+
+    def rebuild():
+        for _ in range(args.iterations):
+            unquote(quoted)
+    elapsed = best_of(args.repeat, rebuild)
+    print('{:<10} {:>9.4f}s {:>9.2f}us per iteration'.format(
+        'rebuilt', elapsed, elapsed / args.iterations * 1e6))
+
+
+if __name__ == '__main__':
+    main()
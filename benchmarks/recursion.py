@@ -0,0 +1,65 @@
+"""
+Compare the engines on programs which recurse without tail calls, and show
+how deep the bytecode engine can go.
+
+The shallow programs stay within Python's recursion limit so every engine
+can run them. The deep one recurses far past it, which only the bytecode
+engine (keeping its frames on a list rather than Python's stack) can do.
+"""
+import argparse
+import sys
+
+from slyther.interpreter import Interpreter
+
+from benchmarks.timing import best_of
+
+setup = '''
+(define (fib n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))
+(define (build n) (if (= n 0) NIL (cons n (build (- n 1)))))
+(define (sum l) (if (nil? l) 0 (+ (car l) (sum (cdr l)))))
+(define (repeat k acc)
+  (if (= k 0) acc (repeat (- k 1) (+ acc (sum (build 100))))))
+'''
+
+shallow = {
+    'fib': '(fib {fib})',
+    'build+sum': '(repeat {repeat} 0)',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--fib', type=int, default=18)
+    parser.add_argument('--repeat-lists', dest='lists', type=int,
+                        default=40, help='lists of 100 to build and sum')
+    parser.add_argument('--depth', type=int, default=100000,
+                        help='length of the list for the deep program')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    params = {'fib': args.fib, 'repeat': args.lists}
+
+    print('{:<10} {:>12} {:>12}'.format('engine', *shallow))
+    for engine in Interpreter.engines:
+        interp = Interpreter(engine)
+        interp.exec(setup)
+        times = []
+        for code in shallow.values():
+            expr = code.format(**params)
+            try:
+                times.append('{:>11.3f}s'.format(
+                    best_of(args.repeat, lambda: interp.exec(expr))))
+            except RecursionError:
+                times.append('{:>12}'.format('too deep'))
+        print('{:<10} {} {}'.format(engine, *times))
+
+    interp = Interpreter('bytecode', max_depth=None)
+    interp.exec(setup)
+    expr = '(sum (build {}))'.format(args.depth)
+    elapsed = best_of(args.repeat, lambda: interp.exec(expr))
+    print('bytecode: a list of {} built and summed in {:.3f}s '
+          '(Python recursion limit: {})'.format(
+              args.depth, elapsed, sys.getrecursionlimit()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure how long ``slyther file.scm`` takes to start, using Python's
+``-X importtime`` to see which imports the time goes to.
+
+Exits with a non-zero status if imports take longer than ``--budget``
+milliseconds in total, or anything only needed interactively (such as
+``prompt_toolkit``) is imported.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import slyther
+
+# Running a file should spend no longer than this importing modules, in
+# milliseconds. It is generous, to allow for slow test machines; on a
+# typical machine it takes around 40ms.
+BUDGET = 150
+
+# Modules which running a file should never import.
+HEAVY = ('prompt_toolkit', 'matplotlib', 'slyther.repl', 'pickle')
+
+
+def run(args):
+    """
+    Run the ``slyther`` command with ``args`` under ``-X importtime``.
+    Return a dictionary of each module imported to its ``(self,
+    cumulative)`` import time, and the total time spent importing once
+    Python itself had started, both in microseconds.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(slyther.__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [root, env.get('PYTHONPATH')]))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'from slyther.__main__ import main; main()'] + list(args),
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    times = {}
+    total = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        times[name.strip()] = (int(own), int(cumulative))
+        # top level imports are indented by a single space; those up to
+        # and including site are Python's own startup
+        if name == ' site':
+            total = 0
+        elif total is not None and not name.startswith('  '):
+            total += int(cumulative)
+    return times, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--top', type=int, default=10,
+                        help='number of slowest imports to list')
+    parser.add_argument('--budget', type=float, default=BUDGET,
+                        help='milliseconds allowed for imports')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'hello.scm')
+        with open(path, 'w') as f:
+            f.write('(define x (+ 1 2))\n')
+        walls = []
+        imports = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            times, total = run([path])
+            walls.append(time.perf_counter() - start)
+            imports.append(total / 1000)
+
+    print('process:         {:7.1f}ms (median of {})'.format(
+        statistics.median(walls) * 1000, args.repeat))
+    print('imports:         {:7.1f}ms (budget {:.0f}ms)'.format(
+        statistics.median(imports), args.budget))
+    print('slowest imports (self time):')
+    for name, (own, _) in sorted(times.items(),
+                                 key=lambda item: -item[1][0])[:args.top]:
+        print('  {:>7.1f}ms  {}'.format(own / 1000, name))
+    heavy = [name for name in times if name.split('.')[0] in HEAVY
+             or name in HEAVY]
+    if heavy:
+        print('heavy modules imported:', ', '.join(heavy))
+    if heavy or statistics.median(imports) > args.budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
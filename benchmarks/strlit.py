@@ -0,0 +1,56 @@
+"""
+Measure ``slyther.parser.parse_strlit`` on long string literals with
+scattered escapes, at doubling sizes, to show the time grows linearly.
+"""
+import argparse
+import random
+import time
+
+from slyther.parser import parse_strlit
+
+escapes = [r'\n', r'\t', r'\"', r'\\', r'\x41', r'\077', r'\e', r'\q']
+
+
+def generate(size, every, seed=0):
+    """
+    Return a string literal of about ``size`` characters, with an escape
+    sequence roughly every ``every`` characters (never if ``every`` is 0).
+    """
+    rng = random.Random(seed)
+    chunks = ['"']
+    total = 0
+    while total < size:
+        n = rng.randint(1, 2 * every) if every else size
+        chunks.append('a' * n)
+        if every:
+            chunks.append(rng.choice(escapes))
+        total += n
+    chunks.append('"')
+    return ''.join(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=1024 * 1024,
+                        help='size of the smallest literal in bytes')
+    parser.add_argument('--steps', type=int, default=4,
+                        help='number of times to double the size')
+    parser.add_argument('--every', type=int, default=64,
+                        help='average distance between escapes')
+    args = parser.parse_args()
+    print('{:>10} {:>8} {:>10} {:>12}'.format(
+        'size', 'escapes', 'seconds', 'MB/s'))
+    for step in range(args.steps):
+        size = args.size << step
+        for every in (args.every, 0):
+            tok = generate(size, every)
+            start = time.perf_counter()
+            parse_strlit(tok)
+            elapsed = time.perf_counter() - start
+            print('{:>10} {:>8} {:>10.4f} {:>12.1f}'.format(
+                len(tok), 'yes' if every else 'no', elapsed,
+                len(tok) / elapsed / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+"""
+Run a fixed set of benchmarks, optionally saving the results as JSON and
+comparing them with a baseline saved earlier.
+
+The suite runs bounded variants of the programs in ``examples/`` (which
+otherwise loop forever) on each engine, checking that each computes the
+right answer, along with micro-benchmarks of the lexer, parser, string
+literals, variable lookup, cons lists and builtin arithmetic. Nothing is
+downloaded: the inputs are generated with fixed seeds.
+
+To record a baseline, then compare with it later::
+
+    python -m benchmarks.suite --json baseline.json
+    python -m benchmarks.suite --baseline baseline.json --threshold 0.2
+
+With ``--baseline``, the exit status is 1 if any benchmark took more than
+``1 + threshold`` times as long as in the baseline. Timings are only
+comparable on the same machine (and Python), which is saved along with
+them.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections import namedtuple
+
+import slyther
+from slyther.interpreter import Interpreter
+from slyther.parser import lex, parse, parse_strlit
+from slyther.types import ConsList, LexicalVarStorage, Variable
+import slyther.builtins
+
+from benchmarks import lexer, strlit
+
+EXAMPLES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+Program = namedtuple('Program', ['name', 'example', 'defines', 'setup',
+                                 'driver', 'size', 'expected'])
+Program.__doc__ = """
+A bounded variant of ``example``: the functions named in ``defines`` are
+taken from it, then ``setup`` is run once and ``driver`` is timed. Each is
+formatted with ``n``, which is ``size`` scaled, and the driver should return
+``expected(n)``.
+"""
+
+
+def _fib(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+
+def _is_prime(n):
+    return n >= 2 and all(n % d for d in range(2, int(n ** 0.5) + 1))
+
+
+def _carmichaels(stop):
+    return sum(1 for x in range(5, stop + 1, 2)
+               if not _is_prime(x)
+               and all(pow(b, x, x) == b % x for b in range(2, x + 1)))
+
+
+def _gcds(stop):
+    from math import gcd
+    return sum(gcd(a, b) for b in range(1, stop + 1)
+               for a in range(1, b + 1))
+
+
+def _lehmer(n):
+    seed = 1
+    for _ in range(n):
+        seed = 16807 * seed % 2147483647
+    return seed
+
+
+def _frequencies(n):
+    data = [(i * 7919) % 50 for i in range(n)]
+    return [[t, data.count(t)] for t in range(0, 60, 3)]
+
+
+programs = [
+    Program('fib-recursive', 'fib-recursive.scm', ['fib'], '',
+            '(fib {n})', 17, _fib),
+    Program('fib-iter', 'fib-iter.scm', [],
+            '(define (fibs a b n) (if (= n 0) a (fibs b (+ a b) (- n 1))))',
+            '(fibs 0 1 {n})', 5000, _fib),
+    Program('carmichael', 'carmichael.scm',
+            ['divides?', 'isqrt', 'prime?', 'congruent', 'fermat-prime?'],
+            '''(define (count-carmichaels x acc)
+                 (if (> x {n})
+                     acc
+                     (count-carmichaels
+                       (+ 2 x)
+                       (if (and (fermat-prime? x) (not (prime? x)))
+                           (+ 1 acc)
+                           acc))))''',
+            '(count-carmichaels 5 0)', 600, _carmichaels),
+    Program('is-prime', 'is-prime.scm', ['divides?', 'isqrt', 'prime?'],
+            '''(define (count-primes x acc)
+                 (if (> x {n})
+                     acc
+                     (count-primes (+ 2 x)
+                                   (if (prime? x) (+ 1 acc) acc))))''',
+            '(count-primes 3 1)', 2500,
+            lambda n: sum(1 for x in range(n + 1) if _is_prime(x))),
+    Program('gcd', 'gcd.scm', ['gcd'],
+            '''(define (gcd-row a b acc)
+                 (if (> a b) acc (gcd-row (+ 1 a) b (+ acc (gcd a b)))))
+               (define (gcd-table b acc)
+                 (if (> b {n})
+                     acc
+                     (gcd-table (+ 1 b) (gcd-row 1 b acc))))''',
+            '(gcd-table 1 0)', 80, _gcds),
+    Program('prng', 'prng.scm', ['prng'],
+            '''(define (drain f n last)
+                 (if (= n 0) last (drain f (- n 1) (eval (cons f ())))))''',
+            '(drain (prng 1) {n} 0)', 3000, _lehmer),
+    Program('list_freq', 'list_freq.scm', [],
+            lambda n: "(define data '({}))".format(' '.join(
+                str((i * 7919) % 50) for i in range(n))),
+            "(list-frequency data '({}))".format(
+                ' '.join(str(t) for t in range(0, 60, 3))),
+            100000, _frequencies),
+]
+
+
+def example_definitions(interp, example, names):
+    """
+    Run the definitions of the functions ``names`` from ``example``.
+    """
+    with open(os.path.join(EXAMPLES, example), encoding='utf-8') as f:
+        source = f.read()
+    found = set()
+    for form in interp.parse(source):
+        if (isinstance(form, ConsList) and form.car == 'define'
+                and isinstance(form.cdr.car, ConsList)
+                and form.cdr.car.car in names):
+            interp.eval(form)
+            found.add(form.cdr.car.car)
+    missing = set(names) - found
+    if missing:
+        raise LookupError("{} does not define {}".format(
+            example, ', '.join(sorted(missing))))
+
+
+def program_benchmark(program, engine, scale):
+    """
+    Return a function running ``program`` on a new interpreter using
+    ``engine``, after checking it computes the right answer.
+    """
+    n = max(1, round(program.size * scale))
+    interp = Interpreter(engine)
+    example_definitions(interp, program.example, program.defines)
+    setup = program.setup
+    setup = setup(n) if callable(setup) else setup.format(n=n)
+    interp.exec(setup)
+    driver = list(interp.parse(program.driver.format(n=n)))
+
+    def run():
+        for form in driver:
+            result = interp.eval(form)
+        return result
+    result = run()
+    if isinstance(result, ConsList):
+        result = [list(item) for item in result]
+    if result != program.expected(n):
+        raise AssertionError("{} on {} returned {!r}, expected {!r}".format(
+            program.name, engine, result, program.expected(n)))
+    return run
+
+
+# the names of the micro-benchmarks, known without setting them up
+micro_names = ('lex', 'parse', 'parse_strlit', 'storage-lookup',
+               'conslist-ops', 'builtin-arithmetic')
+
+
+def micro_benchmarks(scale):
+    """
+    Return a dictionary of name to function for each micro-benchmark.
+    """
+    size = max(1, round(scale * 256 * 1024))
+    source = lexer.generate(size)
+    # the lexer's snippets include some which do not parse
+    parsable = '\n'.join(
+        '(define (f{0} x) (if (< x {0}) (list x "s{0}" \'(a b)) 2.5))'
+        .format(i) for i in range(size // 64))
+    literal = strlit.generate(size, 64)
+
+    global_names = ['g{}'.format(i) for i in range(200)]
+    stg = LexicalVarStorage({name: Variable(i)
+                             for i, name in enumerate(global_names)})
+    for depth in range(5):
+        stg.put('local{}'.format(depth), depth)
+        stg = LexicalVarStorage(stg.fork())
+    lookups = global_names[::10] * max(1, size // 512)
+
+    elements = list(range(max(1, size // 4)))
+    lst = ConsList.from_iterable(elements)
+    add, sub, mul, div = (slyther.builtins.table[name]
+                          for name in ('+', '-', '*', '/'))
+    operands = [(i, i % 7 + 1) for i in range(max(1, size // 8))]
+
+    def storage_lookup():
+        for name in lookups:
+            stg[name].value
+
+    def conslist_ops():
+        built = ConsList.from_iterable(elements)
+        total = 0
+        for x in built:
+            total += x
+        consed = ConsList(-1, built)
+        return total, len(lst), lst[len(lst) // 2], consed.cdr is built
+
+    def builtin_arithmetic():
+        for a, b in operands:
+            div(mul(add(a, b, 1), sub(a, b)), b)
+
+    return {
+        'lex': lambda: sum(1 for _ in lex(source)),
+        'parse': lambda: sum(1 for _ in parse(lex(parsable))),
+        'parse_strlit': lambda: parse_strlit(literal),
+        'storage-lookup': storage_lookup,
+        'conslist-ops': conslist_ops,
+        'builtin-arithmetic': builtin_arithmetic,
+    }
+
+
+def selected(name, only):
+    """
+    Return whether the benchmark ``name`` contains one of ``only`` (every
+    benchmark does if ``only`` is empty).
+    """
+    return not only or any(part in name for part in only)
+
+
+def benchmarks(engines, scale, only=None):
+    """
+    Yield the ``(name, function)`` of each benchmark (those whose name
+    contains one of ``only``, if given), setting each up just before it is
+    yielded. Those left out are never set up.
+    """
+    for program in programs:
+        for engine in engines:
+            name = '{}/{}'.format(program.name, engine)
+            if selected(name, only):
+                yield name, program_benchmark(program, engine, scale)
+    names = [name for name in micro_names if selected(name, only)]
+    if names:
+        micro = micro_benchmarks(scale)
+        for name in names:
+            yield name, micro[name]
+
+
+def measure(func, repeat):
+    """
+    Time ``func`` ``repeat`` times, returning the best and median times.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times),
+            'repeat': repeat}
+
+
+def run_suite(engines=Interpreter.engines, scale=1.0, repeat=5,
+              only=None, log=None):
+    """
+    Run the benchmarks (those whose name contains one of ``only``, if
+    given), returning a dictionary of their results along with where they
+    were run.
+    """
+    results = {}
+    for name, func in benchmarks(engines, scale, only):
+        results[name] = measure(func, repeat)
+        if log is not None:
+            print('{:<28} {:>10.4f}s'.format(name, results[name]['best']),
+                  file=log)
+    return {
+        'slyther': slyther.__version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'scale': scale,
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Compare the best times of ``current`` with ``baseline`` (both as
+    returned by ``run_suite``). Return a list of ``(name, baseline time,
+    current time, ratio, regressed)`` for each benchmark in both, where
+    ``regressed`` is whether the ratio exceeds ``1 + threshold``.
+    """
+    if current.get('scale') != baseline.get('scale'):
+        raise ValueError("the baseline was run with --scale {}".format(
+            baseline.get('scale')))
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = result['best'] / base['best']
+        rows.append((name, base['best'], result['best'], ratio,
+                     ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--engine', action='append',
+                        choices=Interpreter.engines,
+                        help='engine to run the programs on (default: all)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiply the size of every benchmark by this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', action='append',
+                        help='only run benchmarks whose name contains this')
+    parser.add_argument('--json', metavar='FILE',
+                        help='save the results to FILE (- for standard '
+                             'output)')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='compare the results with those saved in FILE')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='how much slower than the baseline (as a '
+                             'fraction) counts as a regression')
+    args = parser.parse_args()
+
+    log = sys.stderr if args.json == '-' else sys.stdout
+    results = run_suite(args.engine or Interpreter.engines, args.scale,
+                        args.repeat, args.only, log)
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    where = ('python', 'implementation', 'machine')
+    if any(baseline.get(key) != results[key] for key in where):
+        print('warning: the baseline was run on {}'.format(
+            ' '.join(str(baseline.get(key)) for key in where)), file=log)
+    rows = compare(results, baseline, args.threshold)
+    print('\n{:<28} {:>10} {:>10} {:>7}'.format(
+        'benchmark', 'baseline', 'current', 'ratio'), file=log)
+    for name, base, current, ratio, regressed in rows:
+        print('{:<28} {:>9.4f}s {:>9.4f}s {:>6.2f}x{}'.format(
+            name, base, current, ratio, '  REGRESSED' if regressed else ''),
+            file=log)
+    regressions = sum(1 for row in rows if row[-1])
+    print('{} of {} benchmarks regressed by more than {:.0%}'.format(
+        regressions, len(rows), args.threshold), file=log)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,18 @@
+"""
+Helpers shared by the benchmarks.
+"""
+import time
+
+
+def best_of(repeat, func):
+    """
+    Call ``func`` ``repeat`` times, returning the shortest time it took, in
+    seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -2,10 +2,44 @@ import os
 import sys
 import importlib
 import argparse
-import traceback
 from slyther.interpreter import Interpreter
 
 
+def profiling(run, profile, args):
+    """
+    Wrap ``run`` to run under ``profile``, reporting the results as asked
+    by ``args`` when it finishes (even if with an error).
+    """
+    def profiled_run(debug=False):
+        try:
+            with profile:
+                run(debug)
+        finally:
+            if args.profile:
+                profile.report()
+            if args.profile_pstats:
+                profile.write_pstats(args.profile_pstats)
+            if args.profile_collapsed:
+                profile.write_collapsed(args.profile_collapsed)
+    return profiled_run
+
+
+def counting(run, interp):
+    """
+    Wrap ``run`` to count the work done on the interpreter's hot paths,
+    printing the counts when it finishes (even if with an error).
+    """
+    def counted_run(debug=False):
+        import slyther.stats
+        try:
+            with slyther.stats.counting():
+                run(debug)
+        finally:
+            for name, count in interp.stats().items():
+                print('{:<17} {}'.format(name, count), file=sys.stderr)
+    return counted_run
+
+
 def main():
     """
     The entry point for the ``slyther`` command.
@@ -21,6 +55,49 @@ def main():
         default=[],
         type=argparse.FileType('r'),
         help='Source code to evaluate before dropping to a REPL')
+    parser.add_argument(
+        '--engine',
+        choices=Interpreter.engines,
+        help='How to evaluate programs (bytecode allows the deepest '
+             'recursion); the default is ast, or the engine of the --image')
+    parser.add_argument(
+        '--max-depth',
+        type=int,
+        default=1000000,
+        help='How deep the bytecode engine allows programs to recurse '
+             '(0 for no limit)')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print how many times each function was called and the time '
+             'spent in it when the program finishes')
+    parser.add_argument(
+        '--profile-pstats',
+        metavar='FILE',
+        help='Profile, saving the results to FILE for Python\'s pstats')
+    parser.add_argument(
+        '--profile-collapsed',
+        metavar='FILE',
+        help='Profile, saving the time spent in each stack of calls to '
+             'FILE in the collapsed format read by flame graph tools')
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Print counts of the work done on the interpreter\'s hot paths '
+             '(evaluations, lookups, calls...) when the program finishes')
+    parser.add_argument(
+        '--no-cache',
+        dest='cache',
+        action='store_false',
+        help='Do not read or write .slyc caches of parsed source files')
+    parser.add_argument(
+        '--image',
+        help='Start from an image saved by --save-image')
+    parser.add_argument(
+        '--save-image',
+        metavar='IMAGE',
+        help='After running the --load files (and source, if given), save '
+             'everything defined to IMAGE instead of dropping to a REPL')
     parser.add_argument(
         'source',
         type=argparse.FileType('r'),
@@ -42,17 +119,36 @@ def main():
     # This is just an easy way to allow no exception catching when pdb
     # is loaded. This allows the implementer to use python -m pdb and
     # do easy post-mortem debugging.
-    interp = Interpreter()
+    max_depth = args.max_depth or None
+    if args.image:
+        interp = Interpreter.from_image(args.image, args.engine, max_depth)
+    else:
+        interp = Interpreter(args.engine or 'ast', max_depth=max_depth)
+
+    def run_file(f):
+        if f is sys.stdin:
+            interp.exec_stream(f)
+        else:
+            f.close()
+            interp.exec_file(f.name, cache=args.cache)
 
     def run(debug=False):
         for f in args.load:
-            interp.exec(f.read())
+            run_file(f)
         if args.source:
-            interp.exec(args.source.read())
-        else:
+            run_file(args.source)
+        if args.save_image:
+            interp.save_image(args.save_image)
+        elif not args.source:
             from slyther.repl import repl
             repl(interp, debug=debug)
 
+    if args.profile or args.profile_pstats or args.profile_collapsed:
+        profile = interp.profile()
+        run = profiling(run, profile, args)
+    if args.stats:
+        run = counting(run, interp)
+
     if any(m in sys.modules.keys() for m in ('pdb', 'pudb')):
         run(debug=True)
     else:
@@ -61,6 +157,7 @@ def main():
         except KeyboardInterrupt:
             sys.exit(1)
         except Exception:
+            import traceback
             traceback.print_exc(limit=10, chain=False)
 
 
@@ -1,10 +1,12 @@
 import operator
 from functools import reduce
-from slyther.types import (BuiltinFunction, BuiltinMacro, Symbol,
-                           UserFunction, SExpression, cons, String,
+from slyther.types import (BuiltinCallable, BuiltinFunction, BuiltinMacro,
+                           Symbol, UserFunction, SExpression, cons, String,
                            Variable, ConsList, NIL, LexicalVarStorage,
-                           ConsCell)
+                           ConsCell, Vector)
 from slyther.evaluator import lisp_eval
+from slyther.folding import fold_function, rebound
+from slyther.memo import Memoized
 from slyther.parser import lex, parse, lisp
 from math import floor, ceil, sqrt
 
@@ -156,6 +158,13 @@ sqrt_ = BuiltinFunction(sqrt)
 abs_ = BuiltinFunction(abs)
 expt = BuiltinFunction(operator.pow, 'expt')
 
+# calls of these with constant arguments are folded (see slyther.folding);
+# not expt, which can take any time (and memory) for small arguments
+for _pure in (add, sub, mul, div, floordiv, lt, gt, eq, le, ge, not_,
+              remainder, floor_, ceil_, sqrt_, abs_):
+    _pure.pure = True
+del _pure
+
 # string manipulation
 format_ = BuiltinFunction(str.format)
 split = BuiltinFunction(str.split)
@@ -188,6 +197,92 @@ def is_nil(cell: ConsCell) -> bool:
     return cell.car == NIL
 
 
+# vectors
+@BuiltinFunction('make-vector')
+def make_vector(k: int, fill=NIL) -> Vector:
+    """
+    Create a vector of length ``k``, with each element ``fill``.
+
+    >>> make_vector(3, 0)
+    #(0 0 0)
+    >>> make_vector(2)
+    #(NIL NIL)
+    >>> make_vector(-1)
+    Traceback (most recent call last):
+        ...
+    ValueError: negative vector length -1
+    """
+    if k < 0:
+        raise ValueError("negative vector length {}".format(k))
+    return Vector([fill] * k)
+
+
+def _check_index(vec: Vector, k: int):
+    if not 0 <= k < len(vec):
+        raise IndexError("vector index {} out of range".format(k))
+
+
+@BuiltinFunction('vector-ref')
+def vector_ref(vec: Vector, k: int):
+    """
+    Get element ``k`` of ``vec``, in constant time.
+
+    >>> vector_ref(Vector([1, 2, 3]), 2)
+    3
+    >>> vector_ref(Vector([1, 2, 3]), -1)
+    Traceback (most recent call last):
+        ...
+    IndexError: vector index -1 out of range
+    """
+    _check_index(vec, k)
+    return vec[k]
+
+
+@BuiltinFunction('vector-set!')
+def vector_set(vec: Vector, k: int, value):
+    """
+    Set element ``k`` of ``vec`` to ``value``. Return ``NIL``.
+
+    >>> v = Vector([1, 2, 3])
+    >>> vector_set(v, 0, String("one"))
+    NIL
+    >>> v
+    #("one" 2 3)
+    """
+    _check_index(vec, k)
+    vec[k] = value
+
+
+@BuiltinFunction('vector-length')
+def vector_length(vec: Vector) -> int:
+    """
+    Return the number of elements in ``vec``.
+    """
+    return len(vec)
+
+
+@BuiltinFunction('list->vector')
+def list_to_vector(lst: ConsList) -> Vector:
+    """
+    Create a vector with the elements of ``lst``.
+
+    >>> list_to_vector(list_(1, 2, 3))
+    #(1 2 3)
+    """
+    return Vector(lst)
+
+
+@BuiltinFunction('vector->list')
+def vector_to_list(vec: Vector) -> ConsList:
+    """
+    Create a list with the elements of ``vec``.
+
+    >>> vector_to_list(Vector([1.5, 2.5]))
+    (list 1.5 2.5)
+    """
+    return ConsList.from_iterable(vec)
+
+
 @BuiltinMacro
 def define(se: SExpression, stg: LexicalVarStorage):
     """
@@ -242,13 +337,124 @@ def define(se: SExpression, stg: LexicalVarStorage):
         function = UserFunction(params=key.cdr, body=value, environ=stg.fork())
         key = key.car
         function.environ[key] = Variable(function)
-        stg.put(key, function)
+        rebound(key)
+        stg.put(key, fold_function(function))
     elif isinstance(key, Symbol):
+        rebound(key)
         stg.put(key, lisp_eval(value.car, stg))
     else:
         stg.put(key, value)
 
 
+@BuiltinMacro('define-memo')
+def define_memo(se: SExpression, stg: LexicalVarStorage):
+    """
+    Define a function like ``define`` does, but memoized (see ``memoize``),
+    calls it makes to itself included::
+
+        (define-memo (func-name args...) (body1) ... (bodyN))
+
+    >>> from slyther.interpreter import Interpreter
+    >>> interp = Interpreter()
+    >>> interp.exec('''
+    ... (define-memo (fib n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))
+    ... (fib 30)''')
+    832040
+    >>> interp.exec('fib')
+    (memoize (lambda (n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2))))))
+    >>> interp.exec('(memo-size fib)')
+    31
+    """
+    key = se.car
+    if not isinstance(key, SExpression):
+        raise TypeError("define-memo defines functions, like "
+                        "(define-memo (name args...) body...)")
+    function = UserFunction(params=key.cdr, body=se.cdr, environ=stg.fork())
+    memoized = Memoized(function)
+    key = key.car
+    function.environ[key] = Variable(memoized)
+    rebound(key)
+    fold_function(function)
+    stg.put(key, memoized)
+
+
+@BuiltinFunction
+def memoize(function, maxsize=1024):
+    """
+    Return ``function`` memoized: it remembers the results of the last
+    ``maxsize`` calls (every call for ``NIL``), and returns the result
+    remembered when called with the same arguments again, rather than
+    calling ``function``. See ``slyther.memo`` for how the arguments are
+    compared.
+
+    >>> from slyther.interpreter import Interpreter
+    >>> interp = Interpreter()
+    >>> interp.exec('''
+    ... (define (slow-square x) (print "computing") (* x x))
+    ... (define square (memoize slow-square 2))
+    ... (square 3)''')
+    computing
+    9
+    >>> interp.exec('(square 3)')
+    9
+    >>> interp.exec('(square 4) (square 5) (square 3)')
+    computing
+    computing
+    computing
+    9
+    >>> interp.exec('(memo-hit-rate square)')
+    0.2
+    """
+    return Memoized(function, None if maxsize is NIL else maxsize)
+
+
+def _memoized(function) -> Memoized:
+    if not isinstance(function, Memoized):
+        raise TypeError("{!r} is not memoized".format(function))
+    return function
+
+
+@BuiltinFunction('memo-size')
+def memo_size(function) -> int:
+    """
+    Return how many results the memoized ``function`` remembers.
+    """
+    return len(_memoized(function).cache)
+
+
+@BuiltinFunction('memo-hit-rate')
+def memo_hit_rate(function) -> float:
+    """
+    Return the fraction of calls to the memoized ``function`` which
+    returned a remembered result.
+    """
+    return _memoized(function).hit_rate()
+
+
+@BuiltinFunction('memo-clear!')
+def memo_clear(function):
+    """
+    Make the memoized ``function`` forget its results and counts.
+    """
+    _memoized(function).clear()
+
+
+@BuiltinFunction('memo-resize!')
+def memo_resize(function, maxsize):
+    """
+    Make the memoized ``function`` remember at most ``maxsize`` results
+    (every result for ``NIL``), forgetting the least recently used.
+
+    >>> from slyther.interpreter import Interpreter
+    >>> interp = Interpreter()
+    >>> interp.exec('''
+    ... (define-memo (sq x) (* x x))
+    ... (sq 1) (sq 2) (sq 3) (memo-resize! sq 2) (memo-size sq)''')
+    2
+    """
+    _memoized(function).resize(None if maxsize is NIL else maxsize)
+
+
 @BuiltinMacro('lambda')
 def lambda_func(se: SExpression, stg: LexicalVarStorage) -> UserFunction:
     """
@@ -270,7 +476,7 @@ def lambda_func(se: SExpression, stg: LexicalVarStorage) -> UserFunction:
     >>> f.environ['x'].value
     20
     """
-    return UserFunction(se.car, se.cdr, stg.fork())
+    return fold_function(UserFunction(se.car, se.cdr, stg.fork()))
 
 
 @BuiltinMacro('let')
@@ -533,6 +739,7 @@ def setbang(se: SExpression, stg: LexicalVarStorage):
     """
     try:
         stg[se.car].set(lisp_eval(se.cdr.car, stg))
+        rebound(se.car)
         return NIL
     except KeyError as ex:
         raise KeyError("Undefined variable {}".format(str(se.car))) from ex
@@ -665,7 +872,6 @@ def curry(se: SExpression, stg: LexicalVarStorage=LexicalVarStorage({})):
 
 @BuiltinFunction('plot-scatter')
 def plot_scat(x: ConsList, y:ConsList, option: String):
-    import matplotlib.pyplot as plt
     """
     Plots to scatter_plot.pdf given arguments x y respectively
     """
@@ -688,6 +894,9 @@ def plot_scat(x: ConsList, y:ConsList, option: String):
             title = input("Enter the title for this plot: ")
             xlabel = input("Enter the xlabel for this plot: ")
             ylabel = input("Enter the ylabel for this plot: ")
+            # matplotlib takes a long time to import, so only do it when
+            # actually plotting
+            import matplotlib.pyplot as plt
             plt.scatter(data_x, data_y, c='r')
             plt.title(title)
             plt.xlabel(xlabel)
@@ -697,7 +906,6 @@ def plot_scat(x: ConsList, y:ConsList, option: String):
             
 @BuiltinFunction('plot-pie')
 def plot_pie(x: ConsList, y: ConsList, option: String):
-    import matplotlib.pyplot as plt
     """
     Plots to pie_plot.pdf given arguments x y respectively
     """
@@ -718,6 +926,7 @@ def plot_pie(x: ConsList, y: ConsList, option: String):
             print("Your data lenghts do not match!")
         else:
             title = input("Enter the title for this plot: ")
+            import matplotlib.pyplot as plt
             patches, texts = plt.pie(data_y, startangle=90)
             plt.legend(patches, data_x, loc="best")
             plt.axis('equal')
@@ -733,3 +942,9 @@ def plot_help():
     print("")
     print("To plot pie plots, use plot-pie function")
     print("To learn how to use the function you can enter (plot-scatter '() '() \"--h\"")
+
+
+# Every builtin by its SlytherLisp name, which ``Interpreter`` binds in each
+# new global storage.
+table = {x.__name__: x for x in list(globals().values())
+         if isinstance(x, BuiltinCallable)}
@@ -0,0 +1,545 @@
+"""
+This module implements a bytecode compiler and stack based virtual machine
+for SlytherLisp.
+
+``compile_code`` flattens an abstract syntax tree into a ``Code`` object: a
+flat list of alternating opcodes and arguments, plus a table of constants.
+``run`` executes a ``Code`` object in a single dispatch loop with an
+explicit value stack. Calls to functions compiled to bytecode push a new
+frame onto a list of frames rather than recursing in Python, and calls in
+tail position replace the current frame.
+
+>>> from slyther.interpreter import Interpreter
+>>> from slyther.parser import lisp
+>>> interp = Interpreter()
+>>> code = compile_code(lisp('(if (< 1 2) (+ 1 2) 0)'), interp.stg)
+>>> print(dis(code))
+   0 LOAD_GLOBAL     <
+   2 MACRO_CHECK     10
+   4 LOAD_CONST      1
+   6 LOAD_CONST      2
+   8 CALL            2
+  10 JUMP_IF_FALSE   24
+  12 LOAD_GLOBAL     +
+  14 MACRO_CHECK     22
+  16 LOAD_CONST      1
+  18 LOAD_CONST      2
+  20 TAIL_CALL       2
+  22 RETURN          None
+  24 LOAD_CONST      0
+  26 RETURN          None
+>>> run(code, interp.stg)
+3
+
+Because of this, unlike the other engines, how deep a program may recurse
+is not limited by Python's recursion limit, but by the ``max_depth`` given
+to ``run`` (or only by memory, without one):
+
+>>> def bc(source, max_depth=None):
+...     return run(compile_code(lisp(source), interp.stg), interp.stg,
+...                max_depth)
+>>> bc('(define (depth n) (if (= n 0) 0 (+ 1 (depth (- n 1)))))')
+NIL
+>>> bc('(depth 100000)')
+100000
+>>> bc('(depth 100)', max_depth=50)
+Traceback (most recent call last):
+    ...
+RecursionError: maximum recursion depth of 50 calls exceeded
+
+Like ``slyther.compiler``, the special forms are only compiled when their
+name refers to the builtin macro at compile time. Any other macro is
+expanded when the program runs and the expansion is handed to ``lisp_eval``
+(this is also how ``eval`` of runtime-constructed code works). Calls made
+that way, and calls to bytecode functions from Python (such as from a
+builtin), do recurse in Python.
+"""
+from slyther.types import (Quoted, NIL, SExpression, Symbol, UserFunction,
+                           LexicalVarStorage, Variable)
+from slyther.evaluator import lisp_eval
+from slyther.compiler import kind_of, call_function, MACRO, FUNCTION
+from slyther.memo import Memoized
+from slyther.folding import rebound
+from slyther import profiler
+
+__all__ = ['Code', 'BytecodeFunction', 'compile_code', 'run', 'dis']
+
+# opcodes
+LOAD_CONST = 0
+LOAD_LOCAL = 1
+LOAD_GLOBAL = 2
+LOAD_QUOTED = 3
+CALL = 4
+TAIL_CALL = 5
+MACRO_CHECK = 6
+RETURN = 7
+POP = 8
+JUMP = 9
+JUMP_IF_FALSE = 10
+JUMP_IF_FALSE_OR_POP = 11
+JUMP_IF_TRUE_OR_POP = 12
+MAKE_CLOSURE = 13
+DEFINE = 14
+DEFINE_FUNCTION = 15
+STORE = 16
+DEFINE_MEMO = 17
+
+opnames = [
+    'LOAD_CONST',
+    'LOAD_LOCAL',
+    'LOAD_GLOBAL',
+    'LOAD_QUOTED',
+    'CALL',
+    'TAIL_CALL',
+    'MACRO_CHECK',
+    'RETURN',
+    'POP',
+    'JUMP',
+    'JUMP_IF_FALSE',
+    'JUMP_IF_FALSE_OR_POP',
+    'JUMP_IF_TRUE_OR_POP',
+    'MAKE_CLOSURE',
+    'DEFINE',
+    'DEFINE_FUNCTION',
+    'STORE',
+    'DEFINE_MEMO',
+]
+
+
+class Code:
+    """
+    A compiled sequence of instructions. ``ops`` alternates between an
+    opcode and its argument; jump targets are indices into ``ops``.
+    """
+    __slots__ = ('ops', 'consts')
+
+    def __init__(self):
+        self.ops = []
+        self.consts = []
+
+    def emit(self, op, arg=None) -> int:
+        """
+        Append an instruction, returning its index.
+        """
+        self.ops += (op, arg)
+        return len(self.ops) - 2
+
+    def const(self, value) -> int:
+        """
+        Add ``value`` to the constant table, returning its index.
+        """
+        self.consts.append(value)
+        return len(self.consts) - 1
+
+    def patch(self, index, arg=None):
+        """
+        Set the argument of the instruction at ``index`` (by default, to
+        the next instruction to be emitted).
+        """
+        self.ops[index + 1] = len(self.ops) if arg is None else arg
+
+
+class Prototype:
+    """
+    Everything needed to make a ``BytecodeFunction`` except its environ.
+    """
+    __slots__ = ('params', 'body', 'code')
+
+    def __init__(self, params, body, code):
+        self.params = params
+        self.body = body
+        self.code = code
+
+    def __repr__(self):
+        return "(lambda ({}) {})".format(
+            ' '.join(self.params), ' '.join(repr(x) for x in self.body))
+
+
+class BytecodeFunction(UserFunction):
+    """
+    A ``UserFunction`` whose body has been compiled to a ``Code`` object.
+    """
+    def __init__(self, params, body, environ, code):
+        super().__init__(params, body, environ)
+        self.code = code
+
+    def __call__(self, *args):
+        return _execute(self.code, self.bind(args), None, self)
+
+
+def dis(code: Code) -> str:
+    """
+    Return a human readable listing of ``code``.
+    """
+    lines = []
+    for i in range(0, len(code.ops), 2):
+        op, arg = code.ops[i:i + 2]
+        if op in (LOAD_CONST, LOAD_QUOTED, MAKE_CLOSURE):
+            arg = repr(code.consts[arg])
+        elif op == MACRO_CHECK:
+            arg = arg[1]
+        lines.append('{:4} {:15} {}'.format(i, opnames[op], arg))
+    return '\n'.join(lines)
+
+
+def compile_code(expr, stg: LexicalVarStorage) -> Code:
+    """
+    Compile a **single** top-level AST element. ``stg`` is used to decide
+    which heads name special forms.
+    """
+    if _Compiler.special_forms is None:
+        _Compiler.special_forms = _special_forms()
+    code = Code()
+    _Compiler(stg, code, frozenset()).compile(expr, True)
+    return code
+
+
+class _Compiler:
+    def __init__(self, stg, code, local_names, scope=frozenset()):
+        self.stg = stg
+        self.code = code
+        self.local_names = local_names
+        self.scope = scope | local_names
+
+    def compile(self, expr, tail):
+        """
+        Emit instructions for ``expr``. If ``tail`` is true, the emitted
+        code leaves the frame (by ``RETURN`` or ``TAIL_CALL``), otherwise
+        it leaves the value on the stack.
+        """
+        code = self.code
+        if isinstance(expr, SExpression):
+            head = expr.car
+            if isinstance(head, Symbol) and head not in self.scope:
+                try:
+                    form = self.special_forms.get(self.stg[head].value)
+                except (KeyError, TypeError):
+                    form = None
+                if form is not None:
+                    return getattr(self, form)(expr.cdr, tail)
+            return self.call(expr, tail)
+        if isinstance(expr, Symbol):
+            if expr in self.local_names:
+                code.emit(LOAD_LOCAL, expr)
+            else:
+                code.emit(LOAD_GLOBAL, expr)
+        elif isinstance(expr, Quoted):
+            code.emit(LOAD_QUOTED, code.const(expr))
+        else:
+            code.emit(LOAD_CONST, code.const(expr))
+        if tail:
+            code.emit(RETURN)
+
+    def body(self, exprs, tail):
+        if exprs is NIL:
+            return self.compile(NIL, tail)
+        exprs = list(exprs)
+        for x in exprs[:-1]:
+            self.compile(x, False)
+            self.code.emit(POP)
+        self.compile(exprs[-1], tail)
+
+    def call(self, expr, tail):
+        code = self.code
+        self.compile(expr.car, False)
+        check = code.emit(MACRO_CHECK)
+        nargs = 0
+        for x in expr.cdr:
+            self.compile(x, False)
+            nargs += 1
+        code.emit(TAIL_CALL if tail else CALL, nargs)
+        code.patch(check, (expr.cdr, len(code.ops)))
+        if tail:
+            code.emit(RETURN)
+
+    def function(self, params, body):
+        """
+        Compile a function body to its own ``Code`` and emit a
+        ``MAKE_CLOSURE`` for it.
+        """
+        local_names = set(params)
+        for x in body:
+            if (isinstance(x, SExpression)
+                    and x.car in ('define', 'define-memo')):
+                key = x.cdr.car
+                local_names.add(key.car if isinstance(key, SExpression)
+                                else key)
+        inner = _Compiler(self.stg, Code(), frozenset(local_names),
+                          self.scope)
+        inner.body(body, True)
+        self.code.emit(MAKE_CLOSURE,
+                       self.code.const(Prototype(params, body, inner.code)))
+
+    def define(self, se, tail):
+        key = se.car
+        if isinstance(key, SExpression):
+            self.function(key.cdr, se.cdr)
+            self.code.emit(DEFINE_FUNCTION, key.car)
+        elif isinstance(key, Symbol):
+            self.compile(se.cdr.car, False)
+            self.code.emit(DEFINE, key)
+        else:
+            self.code.emit(LOAD_CONST, self.code.const(se.cdr))
+            self.code.emit(DEFINE, key)
+        self.compile(NIL, tail)
+
+    def define_memo(self, se, tail):
+        key = se.car
+        if not isinstance(key, SExpression):
+            return self.call(SExpression(Symbol('define-memo'), se), tail)
+        self.function(key.cdr, se.cdr)
+        self.code.emit(DEFINE_MEMO, key.car)
+        self.compile(NIL, tail)
+
+    def lambda_(self, se, tail):
+        self.function(se.car, se.cdr)
+        if tail:
+            self.code.emit(RETURN)
+
+    def let(self, se, tail):
+        self.function(
+            SExpression.from_iterable(item.car for item in se.car), se.cdr)
+        nargs = 0
+        for item in se.car:
+            self.compile(item.cdr.car, False)
+            nargs += 1
+        self.code.emit(TAIL_CALL if tail else CALL, nargs)
+        if tail:
+            self.code.emit(RETURN)
+
+    def if_(self, se, tail):
+        code = self.code
+        self.compile(se.car, False)
+        jump_else = code.emit(JUMP_IF_FALSE)
+        self.compile(se.cdr.car, tail)
+        if not tail:
+            jump_end = code.emit(JUMP)
+        code.patch(jump_else)
+        self.compile(se.cdr.cdr.car, tail)
+        if not tail:
+            code.patch(jump_end)
+
+    def cond(self, se, tail):
+        code = self.code
+        jumps = []
+        for clause in se:
+            self.compile(clause.car, False)
+            jump_next = code.emit(JUMP_IF_FALSE)
+            self.compile(clause.cdr.car, tail)
+            if not tail:
+                jumps.append(code.emit(JUMP))
+            code.patch(jump_next)
+        self.compile(NIL, tail)
+        for jump in jumps:
+            code.patch(jump)
+
+    def and_or(self, se, tail, op):
+        if se is NIL:
+            return self.compile(NIL, tail)
+        code = self.code
+        exprs = list(se)
+        jumps = []
+        for x in exprs[:-1]:
+            self.compile(x, False)
+            jumps.append(code.emit(op))
+        self.compile(exprs[-1], tail)
+        if tail:
+            end = code.emit(JUMP)
+        for jump in jumps:
+            code.patch(jump)
+        if tail:
+            code.emit(RETURN)
+            code.patch(end)
+
+    def and_(self, se, tail):
+        self.and_or(se, tail, JUMP_IF_FALSE_OR_POP)
+
+    def or_(self, se, tail):
+        self.and_or(se, tail, JUMP_IF_TRUE_OR_POP)
+
+    def setbang(self, se, tail):
+        self.compile(se.cdr.car, False)
+        self.code.emit(STORE, se.car)
+        self.compile(NIL, tail)
+
+    special_forms = None
+
+
+def _special_forms():
+    import slyther.builtins as b
+    return {
+        b.define: 'define',
+        b.define_memo: 'define_memo',
+        b.lambda_func: 'lambda_',
+        b.let: 'let',
+        b.if_expr: 'if_',
+        b.cond: 'cond',
+        b.and_: 'and_',
+        b.or_: 'or_',
+        b.setbang: 'setbang',
+    }
+
+
+def _lookup(stg, name):
+    var = stg.local.get(name)
+    if var is None:
+        try:
+            var = stg.environ[name]
+        except KeyError:
+            raise KeyError("Undefined variable '{}'".format(name)) from None
+    return var
+
+
+def run(code: Code, stg: LexicalVarStorage, max_depth=None):
+    """
+    Execute top-level ``code`` on ``stg``, returning its value.
+
+    At most ``max_depth`` calls may be waiting for calls they made to
+    return (calls in tail position do not wait), or any number if it is
+    ``None``. Going deeper raises ``RecursionError``.
+    """
+    return _execute(code, stg, max_depth)
+
+
+def _execute(code, stg, max_depth=None, function=None):
+    """
+    Run ``code`` on ``stg``: the body of ``function``, or top-level code if
+    it is ``None``.
+    """
+    profile = profiler.active
+    if profile is None:
+        return _dispatch(code, stg, max_depth, function, None)
+    depth = len(profile.stack)
+    if function is not None:
+        profile.enter(function)
+    try:
+        return _dispatch(code, stg, max_depth, function, profile)
+    finally:
+        # end the calls left running by an error
+        profile.unwind(depth)
+
+
+def _dispatch(code, stg, max_depth, function, profile):
+    frames = []
+    ops = code.ops
+    consts = code.consts
+    local = stg.local
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    while True:
+        op = ops[pc]
+        arg = ops[pc + 1]
+        pc += 2
+        if op == LOAD_LOCAL:
+            var = local.get(arg)
+            push((var if var is not None else _lookup(stg, arg)).value)
+        elif op == LOAD_GLOBAL:
+            push(_lookup(stg, arg).value)
+        elif op == LOAD_CONST:
+            push(consts[arg])
+        elif op == MACRO_CHECK:
+            func = stack[-1]
+            if kind_of(func) is MACRO:
+                unevaluated, target = arg
+                stack[-1] = lisp_eval(func(unevaluated, stg), stg)
+                pc = target
+        elif op == CALL or op == TAIL_CALL:
+            if arg:
+                args = stack[-arg:]
+                del stack[-arg:]
+            else:
+                args = []
+            func = pop()
+            if type(func) is not BytecodeFunction:
+                if kind_of(func) is not FUNCTION:
+                    push(call_function(func, args))
+                elif profile is None:
+                    push(func(*args))
+                else:
+                    push(profile.call(func, args))
+                continue
+            if op == CALL:
+                if len(frames) == max_depth:
+                    raise RecursionError(
+                        "maximum recursion depth of {} calls exceeded"
+                        .format(max_depth))
+                if profile is not None:
+                    profile.enter(func)
+                frames.append((ops, consts, stg, stack, pc, function))
+                stack = []
+                push = stack.append
+                pop = stack.pop
+                stg = func.bind(args)
+            else:
+                if profile is not None:
+                    if function is None:
+                        profile.enter(func)
+                    else:
+                        profile.tail(func)
+                if func is not function or not func.rebind(stg, args):
+                    # a function calling itself reuses its storage, if it can
+                    stg = func.bind(args)
+            function = func
+            local = stg.local
+            ops = func.code.ops
+            consts = func.code.consts
+            pc = 0
+        elif op == RETURN:
+            value = pop()
+            if profile is not None and function is not None:
+                profile.exit()
+            if not frames:
+                return value
+            ops, consts, stg, stack, pc, function = frames.pop()
+            local = stg.local
+            push = stack.append
+            pop = stack.pop
+            push(value)
+        elif op == JUMP_IF_FALSE:
+            if not pop():
+                pc = arg
+        elif op == JUMP:
+            pc = arg
+        elif op == POP:
+            pop()
+        elif op == JUMP_IF_FALSE_OR_POP:
+            if stack[-1]:
+                pop()
+            else:
+                pc = arg
+        elif op == JUMP_IF_TRUE_OR_POP:
+            if stack[-1]:
+                pc = arg
+            else:
+                pop()
+        elif op == LOAD_QUOTED:
+            push(lisp_eval(consts[arg], stg))
+        elif op == MAKE_CLOSURE:
+            proto = consts[arg]
+            push(BytecodeFunction(proto.params, proto.body, stg.fork(),
+                                  proto.code))
+        elif op == DEFINE_FUNCTION:
+            defined = pop()
+            defined.environ[arg] = Variable(defined)
+            rebound(arg)
+            stg.put(arg, defined)
+        elif op == DEFINE_MEMO:
+            memoized = Memoized(pop())
+            memoized.function.environ[arg] = Variable(memoized)
+            rebound(arg)
+            stg.put(arg, memoized)
+        elif op == DEFINE:
+            rebound(arg)
+            stg.put(arg, pop())
+        elif op == STORE:
+            try:
+                var = stg[arg]
+            except KeyError as ex:
+                raise KeyError("Undefined variable {}".format(str(arg))) \
+                    from ex
+            var.set(pop())
+            rebound(arg)
+        else:
+            raise SystemError("bad opcode {}".format(op))
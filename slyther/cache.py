@@ -0,0 +1,329 @@
+"""
+A cache of parsed SlytherLisp source files, much like Python's ``.pyc``
+files.
+
+The forms parsed from ``lib.scm`` are stored in ``__slycache__/lib.scm.slyc``
+next to it, along with a hash of the source and the interpreter version.
+When the file is run again with the same contents, the forms are read back
+from the cache instead of being lexed and parsed.
+
+The forms are stored in a compact binary format:
+
+>>> from slyther.parser import lex, parse
+>>> forms = list(parse(lex("(define (sq x) (* x x)) '(sq -2.5 \\"s\\")")))
+>>> data = dumps(forms)
+>>> len(data)
+45
+>>> loads(data)
+[(define (sq x) (* x x)), '(sq -2.5 "s")]
+
+Each atom is a one byte tag followed by its contents, and each list is
+written after its elements as a tag and its length, so reading the forms
+back takes just a stack of values. Lengths and integers are variable length
+(small values take one byte), and each symbol is written in full only the
+first time; later uses refer back to it.
+
+A ``CacheWriter`` writes the cache a form at a time, so a file can be cached
+as it is run without keeping all of its forms in memory.
+"""
+import hashlib
+import os
+import struct
+
+import slyther
+from slyther.types import (NIL, SExpression, Symbol, String, Quoted,
+                           Vector)
+
+__all__ = ['dumps', 'loads', 'cache_path', 'read_cache', 'write_cache',
+           'CacheWriter']
+
+MAGIC = b'SLYC'
+FORMAT = 2
+
+# element tags
+(T_NIL, T_SEXPRESSION, T_SYMBOL, T_SYMBOL_REF, T_STRING, T_QUOTED, T_INT,
+ T_FLOAT, T_VECTOR) = range(9)
+
+_double = struct.Struct('<d')
+# the size of the forms, which is filled in once they are all written
+_size = struct.Struct('<Q')
+
+
+def _write_uint(out, n):
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_uint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _write_str(out, s):
+    encoded = s.encode('utf-8')
+    _write_uint(out, len(encoded))
+    out += encoded
+
+
+def dumps(forms) -> bytes:
+    """
+    Serialize a list of parsed forms to ``bytes``.
+    """
+    out = bytearray()
+    _dump(out, forms, {})
+    return bytes(out)
+
+
+def _dump(out, forms, symbols):
+    # append ``forms`` to ``out``, numbering new symbols in ``symbols``
+    # Lists are written after their elements (in postfix), each open list
+    # on the stack with an iterator over the elements still to write.
+    stack = [(None, iter(forms))]
+    while stack:
+        for x in stack[-1][1]:
+            t = type(x)
+            if x is NIL:
+                out.append(T_NIL)
+            elif t is SExpression or t is Vector:
+                stack.append((x, iter(x)))
+                break
+            elif t is Quoted:
+                stack.append((x, iter((x.elem, ))))
+                break
+            elif t is Symbol:
+                if x in symbols:
+                    out.append(T_SYMBOL_REF)
+                    _write_uint(out, symbols[x])
+                else:
+                    symbols[x] = len(symbols)
+                    out.append(T_SYMBOL)
+                    _write_str(out, x)
+            elif t is String:
+                out.append(T_STRING)
+                _write_str(out, x)
+            elif t is int:
+                out.append(T_INT)
+                _write_uint(out, x << 1 if x >= 0 else (-x << 1) - 1)
+            elif t is float:
+                out.append(T_FLOAT)
+                out += _double.pack(x)
+            else:
+                raise TypeError(
+                    "cannot serialize {!r}".format(type(x).__name__))
+        else:
+            x, _ = stack.pop()
+            t = type(x)
+            if t is Quoted:
+                out.append(T_QUOTED)
+            elif x is not None:
+                out.append(T_SEXPRESSION if t is SExpression else T_VECTOR)
+                _write_uint(out, len(x))
+
+
+def loads(data: bytes) -> list:
+    """
+    Read back a list of forms written by ``dumps``.
+    """
+    symbols = []
+    # the values read so far, with the elements of each list on top when
+    # its tag is reached
+    stack = []
+    push = stack.append
+    pos = 0
+    end = len(data)
+    while pos < end:
+        tag = data[pos]
+        pos += 1
+        if tag == T_SYMBOL_REF:
+            n = data[pos]
+            pos += 1
+            if n > 0x7f:
+                n, pos = _read_uint(data, pos - 1)
+            push(symbols[n])
+        elif tag == T_SEXPRESSION or tag == T_VECTOR:
+            n, pos = _read_uint(data, pos)
+            items = stack[len(stack) - n:]
+            del stack[len(stack) - n:]
+            if tag == T_SEXPRESSION:
+                push(SExpression.from_iterable(items))
+            else:
+                push(Vector(items))
+        elif tag == T_SYMBOL or tag == T_STRING:
+            n, pos = _read_uint(data, pos)
+            s = data[pos:pos + n].decode('utf-8')
+            pos += n
+            if tag == T_SYMBOL:
+                s = Symbol(s)
+                symbols.append(s)
+            else:
+                s = String(s)
+            push(s)
+        elif tag == T_INT:
+            n, pos = _read_uint(data, pos)
+            push(n >> 1 if not n & 1 else -((n + 1) >> 1))
+        elif tag == T_NIL:
+            push(NIL)
+        elif tag == T_QUOTED:
+            stack[-1] = Quoted(stack[-1])
+        elif tag == T_FLOAT:
+            push(_double.unpack_from(data, pos)[0])
+            pos += _double.size
+        else:
+            raise ValueError("bad tag {} at offset {}".format(tag, pos - 1))
+    return stack
+
+
+def cache_path(path, cache_dir=None):
+    """
+    Return where the cache for the source file ``path`` goes: in
+    ``cache_dir`` if given, otherwise a ``__slycache__`` directory next to
+    the source.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    if cache_dir is None:
+        cache_dir = os.path.join(directory, '__slycache__')
+    return os.path.join(cache_dir, name + '.slyc')
+
+
+def _header(source) -> bytes:
+    out = bytearray(MAGIC)
+    out.append(FORMAT)
+    _write_str(out, slyther.__version__)
+    out += hashlib.sha256(source).digest()
+    return bytes(out)
+
+
+def read_cache(path, source, cache_dir=None):
+    """
+    Return the forms cached for ``path``, or ``None`` if there is no cache
+    or it was made from a different ``source`` (the contents of the file,
+    as ``bytes`` or an ``mmap``) or interpreter version.
+    """
+    try:
+        with open(cache_path(path, cache_dir), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    # the header, the size of the forms (to catch truncated files), then
+    # the forms themselves
+    header = _header(source)
+    if not data.startswith(header):
+        return None
+    try:
+        size, = _size.unpack_from(data, len(header))
+        pos = len(header) + _size.size
+        if len(data) - pos != size:
+            return None
+        return loads(data[pos:])
+    except (ValueError, IndexError, struct.error, UnicodeDecodeError):
+        return None
+
+
+def write_cache(path, source, forms, cache_dir=None):
+    """
+    Cache ``forms``, parsed from ``source``, for ``path``. Failing to write
+    the cache (for example, in a read-only directory) is not an error.
+    """
+    with CacheWriter(path, source, cache_dir) as writer:
+        for form in forms:
+            writer.write(form)
+
+
+class CacheWriter:
+    """
+    Writes the cache for ``path`` one form at a time, as each is parsed
+    from ``source``::
+
+        with CacheWriter(path, source) as writer:
+            for form in parse(lex(source)):
+                writer.write(form)
+                ...
+
+    The new cache only replaces the old one on ``close``; ``discard``, or
+    leaving the ``with`` block with an error, drops it instead. Like
+    ``write_cache``, failing to write it is not an error.
+    """
+    # how many bytes of forms to collect before writing them out
+    buffer_size = 1 << 16
+
+    def __init__(self, path, source, cache_dir=None):
+        self.target = cache_path(path, cache_dir)
+        # write to a temporary name first so readers never see half a file
+        self.temp = '{}.{}.tmp'.format(self.target, os.getpid())
+        self.header = _header(source)
+        self.symbols = {}
+        self.buffer = bytearray()
+        self.size = 0
+        self.file = None
+        try:
+            os.makedirs(os.path.dirname(self.target), exist_ok=True)
+            self.file = open(self.temp, 'wb')
+            self.file.write(self.header + _size.pack(0))
+        except OSError:
+            self.discard()
+
+    def write(self, form):
+        """
+        Add ``form`` to the cache.
+        """
+        if self.file is None:
+            return
+        _dump(self.buffer, (form, ), self.symbols)
+        if len(self.buffer) >= self.buffer_size:
+            self._flush()
+
+    def _flush(self):
+        try:
+            self.file.write(self.buffer)
+        except OSError:
+            self.discard()
+            return
+        self.size += len(self.buffer)
+        self.buffer = bytearray()
+
+    def close(self):
+        """
+        Finish writing the cache, replacing any old one.
+        """
+        if self.file is None:
+            return
+        self._flush()
+        if self.file is None:
+            return
+        try:
+            self.file.seek(len(self.header))
+            self.file.write(_size.pack(self.size))
+            self.file.close()
+            self.file = None
+            os.replace(self.temp, self.target)
+        except OSError:
+            self.discard()
+
+    def discard(self):
+        """
+        Drop the cache written so far, leaving any old one in place.
+        """
+        try:
+            if self.file is not None:
+                self.file.close()
+            os.remove(self.temp)
+        except OSError:
+            pass
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
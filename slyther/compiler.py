@@ -0,0 +1,710 @@
+"""
+This module implements the closure compilation engine for SlytherLisp.
+
+Rather than re-walking the abstract syntax tree each time an expression is
+evaluated (like ``lisp_eval`` does), ``compile_expr`` walks it **once** and
+produces a tree of Python closures. Each closure takes the current *frame*
+(see ``slyther.resolver``; ``None`` at the top level) and returns the value
+of the expression it was compiled from:
+
+>>> from slyther.interpreter import Interpreter
+>>> from slyther.parser import lisp
+>>> interp = Interpreter()
+>>> code = compile_expr(lisp('(+ 1 2 (* 3 4))'), interp.stg)
+>>> execute(code)
+15
+
+Variables bound by a function are resolved to a frame slot when the function
+is compiled, so a call allocates one list rather than a
+``LexicalVarStorage``. Every other name is looked up in the global storage
+(the one given to ``compile_expr``) when the program runs, so unlike
+``lisp_eval``, a function can see globals defined after it.
+
+The special forms (``define``, ``define-memo``, ``lambda``, ``let``,
+``if``, ``cond``, ``and``, ``or`` and ``set!``) are recognized at compile
+time, but only when their name is bound to the builtin macro in the global
+storage and not shadowed by a local variable. Anything else which turns
+out to be a macro when the program runs is expanded and handed to
+``lisp_eval``, just like runtime-constructed code given to ``eval``.
+"""
+import sys
+import weakref
+
+from slyther.types import (Quoted, NIL, SExpression, Symbol, Macro, Function,
+                           UserFunction, LexicalVarStorage, Variable,
+                           Environment)
+from slyther.evaluator import lisp_eval
+from slyther.resolver import Scope, UNBOUND, frame_bindings
+from slyther.memo import Memoized
+from slyther.folding import rebound
+from slyther import profiler
+import slyther.locations
+
+__all__ = ['compile_expr', 'execute', 'call_function', 'CompiledFunction',
+           'cache_stats_for', 'reset_cache_stats']
+
+
+class TailCall:
+    """
+    Returned by closures compiled in tail position instead of calling a
+    ``CompiledFunction`` directly, so that ``call_function`` can reuse its
+    Python stack frame.
+    """
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+
+class CompiledFunction(UserFunction):
+    """
+    A ``UserFunction`` whose body has already been compiled to closures.
+    It keeps ``params`` and ``body`` so that it looks just like any other
+    ``UserFunction`` from SlytherLisp, but captures the frame it was created
+    in rather than an ``environ`` dictionary.
+    """
+    def __init__(self, params, body, scope, frame, stg, code):
+        self.params = params
+        self.body = body
+        self.scope = scope
+        self.frame = frame
+        self.stg = stg
+        self.code = code
+        self.nslots = len(scope)
+        self.nparams = scope.nparams
+
+    def make_frame(self, args):
+        """
+        Allocate a frame for a call with ``args``.
+        """
+        if len(args) == self.nslots:
+            frame = list(args)
+        elif len(args) >= self.nparams:
+            frame = list(args[:self.nparams])
+            frame += [UNBOUND] * (self.nslots - self.nparams)
+        else:
+            frame = list(args)
+            frame += [UNBOUND] * (self.nslots - len(args))
+        frame.append(self.frame)
+        return frame
+
+    def refill(self, frame, args) -> bool:
+        """
+        Reuse ``frame``, made by ``make_frame`` for the running call, for a
+        tail call of this function to itself with ``args``. This is only
+        possible when no closure has captured a frame of this function, and
+        returns whether it was.
+        """
+        if self.scope.captured or len(args) != self.nparams:
+            return False
+        frame[:self.nparams] = args
+        for slot in range(self.nparams, self.nslots):
+            frame[slot] = UNBOUND
+        return True
+
+    @property
+    def environ(self):
+        """
+        The variables visible to this function, as a dictionary.
+        """
+        return storage_view(self.scope.parent, self.frame, self.stg).fork()
+
+    def bind(self, args) -> LexicalVarStorage:
+        stg = LexicalVarStorage(self.environ)
+        stg.local = {name: Variable(value)
+                     for name, value in zip(self.params, args)}
+        return stg
+
+    def __call__(self, *args):
+        return call_function(self, args)
+
+
+def storage_view(scope, frame, stg) -> LexicalVarStorage:
+    """
+    Make a ``LexicalVarStorage`` for a compiled ``frame``, for macros which
+    are only discovered at runtime. Its variables read and write the slots
+    of the frame, so ``set!`` works through it.
+    """
+    if frame is None:
+        return stg
+    scope.capture()
+    return LexicalVarStorage(Environment(
+        frame_bindings(scope, frame),
+        Environment(stg.local, stg.environ)))
+
+
+# What to do with the head of a call, by type. ``Macro`` and ``Function``
+# are abstract base classes, and ``isinstance`` checks against those are
+# far too slow to do on every call.
+MACRO, COMPILED, USER, FUNCTION, OTHER = range(1, 6)
+_kinds = {}
+
+
+def kind_of(func) -> int:
+    """
+    Classify ``func`` as one of ``MACRO``, ``COMPILED``, ``USER``,
+    ``FUNCTION`` or ``OTHER`` (not callable from SlytherLisp).
+    """
+    typ = type(func)
+    kind = _kinds.get(typ)
+    if kind is None:
+        if issubclass(typ, Macro):
+            kind = MACRO
+        elif issubclass(typ, CompiledFunction):
+            kind = COMPILED
+        elif issubclass(typ, UserFunction):
+            kind = USER
+        elif issubclass(typ, Function):
+            kind = FUNCTION
+        else:
+            kind = OTHER
+        _kinds[typ] = kind
+    return kind
+
+
+def call_function(func, args):
+    """
+    Call ``func`` with the (already evaluated) ``args``, running any tail
+    calls it makes until a value is produced.
+    """
+    kind = kind_of(func)
+    if profiler.active is not None:
+        return _call_profiled(func, args, kind, profiler.active)
+    if kind is COMPILED:
+        frame = func.make_frame(args)
+        result = func.code(frame)
+        if type(result) is TailCall:
+            return run_tail_calls(func, frame, result)
+        return result
+    if kind is FUNCTION:
+        return func(*args)
+    if kind is USER:
+        return func(*args)
+    raise TypeError("'{}' object is not callable".format(type(func).__name__))
+
+
+def run_tail_calls(func, frame, result):
+    """
+    Run the ``TailCall`` ``result`` returned by the code of ``func``
+    running in ``frame``, and any tail calls that makes in turn, until a
+    value is produced.
+    """
+    while True:
+        # a function calling itself reuses its frame, if it can
+        while (type(result) is TailCall and result.func is func
+               and func.refill(frame, result.args)):
+            result = func.code(frame)
+        if type(result) is not TailCall:
+            return result
+        func, args = result.func, result.args
+        if kind_of(func) is not COMPILED:
+            return call_function(func, args)
+        frame = func.make_frame(args)
+        result = func.code(frame)
+
+
+def _call_profiled(func, args, kind, profile):
+    """
+    ``call_function``, telling ``profile`` about each call.
+    """
+    if kind is FUNCTION:
+        return profile.call(func, args)
+    if kind is USER:
+        # plain user functions tell the profiler themselves
+        return func(*args)
+    if kind is not COMPILED:
+        raise TypeError(
+            "'{}' object is not callable".format(type(func).__name__))
+    profile.enter(func)
+    try:
+        while True:
+            frame = func.make_frame(args)
+            result = func.code(frame)
+            while (type(result) is TailCall and result.func is func
+                   and func.refill(frame, result.args)):
+                profile.tail(func)
+                result = func.code(frame)
+            if type(result) is not TailCall:
+                return result
+            func, args = result.func, result.args
+            profile.tail(func)
+    finally:
+        profile.exit()
+
+
+# Each call of a function by another takes about this many Python frames
+# (the ``if`` or other form it is in, the call taking its result, and the
+# call itself), so ``execute`` raises the recursion limit this many times
+# to let programs recurse about as deep as they can with ``lisp_eval``.
+# It is not raised past ``max_recursion_limit`` though: before Python 3.11
+# every Python frame takes C stack as well, and too many crash Python.
+frames_per_call = 3
+max_recursion_limit = 6000
+
+# the recursion limit before the outermost ``execute`` raised it, if running
+_base_limit = None
+
+
+def execute(code, frame=None):
+    """
+    Run a closure produced by ``compile_expr`` and return its value.
+    """
+    global _base_limit
+    outermost = _base_limit is None
+    if outermost:
+        _base_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(_base_limit, min(
+            _base_limit * frames_per_call, max_recursion_limit)))
+    try:
+        result = code(frame)
+        if type(result) is TailCall:
+            return call_function(result.func, result.args)
+        return result
+    finally:
+        if outermost:
+            sys.setrecursionlimit(_base_limit)
+            _base_limit = None
+
+
+def compile_expr(expr, stg: LexicalVarStorage, scope: Scope = None,
+                 tail=True):
+    """
+    Compile a **single** AST element to a closure.
+
+    ``stg`` is the global storage: names which are not bound by an
+    enclosing function are looked up there, and it decides which heads name
+    special forms. ``scope`` is the ``Scope`` of the enclosing function
+    (``None`` at the top level), and ``tail`` says whether the result of
+    the closure is the result of the enclosing function, in which case it
+    may return a ``TailCall``.
+    """
+    if expr is NIL:
+        return _constant(NIL)
+    if isinstance(expr, Quoted):
+        return _compile_quoted(expr)
+    if isinstance(expr, Symbol):
+        return _compile_symbol(expr, stg, scope)
+    if isinstance(expr, SExpression):
+        head = expr.car
+        code = None
+        if (isinstance(head, Symbol)
+                and (scope is None or scope.resolve(head) is None)):
+            try:
+                compiler = _special_forms().get(stg[head].value)
+            except (KeyError, TypeError):
+                compiler = None
+            if compiler is not None:
+                code = compiler(expr.cdr, stg, scope, tail)
+        if code is None:
+            code = _compile_call(expr, stg, scope, tail)
+        if slyther.locations.current is not None:
+            code = _locating(code, expr)
+        return code
+    return _constant(expr)
+
+
+def _locating(code, expr):
+    """
+    Wrap ``code`` to give errors the location of ``expr``, if it has one.
+    """
+    if slyther.locations.current.span(expr) is None:
+        return code
+
+    def located(frame):
+        try:
+            return code(frame)
+        except (KeyError, TypeError) as e:
+            slyther.locations.locate(e, expr)
+            raise
+    return located
+
+
+def _constant(value):
+    def constant(frame):
+        return value
+    return constant
+
+
+def _compile_quoted(expr):
+    def quoted(frame):
+        return lisp_eval(expr, None)
+    return quoted
+
+
+def _unbound(name):
+    return KeyError("Undefined variable '{}'".format(name))
+
+
+def _compile_symbol(name, stg, scope):
+    address = scope.resolve(name) if scope is not None else None
+    if address is None:
+        return _compile_global(name, stg)
+    depth, slot = address
+    if depth == 0:
+        def local_symbol(frame):
+            value = frame[slot]
+            if value is UNBOUND:
+                raise _unbound(name)
+            return value
+        return local_symbol
+    if depth == 1:
+        def enclosing_symbol(frame):
+            value = frame[-1][slot]
+            if value is UNBOUND:
+                raise _unbound(name)
+            return value
+        return enclosing_symbol
+
+    def outer_symbol(frame):
+        for _ in range(depth):
+            frame = frame[-1]
+        value = frame[slot]
+        if value is UNBOUND:
+            raise _unbound(name)
+        return value
+    return outer_symbol
+
+
+class CacheStats:
+    """
+    Counts how often the inline caches for the global variables of one
+    storage were used (``hits``) or had to look the name up (``misses``).
+    They are only counted while ``count_caches`` is set, which
+    ``slyther.stats.enable`` does.
+    """
+    __slots__ = ('hits', 'misses')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return 'CacheStats(hits={}, misses={})'.format(self.hits, self.misses)
+
+
+# Whether to count cache hits and misses, and the counts by global storage
+# (so by interpreter).
+count_caches = False
+_cache_stats = weakref.WeakKeyDictionary()
+
+
+def cache_stats_for(stg):
+    """
+    Return the ``CacheStats`` for the global storage ``stg``.
+    """
+    stats = _cache_stats.get(stg)
+    if stats is None:
+        stats = _cache_stats[stg] = CacheStats()
+    return stats
+
+
+def reset_cache_stats():
+    """
+    Set the counts of every storage back to zero.
+    """
+    _cache_stats.clear()
+
+
+def _compile_global(name, stg):
+    """
+    Make a closure reading the global ``name``, with an inline cache of its
+    ``Variable``. The cache is valid until the next ``define`` on ``stg``
+    (which might shadow a builtin); ``set!`` changes the ``Variable`` in
+    place, so it never makes the cache stale.
+    """
+    version = -1
+    var = None
+
+    def global_symbol(frame):
+        nonlocal version, var
+        if version == stg.version:
+            if count_caches:
+                cache_stats_for(stg).hits += 1
+            return var.value
+        if count_caches:
+            cache_stats_for(stg).misses += 1
+        var = stg[name]
+        version = stg.version
+        return var.value
+    return global_symbol
+
+
+def _compile_store(name, stg, scope, define):
+    """
+    Make a closure ``store(frame, value)`` which assigns to ``name``: a
+    frame slot if it is bound by an enclosing function, otherwise a global
+    (``define``-ing it if ``define`` is true).
+    """
+    address = scope.resolve(name) if scope is not None else None
+    if address is None:
+        if define:
+            def define_global(frame, value):
+                rebound(name)
+                stg.put(name, value)
+            return define_global
+
+        def set_global(frame, value):
+            try:
+                var = stg[name]
+            except KeyError as ex:
+                raise KeyError("Undefined variable {}".format(str(name))) \
+                    from ex
+            var.set(value)
+            rebound(name)
+        return set_global
+    depth, slot = address
+
+    def store(frame, value):
+        for _ in range(depth):
+            frame = frame[-1]
+        if not define and frame[slot] is UNBOUND:
+            raise KeyError("Undefined variable {}".format(str(name)))
+        frame[slot] = value
+        # functions made by ``eval`` in this frame may have been folded
+        rebound(name)
+    return store
+
+
+def _compile_args(args):
+    """
+    Make a closure evaluating each of ``args`` into a list. The common
+    small arities are unrolled.
+    """
+    if not args:
+        return lambda frame: []
+    if len(args) == 1:
+        a, = args
+        return lambda frame: [a(frame)]
+    if len(args) == 2:
+        a, b = args
+        return lambda frame: [a(frame), b(frame)]
+    if len(args) == 3:
+        a, b, c = args
+        return lambda frame: [a(frame), b(frame), c(frame)]
+    return lambda frame: [arg(frame) for arg in args]
+
+
+def _compile_call(expr, stg, scope, tail):
+    """
+    Compile a call. Each Python frame on the way from one call to the next
+    takes from the recursion limit, so for calls with up to three arguments
+    the arguments are evaluated, and a ``CompiledFunction`` called, right
+    in the closure rather than through ``_compile_args`` and
+    ``call_function``. In tail position, a ``TailCall`` is returned
+    instead.
+    """
+    head = compile_expr(expr.car, stg, scope, False)
+    argc = len(expr.cdr)
+    arg_codes = [compile_expr(x, stg, scope, False) for x in expr.cdr]
+    a, b, c = (arg_codes + [None] * 3)[:3]
+    args = _compile_args(arg_codes)
+    unevaluated = expr.cdr
+
+    def call(frame):
+        func = head(frame)
+        kind = _kinds.get(type(func)) or kind_of(func)
+        if kind is MACRO:
+            view = storage_view(scope, frame, stg)
+            return lisp_eval(func(unevaluated, view), view)
+        if argc == 1:
+            argv = [a(frame)]
+        elif argc == 2:
+            argv = [a(frame), b(frame)]
+        elif argc == 0:
+            argv = []
+        elif argc == 3:
+            argv = [a(frame), b(frame), c(frame)]
+        else:
+            argv = args(frame)
+        if kind is FUNCTION:
+            if profiler.active is not None:
+                return profiler.active.call(func, argv)
+            return func(*argv)
+        if kind is COMPILED:
+            if tail:
+                return TailCall(func, argv)
+            if profiler.active is None:
+                new = func.make_frame(argv)
+                result = func.code(new)
+                if type(result) is TailCall:
+                    return run_tail_calls(func, new, result)
+                return result
+        return call_function(func, argv)
+    return call
+
+
+def _compile_body(body, stg, scope, tail=True):
+    """
+    Compile a sequence of expressions, returning the value of the last.
+    """
+    if body is NIL:
+        return _constant(NIL)
+    exprs = list(body)
+    init = tuple(compile_expr(x, stg, scope, False) for x in exprs[:-1])
+    last = compile_expr(exprs[-1], stg, scope, tail)
+    if not init:
+        return last
+
+    def sequence(frame):
+        for c in init:
+            c(frame)
+        return last(frame)
+    return sequence
+
+
+def _compile_lambda(params, body, stg, scope):
+    """
+    Resolve and compile the body of a function, returning a closure which
+    makes a ``CompiledFunction`` capturing the runtime frame.
+    """
+    inner = Scope(params, body, scope)
+    code = _compile_body(body, stg, inner)
+
+    def make_function(frame):
+        if frame is not None and not scope.captured:
+            scope.capture()
+        return CompiledFunction(params, body, inner, frame, stg, code)
+    return make_function
+
+
+def _compile_define(se, stg, scope, tail):
+    key = se.car
+    if isinstance(key, SExpression):
+        make_function = _compile_lambda(key.cdr, se.cdr, stg, scope)
+        store = _compile_store(key.car, stg, scope, True)
+
+        def define_function(frame):
+            store(frame, make_function(frame))
+            return NIL
+        return define_function
+    if isinstance(key, Symbol):
+        value = compile_expr(se.cdr.car, stg, scope, False)
+        store = _compile_store(key, stg, scope, True)
+
+        def define_variable(frame):
+            store(frame, value(frame))
+            return NIL
+        return define_variable
+    value = se.cdr
+
+    def define_other(frame):
+        storage_view(scope, frame, stg).put(key, value)
+        return NIL
+    return define_other
+
+
+def _compile_define_memo(se, stg, scope, tail):
+    key = se.car
+    if not isinstance(key, SExpression):
+        # let the macro raise its error when (if ever) this runs
+        return None
+    make_function = _compile_lambda(key.cdr, se.cdr, stg, scope)
+    store = _compile_store(key.car, stg, scope, True)
+
+    def define_memo(frame):
+        store(frame, Memoized(make_function(frame)))
+        return NIL
+    return define_memo
+
+
+def _compile_lambda_form(se, stg, scope, tail):
+    return _compile_lambda(se.car, se.cdr, stg, scope)
+
+
+def _compile_let(se, stg, scope, tail):
+    inner = Scope([item.car for item in se.car], se.cdr, scope)
+    args = _compile_args(
+        [compile_expr(item.cdr.car, stg, scope, False) for item in se.car])
+    body = _compile_body(se.cdr, stg, inner, tail)
+    padding = [UNBOUND] * (len(inner) - inner.nparams)
+
+    def let(frame):
+        new = args(frame)
+        new += padding
+        new.append(frame)
+        return body(new)
+    return let
+
+
+def _compile_if(se, stg, scope, tail):
+    predicate = compile_expr(se.car, stg, scope, False)
+    consequent = compile_expr(se.cdr.car, stg, scope, tail)
+    alternative = compile_expr(se.cdr.cdr.car, stg, scope, tail)
+
+    def if_expr(frame):
+        if predicate(frame):
+            return consequent(frame)
+        return alternative(frame)
+    return if_expr
+
+
+def _compile_cond(se, stg, scope, tail):
+    clauses = tuple(
+        (compile_expr(clause.car, stg, scope, False),
+         compile_expr(clause.cdr.car, stg, scope, tail))
+        for clause in se)
+
+    def cond(frame):
+        for predicate, consequent in clauses:
+            if predicate(frame):
+                return consequent(frame)
+        return NIL
+    return cond
+
+
+def _compile_and_or(is_and):
+    def compile_form(se, stg, scope, tail):
+        if se is NIL:
+            return _constant(NIL)
+        exprs = list(se)
+        init = tuple(compile_expr(x, stg, scope, False) for x in exprs[:-1])
+        last = compile_expr(exprs[-1], stg, scope, tail)
+
+        def and_or(frame):
+            for c in init:
+                value = c(frame)
+                if bool(value) is not is_and:
+                    return value
+            return last(frame)
+        return and_or
+    return compile_form
+
+
+def _compile_setbang(se, stg, scope, tail):
+    value = compile_expr(se.cdr.car, stg, scope, False)
+    store = _compile_store(se.car, stg, scope, False)
+
+    def setbang(frame):
+        store(frame, value(frame))
+        return NIL
+    return setbang
+
+
+_special_form_table = None
+
+
+def _special_forms():
+    """
+    Map each builtin macro with a compiled equivalent to its compiler.
+    Built on first use to avoid a circular import with
+    ``slyther.builtins``.
+    """
+    global _special_form_table
+    if _special_form_table is None:
+        import slyther.builtins as b
+        _special_form_table = {
+            b.define: _compile_define,
+            b.define_memo: _compile_define_memo,
+            b.lambda_func: _compile_lambda_form,
+            b.let: _compile_let,
+            b.if_expr: _compile_if,
+            b.cond: _compile_cond,
+            b.and_: _compile_and_or(True),
+            b.or_: _compile_and_or(False),
+            b.setbang: _compile_setbang,
+        }
+    return _special_form_table
@@ -1,5 +1,8 @@
 from slyther.types import (Quoted, NIL, SExpression, ConsList, Symbol,
-                           Macro, NilType, LexicalVarStorage, Function)
+                           Macro, NilType, LexicalVarStorage, Function,
+                           UserFunction)
+from slyther.locations import locate
+from slyther import profiler
 
 
 def lisp_eval(expr, stg: LexicalVarStorage):
@@ -74,6 +77,13 @@ def lisp_eval(expr, stg: LexicalVarStorage):
     >>> test("'((a b (c)) (1 (2) 3))")
     (list (list a b (list c)) (list 1 (list 2) 3))
 
+    The value of a quoted expression is only made the first time it is
+    evaluated, and every evaluation after shares it:
+
+    >>> quoted = lisp("'(1 2 3)")
+    >>> lisp_eval(quoted, some_stg) is lisp_eval(quoted, some_stg)
+    True
+
     Function calls should take *evaluated parameters*, do something
     with them, and return a result (which, unlike macros, ``lisp_eval``
     does not need called on to compute).
@@ -131,39 +141,136 @@ def lisp_eval(expr, stg: LexicalVarStorage):
     3
 
     """
-    while True:
-        if expr is NIL:
-            return NIL  # if the expr is NIL then return NIL.
-        elif isinstance(expr, Quoted):  # if the expr with quote
-            y = expr.elem  # access the content after the quote
-            if isinstance(y, SExpression):
-                a = []
-                for x in y:
-                    a.append(lisp_eval(Quoted(x), stg))
-                return ConsList.from_iterable(a)   # return '(a,b,c)
+    # the function whose call ``stg`` was made for, if any
+    owner = None
+    # the profiler timing that call, if it is being profiled
+    profile = None
+    try:
+        while True:
+            if expr is NIL:
+                return NIL  # if the expr is NIL then return NIL.
+            elif isinstance(expr, Quoted):  # if the expr with quote
+                # made on the first evaluation, then shared
+                value = expr.value
+                if value is None:
+                    value = expr.value = unquote(expr.elem)
+                return value
+            elif isinstance(expr, Symbol):
+                return (stg[expr].value)
+            elif isinstance(expr, SExpression):
+                s = lisp_eval(expr.car, stg)
+                if isinstance(s, Macro):
+                    expr = s(expr.cdr, stg)
+                elif isinstance(s, Function):
+                    a = []
+                    for x in expr.cdr:
+                        a.append(lisp_eval(x, stg))
+                    if type(s) is not UserFunction:
+                        if (profiler.active is None
+                                or isinstance(s, UserFunction)):
+                            return s(*a)
+                        return profiler.active.call(s, a)
+                    if profile is not None:
+                        profile.tail(s)
+                    elif profiler.active is not None:
+                        profile = profiler.active
+                        profile.enter(s)
+                    # A call in tail position: evaluate the body here
+                    # rather than recursing. A function calling itself
+                    # reuses its storage, if no closure captured it.
+                    if s is not owner or not s.rebind(stg, a):
+                        stg = s.bind(a)
+                        owner = s
+                    expr = s.enter(stg)
+                else:
+                    print(expr)
+                    raise TypeError("'Symbol' object is not callable")
             else:
-                return y
-        elif isinstance(expr, Symbol):
-            return (stg[expr].value)
-        elif isinstance(expr, SExpression):
-            s = lisp_eval(expr.car, stg)
-            if isinstance(s, Macro):
-                a = []
-                for x in expr.cdr:
-                    a.append(x)
-                expr = s(expr.cdr, stg)
-            elif isinstance(s, Function):
-                a = []
-                for x in expr.cdr:
-                    a.append(lisp_eval(x, stg))
-                tup_holder = s(*a)
-                if isinstance(tup_holder, tuple):
-                    expr = tup_holder[0]
-                    stg = tup_holder[1]
+                return expr
+    except (KeyError, TypeError) as e:
+        # only does anything when source locations are turned on
+        locate(e, expr)
+        raise
+    finally:
+        if profile is not None:
+            profile.exit()
+
+
+def counting_eval(expr, stg: LexicalVarStorage):
+    """
+    ``lisp_eval``, also counting the evaluations by type and the calls to
+    user functions in ``slyther.stats.counters``. ``slyther.stats.enable``
+    binds ``lisp_eval`` to this in the modules calling it, so that counting
+    costs nothing while it is off. Changes to ``lisp_eval`` must be made
+    here too.
+    """
+    # imported here so that startup does not pay for slyther.stats
+    from slyther.stats import counters
+    evaluations = counters.evaluations
+    owner = None
+    profile = None
+    try:
+        while True:
+            t = type(expr)
+            evaluations[t] = evaluations.get(t, 0) + 1
+            if expr is NIL:
+                return NIL
+            elif isinstance(expr, Quoted):
+                value = expr.value
+                if value is None:
+                    value = expr.value = unquote(expr.elem)
+                return value
+            elif isinstance(expr, Symbol):
+                return (stg[expr].value)
+            elif isinstance(expr, SExpression):
+                # the name, so that this counts the evaluations it makes
+                s = lisp_eval(expr.car, stg)
+                if isinstance(s, Macro):
+                    expr = s(expr.cdr, stg)
+                elif isinstance(s, Function):
+                    a = []
+                    for x in expr.cdr:
+                        a.append(lisp_eval(x, stg))
+                    if type(s) is not UserFunction:
+                        if (profiler.active is None
+                                or isinstance(s, UserFunction)):
+                            return s(*a)
+                        return profiler.active.call(s, a)
+                    counters.user_calls += 1
+                    if owner is not None:
+                        counters.tail_calls += 1
+                    if profile is not None:
+                        profile.tail(s)
+                    elif profiler.active is not None:
+                        profile = profiler.active
+                        profile.enter(s)
+                    if s is not owner or not s.rebind(stg, a):
+                        stg = s.bind(a)
+                        owner = s
+                    expr = s.enter(stg)
                 else:
-                    return tup_holder
+                    print(expr)
+                    raise TypeError("'Symbol' object is not callable")
             else:
-                print(expr)
-                raise TypeError("'Symbol' object is not callable")
-        else:
-            return expr
+                return expr
+    except (KeyError, TypeError) as e:
+        locate(e, expr)
+        raise
+    finally:
+        if profile is not None:
+            profile.exit()
+
+
+def unquote(elem):
+    """
+    Return the value of the quoted ``elem``: for an s-expression, a
+    ``ConsList`` of the values of each of its elements quoted, otherwise
+    ``elem`` itself.
+
+    >>> from slyther.parser import lisp
+    >>> unquote(lisp("(1 (a 'b) ())"))
+    (list 1 (list a 'b) NIL)
+    """
+    if not isinstance(elem, SExpression):
+        return elem
+    return ConsList.from_iterable([unquote(x) for x in elem])
@@ -0,0 +1,240 @@
+"""
+Constant folding for the bodies of user functions, done once when ``define``
+or ``lambda`` makes the function rather than each time it runs.
+
+Builtins marked ``pure`` (arithmetic, comparisons, ``not``...) always return
+the same result for the same arguments and do nothing else. Where the body
+of a function calls one by a name which cannot be rebound inside it, the
+name is replaced by the builtin itself, so it is not looked up on each call;
+where all the arguments are numbers (integers no bigger than ``_max_bits``)
+or booleans too, the call is replaced by its result. Quoted data is
+evaluated to the ``ConsList`` (or atom) it stands for, which every call
+then shares:
+
+>>> from slyther.interpreter import Interpreter
+>>> interp = Interpreter()
+>>> interp.exec('''
+... (define (scaled x) (* x (+ 2 3) (car '(7 8))))''')
+NIL
+>>> scaled = interp.exec('scaled')
+>>> scaled.body
+((* x (+ 2 3) (car '(7 8))))
+>>> mul, x, five, car = scaled.folded.car
+>>> mul is interp.exec('*'), x, five, car.cdr.car
+(True, x, 5, (list 7 8))
+>>> interp.exec('(scaled 2)')
+70
+
+The original ``body`` is kept for printing, compiling and saving the
+function, and the folded body is only what ``UserFunction.enter`` runs.
+
+Folding depends on what the names referred to when the function was made,
+so each name a folded function relied on is recorded. ``define`` and
+``set!`` (on every engine) call ``rebound`` with the name they bind, which
+throws away the folded bodies depending on it, and those functions go back
+to running their original body:
+
+>>> interp.exec('(set! + -) (scaled 2)')
+-14
+>>> scaled.folded is None
+True
+
+Only ``lisp_eval`` runs folded bodies: the compiled engines resolve names
+(and cache globals) when compiling instead. They still make plain user
+functions for code given to ``eval``, so their ``define`` and ``set!``
+call ``rebound`` as well.
+"""
+from weakref import WeakSet
+
+import slyther.locations
+from slyther.types import (NIL, Boolean, BuiltinCallable, ConsList, Quoted,
+                           SExpression, String, Symbol)
+
+__all__ = ['fold_function', 'fold', 'rebound']
+
+# The functions with a folded body relying on each name.
+_dependents = {}
+
+# The folds made so far by the id of the body folded, as ``(body, folded,
+# ((name, builtin), ...))``. Functions made again from the same code (such
+# as internal defines, made on each call of the function around them) reuse
+# the fold if the names still refer to the same builtins.
+_folds = {}
+_max_folds = 4096
+
+_constants = (int, float, complex, String, ConsList, type(Boolean(True)),
+              type(Boolean(False)))
+
+# Calls are only folded when their arguments are all numbers or booleans,
+# and their integer arguments are at most this many bits, so that folding
+# (done when a function is defined, whether or not the call would ever
+# run) stays cheap, and does not keep large results around. Strings are
+# left out since ``(* "ab" 100000000)`` is a 200 MB string.
+_max_bits = 64
+_arguments = (int, float, complex, type(Boolean(True)), type(Boolean(False)))
+
+
+def _constant(x):
+    return isinstance(x, _constants) and not isinstance(x, SExpression)
+
+
+def _foldable(x):
+    # whether ``x`` may be an argument of a folded call
+    return isinstance(x, _arguments) and (
+        not isinstance(x, int) or x.bit_length() <= _max_bits)
+
+
+def _binders(params, body):
+    """
+    Return every name which ``params`` or anything in ``body`` binds (as a
+    parameter, ``define`` or ``let``) or assigns (with ``set!``), in any
+    scope.
+    """
+    names = {x for x in params if isinstance(x, Symbol)}
+    todo = list(body)
+    while todo:
+        x = todo.pop()
+        if not isinstance(x, SExpression):
+            continue
+        todo.extend(x)
+        if (x.cdr is NIL or not isinstance(x.car, Symbol)
+                or x.car not in ('define', 'define-memo', 'lambda', 'let',
+                                 'set!')):
+            continue
+        binding = x.cdr.car
+        if x.car == 'let':
+            names.update(item.car for item in binding
+                         if isinstance(item, SExpression))
+        elif isinstance(binding, SExpression):
+            names.update(x for x in binding if isinstance(x, Symbol))
+        elif isinstance(binding, Symbol):
+            names.add(binding)
+    return names
+
+
+def _resolve(name, environ):
+    # the pure builtin ``name`` refers to in ``environ``, or ``None``
+    try:
+        value = environ[name].value
+    except KeyError:
+        return None
+    if isinstance(value, BuiltinCallable) and value.pure:
+        return value
+    return None
+
+
+def fold(expr, environ, bound, names):
+    """
+    Return ``expr`` with the calls of pure builtins (referred to by names
+    found in ``environ`` and not in ``bound``) and quoted data folded,
+    recording each name it relied on in the dictionary ``names``, with the
+    builtin it referred to. Returns ``expr`` itself if nothing could be
+    folded.
+
+    >>> from slyther.parser import lisp
+    >>> from slyther.types import Variable
+    >>> import slyther.builtins
+    >>> environ = {name: Variable(x)
+    ...            for name, x in slyther.builtins.table.items()}
+    >>> names = {}
+    >>> expr = fold(lisp('(if (< 1 2) (- n (abs -3)) n)'), environ, {'n'},
+    ...             names)
+    >>> expr.cdr.car, list(expr.cdr.cdr.car)[1:]
+    (#t, [n, 3])
+    >>> sorted(map(str, names))
+    ['-', '<', 'abs']
+    >>> fold(lisp('(- 1 2)'), environ, {'-'}, {})
+    (- 1 2)
+    """
+    if isinstance(expr, Quoted):
+        # avoid circular imports
+        from slyther.evaluator import lisp_eval
+        value = lisp_eval(expr, None)
+        return value if _constant(value) else expr
+    if not isinstance(expr, SExpression):
+        return expr
+    head = expr.car
+    if isinstance(head, Symbol) and head == 'cond':
+        # the clauses are not calls, but what they hold is
+        return _rebuild(expr, [head] + [
+            _fold_each(clause, environ, bound, names)
+            if isinstance(clause, SExpression) else clause
+            for clause in expr.cdr])
+    items = list(expr)
+    folded = [fold(x, environ, bound, names) for x in items]
+    head = folded[0]
+    if isinstance(head, Symbol) and head not in bound:
+        func = _resolve(head, environ)
+        if func is not None:
+            names[head] = func
+            folded[0] = func
+            args = folded[1:]
+            if all(_foldable(x) for x in args):
+                try:
+                    value = func(*args)
+                except Exception:
+                    # left for the call to raise when (if ever) it runs
+                    pass
+                else:
+                    if _constant(value):
+                        return value
+    return _rebuild(expr, folded)
+
+
+def _fold_each(exprs, environ, bound, names):
+    # fold each of a list of expressions (such as a body), not as a call
+    return _rebuild(exprs, [fold(x, environ, bound, names) for x in exprs])
+
+
+def _rebuild(expr, items):
+    # ``expr`` with ``items`` in place of its own, unless they are the same
+    if all(x is y for x, y in zip(items, expr)):
+        return expr
+    result = SExpression.from_iterable(items)
+    if slyther.locations.current is not None:
+        # give the node made in place of ``expr`` the same location
+        slyther.locations.current.copy(expr, result)
+    return result
+
+
+def fold_function(function):
+    """
+    Fold the body of the ``UserFunction`` ``function`` in its ``environ``,
+    setting its ``folded`` body if anything could be. Returns
+    ``function``.
+    """
+    body = function.body
+    environ = function.environ
+    entry = _folds.get(id(body))
+    if (entry is not None and entry[0] is body
+            and all(_resolve(name, environ) is func
+                    for name, func in entry[2])):
+        _, folded, resolved = entry
+    else:
+        names = {}
+        folded = _fold_each(body, environ, _binders(function.params, body),
+                            names)
+        resolved = tuple(names.items())
+        if len(_folds) >= _max_folds:
+            _folds.clear()
+        _folds[id(body)] = (body, folded, resolved)
+    if folded is not body:
+        function.folded = folded
+        for name, _ in resolved:
+            functions = _dependents.get(name)
+            if functions is None:
+                functions = _dependents[name] = WeakSet()
+            functions.add(function)
+    return function
+
+
+def rebound(name):
+    """
+    Note that ``name`` was bound again (by ``define`` or ``set!``), so the
+    functions whose folded body relied on what it referred to run their
+    original body from now on.
+    """
+    functions = _dependents.pop(name, None)
+    if functions:
+        for function in functions:
+            function.folded = None
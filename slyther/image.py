@@ -0,0 +1,259 @@
+"""
+Interpreter images: a snapshot of everything an interpreter has defined,
+saved to a file so that later processes can start from it rather than
+loading the same libraries again.
+
+>>> import io
+>>> from slyther.interpreter import Interpreter
+>>> interp = Interpreter()
+>>> interp.exec('(define (sq x) (* x x)) (define nums (list 1 2 3))')
+NIL
+>>> f = io.BytesIO()
+>>> dump(interp, f)
+>>> _ = f.seek(0)
+>>> restored = load(f)
+>>> restored.exec('(sq (car (cdr nums)))')
+4
+
+An image holds the global ``LexicalVarStorage`` with everything reachable
+from it: user functions along with the environments they closed over, and
+any data. Builtins are not saved, but referred to by name and looked up in
+``slyther.builtins`` again when the image is loaded. Functions compiled by
+the closure engine are saved without their closures (which Python cannot
+serialize), and compiled again when first called.
+
+Images are pickles, with a header naming the interpreter version which
+saved them; like any pickle, only load images from a trusted source.
+"""
+import copyreg
+import gc
+import operator
+import pickle
+from itertools import islice
+
+import slyther
+import slyther.builtins
+import slyther.compiler
+from slyther.types import (NIL, Boolean, BuiltinCallable, ConsList,
+                           Environment, SExpression)
+from slyther.resolver import UNBOUND
+
+__all__ = ['dump', 'load', 'ImageError']
+
+MAGIC = b'SLYI'
+FORMAT = 2
+
+
+class ImageError(Exception):
+    """
+    Raised when an image cannot be loaded by this interpreter.
+    """
+
+
+def _header():
+    version = slyther.__version__.encode('utf-8')
+    return MAGIC + bytes((FORMAT, len(version))) + version
+
+
+def _cell(cls, car):
+    cell = object.__new__(cls)
+    cell.car = car
+    return cell
+
+
+def _chain(cls, car, cells, tail):
+    head = _cell(cls, car)
+    prev = head
+    for cell in cells:
+        prev.cdr = cell
+        prev = cell
+    prev.cdr = tail
+    if tail is NIL:
+        head.freeze()
+    return head
+
+
+def _compiled_function(params, body, scope, frame, stg):
+    # replaced with ``_Unpickler.compiled_function`` when loading
+    raise ImageError("images can only be loaded by load()")
+
+
+def _snapshot(local, size, extra, parent):
+    # replaced with ``_Unpickler.snapshot`` when loading
+    raise ImageError("images can only be loaded by load()")
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file, stg):
+        self.proto = pickle.HIGHEST_PROTOCOL
+        super().__init__(file, self.proto)
+        self.stg = stg
+        self.names = list(stg.local)
+        self.variables = list(stg.local.values())
+        self.builtins = {id(x): name
+                         for name, x in slyther.builtins.table.items()}
+        self.singletons = {id(NIL): 'NIL', id(UNBOUND): 'UNBOUND',
+                           id(Boolean(True)): '#t',
+                           id(Boolean(False)): '#f'}
+        # ids of the cells already saved, and of those saved as part of a
+        # list which links them up
+        self.cells = set()
+        self.linked = set()
+        # (rather than ``reducer_override``, which needs Python 3.8)
+        self.dispatch_table = copyreg.dispatch_table.copy()
+        self.dispatch_table.update({
+            ConsList: self.reduce_list,
+            SExpression: self.reduce_list,
+            slyther.compiler.CompiledFunction: self.reduce_compiled,
+            Environment: self.reduce_environment,
+        })
+
+    def persistent_id(self, obj):
+        name = self.singletons.get(id(obj))
+        if name is not None:
+            return name
+        if isinstance(obj, BuiltinCallable):
+            name = self.builtins.get(id(obj))
+            if name is None:
+                raise pickle.PicklingError(
+                    "builtin {!r} is not in slyther.builtins.table"
+                    .format(obj.__name__))
+            return ('builtin', name)
+        return None
+
+    def reduce_compiled(self, obj):
+        return _compiled_function, (obj.params, obj.body, obj.scope,
+                                    obj.frame, obj.stg)
+
+    def reduce_environment(self, obj):
+        if obj.parent is self.stg.environ:
+            reduced = self.reduce_snapshot(obj)
+            if reduced is not None:
+                return reduced
+        return obj.__reduce_ex__(self.proto)
+
+    def reduce_list(self, obj):
+        # Pickling cell by cell would recurse once per element and exceed
+        # the recursion limit, so the cells following this one are saved
+        # unlinked and linked back up when loaded. Each cell is still saved
+        # just once, so tails shared between lists stay shared.
+        if id(obj) in self.linked:
+            return _cell, (type(obj), obj.car)
+        self.cells.add(id(obj))
+        cells = []
+        tail = obj.cdr
+        while (isinstance(tail, ConsList) and tail is not NIL
+               and id(tail) not in self.cells):
+            self.cells.add(id(tail))
+            self.linked.add(id(tail))
+            cells.append(tail)
+            tail = tail.cdr
+        return _chain, (type(obj), obj.car, cells, tail)
+
+    def reduce_snapshot(self, obj):
+        # Each function defined at the top level keeps a copy of the global
+        # variables defined before it (and, when defined with
+        # ``(define (name ...) ...)``, a variable for itself). Save these
+        # as a count of global variables rather than thousands of copies of
+        # the same ones.
+        names = list(dict.keys(obj))
+        variables = list(dict.values(obj))
+        for size in (len(names), len(names) - 1):
+            if (names[:size] == self.names[:size]
+                    and all(map(operator.is_, variables[:size],
+                                self.variables[:size]))):
+                extra = dict(zip(names[size:], variables[size:]))
+                return _snapshot, (self.stg.local, size, extra, obj.parent)
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file):
+        super().__init__(file)
+        self.snapshots = []
+
+    def persistent_load(self, pid):
+        if isinstance(pid, tuple):
+            kind, name = pid
+            value = slyther.builtins.table.get(name)
+            if kind != 'builtin' or value is None:
+                raise ImageError("unknown builtin {!r}".format(name))
+            return value
+        return {'NIL': NIL, 'UNBOUND': UNBOUND, '#t': Boolean(True),
+                '#f': Boolean(False)}[pid]
+
+    def find_class(self, module, name):
+        if module == __name__ and name == '_compiled_function':
+            return self.compiled_function
+        if module == __name__ and name == '_snapshot':
+            return self.snapshot
+        return super().find_class(module, name)
+
+    def compiled_function(self, params, body, scope, frame, stg):
+        func = slyther.compiler.CompiledFunction(
+            params, body, scope, frame, stg, None)
+
+        def compile_on_first_call(frame):
+            func.code = slyther.compiler._compile_body(body, stg, scope)
+            return func.code(frame)
+        func.code = compile_on_first_call
+        return func
+
+    def snapshot(self, local, size, extra, parent):
+        # The global variables are still being loaded, so they are copied
+        # in once everything has been.
+        env = Environment((), parent)
+        self.snapshots.append((env, local, size, extra))
+        return env
+
+    def fill_snapshots(self):
+        # Smallest first, growing a plain dictionary of the global
+        # variables as we go: copying from a ``dict`` is much faster than
+        # from an iterator.
+        self.snapshots.sort(key=operator.itemgetter(2))
+        prefixes = {}
+        for env, local, size, extra in self.snapshots:
+            prefix = prefixes.get(id(local))
+            if prefix is None:
+                prefix = prefixes[id(local)] = ({}, iter(local.items()))
+            variables, rest = prefix
+            if len(variables) < size:
+                variables.update(islice(rest, size - len(variables)))
+            env.update(variables)
+            env.update(extra)
+
+
+def dump(interp, file):
+    """
+    Write an image of ``interp`` to the binary ``file``.
+    """
+    file.write(_header())
+    _Pickler(file, interp.stg).dump(
+        {'engine': interp.engine, 'stg': interp.stg})
+
+
+def load(file, engine=None, max_depth=1000000):
+    """
+    Read an image written by ``dump`` from the binary ``file``, returning a
+    new ``Interpreter``, which uses ``engine`` (or the engine of the
+    interpreter saved, if ``None``) and ``max_depth``.
+    """
+    from slyther.interpreter import Interpreter
+    header = _header()
+    data = file.read(len(header))
+    if data[:len(MAGIC)] != MAGIC:
+        raise ImageError("not a SlytherLisp image")
+    if data != header:
+        raise ImageError("image was saved by a different interpreter version")
+    unpickler = _Unpickler(file)
+    # Nothing loaded can be garbage yet, so don't let the collector look.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        state = unpickler.load()
+        unpickler.fill_snapshots()
+    finally:
+        if enabled:
+            gc.enable()
+    return Interpreter(engine or state['engine'], stg=state['stg'],
+                       max_depth=max_depth)
@@ -1,9 +1,10 @@
-from functools import partial
+import os
+
 import slyther.builtins
-from slyther.types import (BuiltinCallable, NIL, LexicalVarStorage, Variable,
-                           Boolean)
+from slyther.types import NIL, LexicalVarStorage, Variable, Boolean
 from slyther.evaluator import lisp_eval
 from slyther.parser import lex, parse
+import slyther.locations
 
 
 class Interpreter:
@@ -13,15 +14,45 @@ class Interpreter:
     ``LexicalVarStorage`` for you.
 
     An interpreter gets constructed for you in ``slyther.__main__``.
+
+    ``engine`` selects how expressions are evaluated:
+
+    :``'ast'``: walk the abstract syntax tree using ``lisp_eval``.
+    :``'closure'``: compile each expression to Python closures first (see
+        ``slyther.compiler``).
+    :``'bytecode'``: compile each expression to bytecode and run it on a
+        stack based virtual machine (see ``slyther.bytecode``).
+
+    With ``locations`` set, source locations are tracked in ``srcmap`` (see
+    ``slyther.locations``) and errors report where they happened.
+
+    ``max_depth`` limits how deep the ``'bytecode'`` engine lets programs
+    recurse (``None`` for no limit but memory). It keeps the frames of calls
+    in progress on a list rather than Python's stack, so this is the engine
+    for deeply recursive programs; the other engines are limited by Python's
+    recursion limit instead (which the ``'closure'`` engine raises while it
+    runs, see ``slyther.compiler.execute``).
+
+    ``stg`` starts the interpreter with an existing global storage instead
+    of a fresh one (this is how images are loaded, see ``slyther.image``).
     """
-    def __init__(self):
+    engines = ('ast', 'closure', 'bytecode')
+
+    def __init__(self, engine='ast', locations=False, stg=None,
+                 max_depth=1000000):
+        if engine not in self.engines:
+            raise ValueError("unknown engine {!r}".format(engine))
+        self.engine = engine
+        self.max_depth = max_depth
+        self.srcmap = None
+        if locations:
+            self.srcmap = slyther.locations.SourceMap()
+        if stg is not None:
+            self.stg = stg
+            return
         # load builtins out of slyther.bulitins
-        builtins = {
-            x.__name__: Variable(x)
-            for x in map(
-                partial(getattr, slyther.builtins),
-                slyther.builtins.__dir__())
-            if isinstance(x, BuiltinCallable)}
+        builtins = {name: Variable(x)
+                    for name, x in slyther.builtins.table.items()}
         # put in the default variables
         builtins.update({
             'NIL': Variable(NIL),
@@ -35,19 +66,151 @@ class Interpreter:
         """
         Eval a single (parsed) lisp expression.
         """
+        outer = slyther.locations.current
+        slyther.locations.current = self.srcmap
         try:
+            if self.engine == 'closure':
+                # the engines are imported once chosen, to start faster
+                from slyther import compiler
+                return compiler.execute(compiler.compile_expr(expr, self.stg))
+            if self.engine == 'bytecode':
+                from slyther import bytecode
+                return bytecode.run(bytecode.compile_code(expr, self.stg),
+                                    self.stg, self.max_depth)
             return lisp_eval(expr, self.stg)
         except RecursionError as e:
             raise RecursionError(
                 "Maximum recursion depth exceeded while evaluating {!r}"
                 .format(expr)) from e
+        except (KeyError, TypeError) as e:
+            slyther.locations.locate(e, expr)
+            raise
+        finally:
+            slyther.locations.current = outer
+
+    def profile(self):
+        """
+        Return a ``slyther.profiler.Profiler`` for this interpreter, which
+        records the calls made while it is running::
+
+            with interp.profile() as profile:
+                interp.exec(code)
+            profile.report()
+        """
+        import slyther.profiler
+        return slyther.profiler.Profiler(self.stg, srcmap=self.srcmap)
+
+    def cache_stats(self):
+        """
+        Return the hit and miss counts of the closure engine's inline caches
+        for the global variables of this interpreter. Like ``stats``, they
+        are only counted while ``slyther.stats`` is enabled.
+        """
+        import slyther.compiler
+        stats = slyther.compiler.cache_stats_for(self.stg)
+        return {'hits': stats.hits, 'misses': stats.misses}
+
+    def stats(self):
+        """
+        Return the counts of hot path work collected by ``slyther.stats``,
+        which only counts once enabled::
+
+            with slyther.stats.counting():
+                interp.exec(code)
+            interp.stats()
+
+        The counts are kept for the whole process, not for this interpreter:
+        they include the work of every interpreter run while counting.
+        """
+        import slyther.stats
+        return slyther.stats.snapshot()
 
-    def exec(self, code):
+    def parse(self, code, filename=None):
+        """
+        Parse ``code`` (a string, file object or ``mmap``), recording
+        source locations if they are turned on.
+        """
+        srcmap = self.srcmap
+        if srcmap is None:
+            return parse(lex(code))
+        srcmap.reset(filename)
+        return parse(lex(code, srcmap=srcmap), srcmap)
+
+    def exec(self, code, filename=None):
         """
         Execute the string ``code`` on the interpreter,
         returning the result of the last evaluation.
         """
         r = NIL
-        for expr in parse(lex(code)):
+        for expr in self.parse(code, filename):
             r = self.eval(expr)
         return r
+
+    def exec_stream(self, stream, filename=None):
+        """
+        Execute code read from ``stream`` (a file object or an ``mmap``),
+        returning the result of the last evaluation. Each top-level form
+        is evaluated as soon as it has been parsed, so the whole program is
+        never held in memory at once.
+        """
+        if filename is None:
+            filename = getattr(stream, 'name', None)
+        return self.exec(stream, filename)
+
+    def exec_file(self, path, cache=True, cache_dir=None):
+        """
+        Execute the file at ``path``, returning the result of the last
+        evaluation.
+
+        With ``cache`` set, the parsed forms are kept in a ``.slyc`` file
+        (see ``slyther.cache``) and read back from it next time instead of
+        parsing the file again, as long as the file has not changed. The
+        cache is not used when source locations are turned on, as it does
+        not record them.
+
+        Without a usable cache, each form is evaluated as soon as it has
+        been parsed, just like ``exec_stream``, and written to the new cache
+        as it goes, so the forms of a large file are not all kept in memory.
+        """
+        if not cache or self.srcmap is not None:
+            with open(path, encoding='utf-8') as f:
+                return self.exec_stream(f, path)
+        # imported here to keep hashlib out of startup when not caching
+        import mmap
+        import slyther.cache
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                # an empty file cannot be mapped, and has nothing to run
+                return NIL
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                forms = slyther.cache.read_cache(path, source, cache_dir)
+                if forms is not None:
+                    r = NIL
+                    for expr in forms:
+                        r = self.eval(expr)
+                    return r
+                r = NIL
+                with slyther.cache.CacheWriter(path, source,
+                                               cache_dir) as writer:
+                    for expr in parse(lex(source)):
+                        writer.write(expr)
+                        r = self.eval(expr)
+                return r
+
+    def save_image(self, path):
+        """
+        Save everything defined so far to an image at ``path``.
+        """
+        import slyther.image
+        with open(path, 'wb') as f:
+            slyther.image.dump(self, f)
+
+    @classmethod
+    def from_image(cls, path, engine=None, max_depth=1000000):
+        """
+        Make an interpreter from the image saved at ``path``. It uses the
+        engine of the interpreter saved unless ``engine`` is given.
+        """
+        import slyther.image
+        with open(path, 'rb') as f:
+            return slyther.image.load(f, engine, max_depth)
@@ -0,0 +1,182 @@
+"""
+Optional source locations for SlytherLisp programs.
+
+Locations are off by default and cost nothing then. To turn them on, pass a
+``SourceMap`` to both ``lex`` and ``parse``:
+
+>>> from slyther.parser import lex, parse
+>>> srcmap = SourceMap('example.scm')
+>>> se = next(parse(lex('\\n  (print\\n (f 1))', srcmap=srcmap), srcmap))
+>>> srcmap.span(se)
+Span(line=2, column=3, offset=3, end=17, filename='example.scm')
+>>> srcmap.span(se.cdr.car)
+Span(line=3, column=2, offset=11, end=16, filename='example.scm')
+
+The lexer keeps the ``(line, column, offset, end)`` of the token it emitted
+last in ``token``, which the parser (consuming the tokens as they are made)
+uses to record the span of each s-expression. These live in a side table
+keyed by the identity of the node, not on the cells themselves.
+
+``SyntaxError`` from the lexer or parser then carries a line and column, and
+a ``KeyError`` or ``TypeError`` raised while evaluating a located
+s-expression is given a ``location`` attribute and a note naming it (added
+to its ``args`` before Python 3.11, which has no notes):
+
+>>> from slyther.interpreter import Interpreter
+>>> interp = Interpreter(locations=True)
+>>> try:
+...     interp.exec('(define x 1)\\n(+ x (car y))', 'example.scm')
+... except KeyError as e:
+...     print(e.location)
+...     print(describe(e.location))
+Span(line=2, column=6, offset=18, end=25, filename='example.scm')
+example.scm, line 2, column 6
+
+Each interpreter has its own source map, which it makes ``current`` while
+it evaluates. It keeps the spans of each source it parsed (so errors in
+functions defined by an earlier ``exec`` or ``--load``-ed file are still
+located), until there are more than ``max_nodes`` of them, when the spans
+of the sources parsed first are dropped.
+"""
+from collections import deque, namedtuple
+
+__all__ = ['Span', 'SourceMap', 'describe', 'locate']
+
+
+Span = namedtuple('Span', ['line', 'column', 'offset', 'end', 'filename'])
+Span.__new__.__defaults__ = (None,)
+Span.__doc__ = """
+Where a token or s-expression is in the source: the ``line`` and ``column``
+(counting from 1) and ``offset`` (from 0) of its first character, the
+offset just past its last character, and the name of the file (if known).
+"""
+
+
+def describe(span):
+    """
+    Return ``span`` in words, such as ``'line 2, column 6'``.
+    """
+    where = 'line {}, column {}'.format(span.line, span.column)
+    if span.filename is not None:
+        where = '{}, {}'.format(span.filename, where)
+    return where
+
+
+# The source map of the interpreter evaluating now, searched by ``locate``.
+# ``None`` unless it has locations turned on.
+current = None
+
+
+class SourceMap:
+    """
+    The spans of the s-expressions parsed from each source, and the
+    position of the lexer within the source being parsed now.
+
+    Each node is kept alive along with its span (so that its ``id`` is not
+    reused), so to keep them from piling up, once more than ``max_nodes``
+    are kept the spans of the oldest sources are dropped, whole sources at
+    a time, when the next source is started.
+    """
+    __slots__ = ('filename', 'nodes', 'sources', 'size', 'max_nodes', 'line',
+                 'column', 'offset', 'token')
+
+    def __init__(self, filename=None, max_nodes=1 << 19):
+        self.filename = filename
+        # id -> (node, span, the list of ids of its source)
+        self.nodes = {}
+        # the list of the ids of the nodes of each source, oldest first
+        self.sources = deque([[]])
+        self.size = 0
+        self.max_nodes = max_nodes
+        self.line = 1
+        self.column = 1
+        self.offset = 0
+        self.token = None
+
+    def advance(self, text):
+        """
+        Move the position past ``text``, setting ``token`` to its span.
+        """
+        end = self.offset + len(text)
+        self.token = (self.line, self.column, self.offset, end)
+        newlines = text.count('\n')
+        if newlines:
+            self.line += newlines
+            self.column = len(text) - text.rfind('\n')
+        else:
+            self.column += len(text)
+        self.offset = end
+
+    def reset(self, filename=None):
+        """
+        Start positions over for a new source, keeping the spans recorded
+        for the sources before it, unless there are too many.
+        """
+        self.filename = filename
+        self.line = 1
+        self.column = 1
+        self.offset = 0
+        self.token = None
+        nodes = self.nodes
+        while self.size > self.max_nodes and len(self.sources) > 1:
+            ids = self.sources.popleft()
+            for key in ids:
+                entry = nodes.get(key)
+                if entry is not None and entry[2] is ids:
+                    del nodes[key]
+            self.size -= len(ids)
+        if self.sources[-1]:
+            self.sources.append([])
+
+    def add(self, node, span, ids=None):
+        # the node is kept alive with its span so its id is not reused
+        if ids is None:
+            ids = self.sources[-1]
+        self.nodes[id(node)] = (node, span, ids)
+        ids.append(id(node))
+        self.size += 1
+
+    def copy(self, old, new):
+        """
+        Give the node ``new`` the span of the node ``old``, if it has one.
+        """
+        entry = self.nodes.get(id(old))
+        if entry is not None and entry[0] is old:
+            self.add(new, entry[1], entry[2])
+
+    def span(self, node):
+        """
+        Return the ``Span`` of ``node``, or ``None`` if it is not known.
+        """
+        entry = self.nodes.get(id(node))
+        if entry is not None and entry[0] is node:
+            return entry[1]
+        return None
+
+    def syntax_error(self, message):
+        """
+        Return a ``SyntaxError`` located at the last token.
+        """
+        if self.token is None:
+            return SyntaxError(message)
+        line, column, _, _ = self.token
+        return SyntaxError(message, (self.filename, line, column, None))
+
+
+def locate(exc, node):
+    """
+    Give ``exc`` the location of ``node`` if it has none yet and ``node``
+    was parsed (by the ``current`` source map) with locations turned on.
+    """
+    srcmap = current
+    if srcmap is None or hasattr(exc, 'location'):
+        return
+    span = srcmap.span(node)
+    if span is None:
+        return
+    exc.location = span
+    note = '  at ' + describe(span)
+    if hasattr(exc, 'add_note'):
+        exc.add_note(note)
+    else:
+        exc.args += (note,)
@@ -0,0 +1,176 @@
+"""
+Memoization of SlytherLisp functions: a ``Memoized`` function remembers the
+result of each call, so calling it again with the same arguments returns
+the result without running the function. ``memoize`` and ``define-memo``
+(in ``slyther.builtins``) make them:
+
+>>> from slyther.interpreter import Interpreter
+>>> interp = Interpreter()
+>>> interp.exec('''
+... (define-memo (fib n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))
+... (fib 80)''')
+23416728348467685
+>>> interp.exec('(memo-size fib)')
+81
+
+The results are kept in order of use, and once there are ``maxsize`` of
+them the least recently used is forgotten to make room for the next (so
+``maxsize`` bounds the memory used, while the results used most stay).
+
+The arguments of a call are its key. Numbers, strings, symbols, booleans
+and ``NIL`` are compared by value, and so are cons lists: two lists with
+the same elements are the same key, however they were made, since no
+builtin can change a list once made. The type of each value, in a list or
+not, is part of the key, so ``1`` and ``1.0`` (or the string ``"a"`` and
+the symbol ``a``) are not confused. Vectors can be changed with
+``vector-set!``, so a call with a vector argument raises a ``TypeError``
+rather than risk returning the result for what the vector held before.
+Anything else, such as a function, is compared by identity.
+
+Only use it for functions which always return the same result for the same
+arguments and do nothing else: a memoized call which is remembered does
+not run at all.
+"""
+from collections import OrderedDict
+
+from slyther.types import ConsCell, ConsList, Function, Quoted, Vector
+
+__all__ = ['Memoized', 'call_key']
+
+
+def _atom_key(x):
+    if isinstance(x, Vector):
+        raise TypeError("can't memoize a call with a vector argument "
+                        "(it may change)")
+    try:
+        hash(x)
+    except TypeError:
+        raise TypeError("can't memoize a call with a {} argument".format(
+            type(x).__name__)) from None
+    return (type(x), x)
+
+
+def _value_key(value):
+    """
+    Return the key of ``value``: ``(type, value)`` for an atom, or the type
+    and the keys of the parts of a cons cell, list or quoted expression.
+    Built without recursion, so deeply nested values are no problem.
+    """
+    # the keys of the values done so far, and the values still to do, or
+    # ``(tag, n)`` to gather the last ``n`` keys done into one
+    done = []
+    todo = [value]
+    while todo:
+        x = todo.pop()
+        if type(x) is tuple:
+            tag, n = x
+            parts = tuple(done[len(done) - n:])
+            del done[len(done) - n:]
+            done.append((tag, parts))
+            continue
+        if isinstance(x, ConsList):
+            tag, parts = ConsList, list(x)
+        elif isinstance(x, ConsCell):
+            tag, parts = ConsCell, [x.car, x.cdr]
+        elif isinstance(x, Quoted):
+            tag, parts = Quoted, [x.elem]
+        else:
+            done.append(_atom_key(x))
+            continue
+        todo.append((tag, len(parts)))
+        todo.extend(reversed(parts))
+    return done[0]
+
+
+def call_key(args):
+    """
+    Return the key for a call with ``args``, which compares equal to the
+    key of another call exactly when the arguments have the same values.
+
+    >>> from slyther.types import String, Symbol
+    >>> call_key([1, ConsList.from_iterable([2, 3])]) == call_key(
+    ...     [1, ConsList(2, ConsList(3))])
+    True
+    >>> call_key([1]) == call_key([1.0])
+    False
+    >>> call_key([String('a')]) == call_key([Symbol('a')])
+    False
+    >>> call_key([ConsList(1)]) == call_key([ConsList(1.0)])
+    False
+    >>> call_key([ConsList(Vector())])
+    Traceback (most recent call last):
+        ...
+    TypeError: can't memoize a call with a vector argument (it may change)
+    >>> call_key([Vector([1])])
+    Traceback (most recent call last):
+        ...
+    TypeError: can't memoize a call with a vector argument (it may change)
+    """
+    return tuple(_value_key(x) for x in args)
+
+
+class Memoized(Function):
+    """
+    Wraps ``function``, remembering the results of the last ``maxsize``
+    calls (or every call, for ``None``). ``hits`` and ``misses`` count the
+    calls which were and were not remembered.
+    """
+    def __init__(self, function, maxsize=1024):
+        if not isinstance(function, Function):
+            raise TypeError("can't memoize {!r}, which is not a "
+                            "function".format(function))
+        self.function = function
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.maxsize = None
+        self.resize(maxsize)
+
+    def __call__(self, *args):
+        key = call_key(args)
+        cache = self.cache
+        try:
+            result = cache[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            cache.move_to_end(key)
+            return result
+        self.misses += 1
+        result = self.function(*args)
+        cache[key] = result
+        if self.maxsize is not None and len(cache) > self.maxsize:
+            cache.popitem(last=False)
+        return result
+
+    def resize(self, maxsize):
+        """
+        Keep at most ``maxsize`` results (``None`` for no limit), forgetting
+        the least recently used beyond that.
+        """
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("maxsize must be at least 0")
+        self.maxsize = maxsize
+        if maxsize is not None:
+            while len(self.cache) > maxsize:
+                self.cache.popitem(last=False)
+
+    def clear(self):
+        """
+        Forget every result, and the counts of hits and misses.
+        """
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def hit_rate(self):
+        """
+        Return the fraction of calls which were remembered (0.0 before any
+        call).
+        """
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    def __repr__(self):
+        return '(memoize {!r})'.format(self.function)
@@ -9,11 +9,13 @@ This module defines parsing utilities in SlytherLisp.
 <class 'slyther.types.SExpression'>
 
 """
+import codecs
 import re
-from slyther.types import SExpression, Symbol, String, Quoted, NIL
+from slyther.types import SExpression, Symbol, String, Quoted, Vector, NIL
+from slyther.locations import Span
 
 __all__ = ['lex', 'parse', 'lisp', 'parse_strlit', 'ControlToken', 'LParen',
-           'RParen', 'Quote']
+           'RParen', 'Quote', 'VectorParen']
 
 
 class ControlToken:
@@ -51,7 +53,117 @@ class Quote(ControlToken):
     pass
 
 
-def lex(code):
+class VectorParen(ControlToken):
+    """
+    The ``#(`` which opens a vector literal, closed by an ``RParen``.
+    """
+    pass
+
+
+# The tokens of the language as one regular expression, tried in order at
+# each position. Anything else matches ``error``.
+_token_re = re.compile(r"""
+    (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<quote>')
+  | (?P<whitespace>\s+)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<float>-?\d+\.\d*|-?\d*\.\d+)
+  | (?P<int>[-+]?[0-9]+)
+  | (?P<vector>\#\()
+  | (?P<symbol>[^\s\d.'"();][^\s'"();]*)
+  | (?P<comment>;[^\n]*)
+  | (?P<error>.|\n)
+""", re.VERBOSE)
+_shebang_re = re.compile(r'#![^\n]*\n?')
+_control_tokens = {
+    'lparen': LParen(),
+    'rparen': RParen(),
+    'quote': Quote(),
+    'vector': VectorParen(),
+}
+_converters = {
+    'symbol': Symbol,
+    'int': int,
+    'float': float,
+}
+
+
+def _read_chunks(stream, chunk_size):
+    """
+    Read ``stream`` a chunk at a time, decoding bytes as UTF-8.
+    """
+    decoder = None
+    while True:
+        data = stream.read(chunk_size)
+        chunk = data
+        if not isinstance(data, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8')()
+            chunk = decoder.decode(data, final=not data)
+        if chunk:
+            yield chunk
+        if not data:
+            return
+
+
+def _stream_matches(stream, chunk_size, srcmap):
+    """
+    Match tokens in ``stream`` like ``_token_re.finditer`` does for a
+    string. A match running to the end of the buffer might continue in the
+    next chunk (as might an error, such as a string which is not closed
+    yet), so those are matched again once more has been read.
+    """
+    chunks = _read_chunks(stream, chunk_size)
+    buf = ''
+    eof = False
+    # read far enough to skip a shebang line
+    while not eof and (len(buf) < 2
+                       or buf.startswith('#!') and '\n' not in buf):
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+        else:
+            buf += chunk
+    pos = _shebang_re.match(buf).end() if buf.startswith('#!') else 0
+    if srcmap is not None:
+        srcmap.advance(buf[:pos])
+    while True:
+        match = _token_re.match(buf, pos)
+        if not eof and (match is None
+                        or match.end() == len(buf)
+                        or match.lastgroup == 'error'):
+            chunk = next(chunks, None)
+            if chunk is None:
+                eof = True
+            else:
+                buf = buf[pos:] + chunk
+                pos = 0
+            continue
+        if match is None:
+            return
+        pos = match.end()
+        yield match
+
+
+def _located(matches, srcmap):
+    """
+    Pass ``matches`` through, moving ``srcmap`` past each (the matches
+    cover every character, whitespace and comments included).
+    """
+    advance = srcmap.advance
+    for match in matches:
+        advance(match.group())
+        yield match
+
+
+def _syntax_error(message, srcmap):
+    if srcmap is None:
+        return SyntaxError(message)
+    return srcmap.syntax_error(message)
+
+
+def lex(code, chunk_size=1 << 16, srcmap=None):
     r"""
     IMPORTANT: read this entire docstring before implementing this function!
     Please ask for help on Piazza or come to office hours if you don't
@@ -207,73 +319,79 @@ def lex(code):
     [LParen, Quote, RParen]
     >>> list(lex("'"))
     [Quote]
+
+    A ``#(`` opens a vector literal, which is closed by a right parenthesis:
+
+    >>> list(lex("#(1 2.0)"))
+    [VectorParen, 1, 2.0, RParen]
+
+    Besides a string, ``code`` may be a file object (text or binary) or an
+    ``mmap``, which is read a chunk at a time. Tokens are yielded as soon
+    as they are complete, even when they span chunks:
+
+    >>> import io
+    >>> list(lex(io.StringIO('(print "split ; string")'), chunk_size=4))
+    [LParen, print, "split ; string", RParen]
+
+    Given a ``slyther.locations.SourceMap``, the lexer keeps track of where
+    each token is, and errors say where they happened:
+
+    >>> from slyther.locations import SourceMap
+    >>> try:
+    ...     list(lex('(print\n  .oops)', srcmap=SourceMap('oops.scm')))
+    ... except SyntaxError as e:
+    ...     print(e, e.lineno, e.offset)
+    malformed tokens in input (oops.scm, line 2) 2 3
     """
-    regex_array = [
-        re.compile(r'\('),  # lparen 0
-        re.compile(r'\)'),  # rparen 1
-        re.compile(r'\''),  # quote 2
-        re.compile(r'\s+'),  # whitespace 3
-        re.compile(r'"([^"\\]|\\.)*"'),  # string 4
-        re.compile(r'(-?\d+\.\d*)|(-?\d*\.\d+)'),  # float 5
-        re.compile(r'[-+]?[0-9]+'),  # int 6
-        re.compile(r'^#.*?[$\n]'),  # shebang 7
-        re.compile(r'[^\s\d\.\'"\(\)\;][^\s\'"\(\);]*'),  # symbol 8
-        re.compile(r';.*$', re.MULTILINE)  # comments 9
-    ]
-
-    position = 0
-    while(position < len(code)):
-        for i in range(0, len(regex_array)):
-            match = regex_array[i].match(code, position)
-            if i == 0:
-                if match is not None:
-                    yield LParen("LParen")
-                    position = match.end()
-                    break
-            if i == 1:
-                if match is not None:
-                    yield RParen("RParen")
-                    position = match.end()
-                    break
-            if i == 2:
-                if match is not None:
-                    yield Quote("Quote")
-                    position = match.end()
-                    break
-            if i == 3:
-                if match is not None:
-                    position = match.end()
-                    break
-            if i == 4:
-                if match is not None:
-                    yield parse_strlit(match.group(0))
-                    position = match.end()
-                    break
-            if i == 5:
-                if match is not None:
-                    yield float(match.group(0))
-                    position = match.end()
-                    break
-            if i == 6:
-                if match is not None:
-                    yield int(match.group(0))
-                    position = match.end()
-                    break
-            if i == 7:
-                if match is not None:
-                    position = match.end()
-                    break
-            if i == 8:
-                if match is not None:
-                    yield Symbol(match.group(0))
-                    position = match.end()
-                    break
-            if i == 9:
-                if match is not None:
-                    position = match.end()
-                    break
-                else:
-                    raise SyntaxError("malformed tokens in input")
+    if isinstance(code, str):
+        if code.startswith('#!'):
+            position = _shebang_re.match(code).end()
+        else:
+            position = 0
+        matches = _token_re.finditer(code, position)
+        if srcmap is not None:
+            srcmap.advance(code[:position])
+    else:
+        matches = _stream_matches(code, chunk_size, srcmap)
+    if srcmap is not None:
+        matches = _located(matches, srcmap)
+    for match in matches:
+        kind = match.lastgroup
+        if kind in _control_tokens:
+            yield _control_tokens[kind]
+        elif kind in _converters:
+            yield _converters[kind](match.group())
+        elif kind == 'string':
+            yield parse_strlit(match.group())
+        elif kind == 'error':
+            raise _syntax_error("malformed tokens in input", srcmap)
+
+
+_escape_re = re.compile(r'\\(x[0-9a-fA-F]{2}|0[0-7]{2}|[\s\S])?')
+_escapes = {
+    'a': '\x07',
+    'b': '\x08',
+    'e': '\x1b',
+    'f': '\x0c',
+    'n': '\x0a',
+    'r': '\x0d',
+    't': '\x09',
+    'v': '\x0b',
+    '"': '\x22',
+    '\\': '\x5c',
+    '0': '\x00',
+}
+
+
+def _unescape(match):
+    """
+    Translate one escape sequence matched by ``_escape_re``. Anything not
+    in the table is left alone.
+    """
+    esc = match.group(1)
+    if esc is None or len(esc) == 1:
+        return _escapes.get(esc, match.group())
+    return chr(int(esc[1:], 16 if esc[0] == 'x' else 8))
 
 
 def parse_strlit(tok):
@@ -341,66 +459,13 @@ def parse_strlit(tok):
     you should not use any of Python's string literal processing
     utilities for this: tl;dr do it yourself.
     """
-    result = ""
     tok = tok[1:-1]  # get rid of the double quote
-    m = re.compile(r'''
-                (\\a)|  #1
-                (\\b)|  #2
-                (\\e)|  #3
-                (\\f)|  #4
-                (\\n)|  #5
-                (\\r)|  #6
-                (\\t)|  #7
-                (\\v)|  #8
-                (\\\")| #9
-                (\\\\)| #10
-                (\\x([0-9a-fA-F][0-9a-fA-F]))| #11, #12
-                (\\0([0-7][0-7]))| #13 #14
-                (\\0)| #15
-                (\\)| #16
-                (.) #17''', re.VERBOSE)
-
-    for item in m.finditer(tok):
-        if item.group(1):
-            result += "\x07"
-        elif item.group(2):
-            result += "\x08"
-        elif item.group(3):
-            result += "\x1b"
-        elif item.group(4):
-            result += "\x0c"
-        elif item.group(5):
-            result += "\x0a"
-        elif item.group(6):
-            result += "\x0d"
-        elif item.group(7):
-            result += "\x09"
-        elif item.group(8):
-            result += "\x0b"
-        elif item.group(9):
-            result += "\x22"
-        elif item.group(10):
-            result += "\x5c"
-        elif item.group(16):
-            result += "\\"
-        elif item.group(15):
-            result += "\x00"
-        elif item.group(11):
-            reference = int(item.group(12), 16)
-            character = chr(reference)
-            result += character
-        elif item.group(13):
-            reference = int(item.group(14), 8)
-            character = chr(reference)
-            result += character
-        elif item.group(17):  # any characters
-            result += item.group(17)
-
-    result = String(result)  # put the double quotes back into the result.
-    return result
-
-
-def parse(tokens):
+    if '\\' not in tok:
+        return String(tok)
+    return String(_escape_re.sub(_unescape, tok))
+
+
+def parse(tokens, srcmap=None):
     r"""
     This *generator function* takes a generator object from the ``lex``
     function and generates AST elements.
@@ -441,6 +506,11 @@ def parse(tokens):
     >>> Quoted(SExpression.from_iterable([1, 2, 3]))
     '(1 2 3)
 
+    A vector literal parses to a ``Vector`` of its (unevaluated) elements:
+
+    >>> next(parse(iter([VectorParen(), 1, s('x'), lp, 2, rp, rp])))
+    #(1 x (2))
+
     Not only can s-expressions be quoted, but practically anything can. In
     addition, things can be quoted multiple times.
 
@@ -516,62 +586,45 @@ def parse(tokens):
         ...
     SyntaxError: invalid quotation
     """
-    result = []
-
+    # Each open list is a frame on ``stack``: the token which opened it, its
+    # elements so far, the number of quotes waiting for its next element,
+    # and where it started (if ``srcmap`` is tracking locations). The
+    # innermost frame is kept in locals.
+    stack = []
+    opener, items, quotes, start = None, None, 0, None
     for item in tokens:
-        if not isinstance(item, RParen):
-            # Adding elements in the result list except closed paren
-            result.append(item)
-        else:  # if item is rp, then we start to process the elements
-            cdr = NIL
-            while True:  # process the content in ()
-                if len(result) > 0:
-                    last_item = result[-1]  # get the last item in the list
-                    del result[-1]
-                else:
-                    # Detect the extra right paren
-                    raise SyntaxError("too many closing parens")
-                # Wrap up the content between open paren and closed paren
-                if isinstance(last_item, LParen):
-                    result.append(cdr)
-                    break
-                elif isinstance(last_item, Quote):
-                    # Quote can't be followed by right Paren
-                    raise SyntaxError("invalid quotation")
-                else:
-                    # If the last item in the result list is not controlToken
-                    # then set them into from_iterable expression
-                    cdr = SExpression(last_item, cdr)
-            # If we still have unprocessed symbol with quote inside a
-            # parenthesis eg: ( 'define ([processed part]
-            if len(result) > 1:
-                # Get the quote in a result list
-                while isinstance(result[len(result) - 2], Quote):
-                    if len(result) < 2:  # cases that exit the loop.
-                        break
-                    last_item = result[-1]
-                    del result[-1]
-                    # Delete the quote from the result list
-                    del result[-1]
-                    result.append(Quoted(last_item))
-            if len(result) == 1:
-                yield result.pop()  # usually this will yield the left paren
-        # When the Quote shows up outside the first paren,
-        # we need to process this first.
-        # After process the content inside ()
-        if not isinstance(item, ControlToken):
-            if len(result) > 1:
-                while isinstance(result[len(result) - 2], Quote):
-                    if len(result) < 2:
-                        break
-                    last_item = result[-1]
-                    del result[-1]
-                    del result[-1]
-                    result.append(Quoted(last_item))
-            if len(result) == 1:
-                yield result.pop()
-    if len(result) != 0:
-        raise SyntaxError("incomplete parse")
+        if isinstance(item, ControlToken):
+            if isinstance(item, (LParen, VectorParen)):
+                stack.append((opener, items, quotes, start))
+                opener, items, quotes = item, [], 0
+                if srcmap is not None:
+                    start = srcmap.token
+                continue
+            if isinstance(item, Quote):
+                quotes += 1
+                continue
+            # a right paren closes the innermost list, and cannot be quoted
+            if quotes:
+                raise _syntax_error("invalid quotation", srcmap)
+            if not stack:
+                raise _syntax_error("too many closing parens", srcmap)
+            if isinstance(opener, VectorParen):
+                item = Vector(items)
+            else:
+                item = SExpression.from_iterable(items)
+            if srcmap is not None and item is not NIL:
+                srcmap.add(item, Span(start[0], start[1], start[2],
+                                      srcmap.token[3], srcmap.filename))
+            opener, items, quotes, start = stack.pop()
+        while quotes:
+            item = Quoted(item)
+            quotes -= 1
+        if stack:
+            items.append(item)
+        else:
+            yield item
+    if stack or quotes:
+        raise _syntax_error("incomplete parse", srcmap)
 
 
 def lisp(code: str):
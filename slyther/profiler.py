@@ -0,0 +1,333 @@
+"""
+A profiler for SlytherLisp programs. For each user function and builtin
+called while it runs, it records how many times it was called, the time
+spent in it (inclusive of what it called, and exclusive), and how many times
+it called itself in tail position:
+
+>>> from slyther.interpreter import Interpreter
+>>> interp = Interpreter()
+>>> interp.exec('''
+... (define (count-down n) (if (= n 0) 0 (count-down (- n 1))))
+... (define (fact n) (if (= n 0) 1 (* n (fact (- n 1)))))''')
+NIL
+>>> with interp.profile() as profile:
+...     interp.exec('(count-down 10) (fact 5)')
+120
+>>> for stats in profile.results(sort='name'):
+...     print(stats.name, stats.calls, stats.primitive_calls, stats.tail_calls)
+* 5 5 0
+- 15 15 0
+= 17 17 0
+count-down 1 1 10
+fact 6 1 0
+
+A function which calls itself in tail position runs in a loop, so those
+calls count as iterations (``tail_calls``) of the call already running. A
+tail call to a different function ends the caller's call and starts the
+callee's in its place, just as the engines run it. ``primitive_calls`` are
+the calls which were not made (directly or indirectly) from another call to
+the same function; only their time counts towards ``inclusive``, so that
+recursion is not counted twice.
+
+``report`` prints a table of the results, ``write_pstats`` saves them in
+the format of Python's ``cProfile`` (to browse with ``pstats``), and
+``write_collapsed`` saves the time spent in each stack of calls in the
+collapsed format read by flame graph tools.
+
+The engines only look for a profiler when calling a function, and do
+nothing more while none is running. Functions are told apart by their body,
+so closures made from the same ``lambda`` are counted together. Macros are
+not profiled; in the ``'closure'`` and ``'bytecode'`` engines the special
+forms are compiled away, so they could not be anyway.
+"""
+import sys
+import time
+
+from slyther.types import UserFunction, NIL
+
+__all__ = ['Profiler', 'FunctionStats']
+
+# The running profiler, if any. The engines check this on each call.
+active = None
+
+
+class FunctionStats:
+    """
+    What a ``Profiler`` recorded for one function. ``callers`` maps the key
+    of each calling function (``None`` for top-level code) to the
+    ``[calls, primitive_calls, exclusive, inclusive]`` of its calls to this
+    one.
+    """
+    __slots__ = ('function', 'name', 'calls', 'primitive_calls',
+                 'tail_calls', 'inclusive', 'exclusive', 'callers')
+
+    def __init__(self, function):
+        self.function = function
+        self.name = None
+        self.calls = 0
+        self.primitive_calls = 0
+        self.tail_calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.callers = {}
+
+    def __repr__(self):
+        return ('FunctionStats({!r}, calls={}, tail_calls={}, '
+                'inclusive={:.6f}, exclusive={:.6f})'.format(
+                    self.name, self.calls, self.tail_calls, self.inclusive,
+                    self.exclusive))
+
+
+def _key(func):
+    # closures of the same lambda share their body
+    if isinstance(func, UserFunction):
+        return id(func.body), 'user'
+    return id(func), 'builtin'
+
+
+class Profiler:
+    """
+    Records the calls made while it is running (between ``start`` and
+    ``stop``, or inside a ``with`` block). ``stg`` is the global storage of
+    the interpreter being profiled, used to name the functions defined in
+    it, and ``srcmap`` its ``SourceMap``, if any, used to find where they
+    were defined.
+    """
+    sort_keys = ('exclusive', 'inclusive', 'calls', 'name')
+
+    def __init__(self, stg=None, clock=time.perf_counter, srcmap=None):
+        self.stg = stg
+        self.srcmap = srcmap
+        self.clock = clock
+        self.stats = {}
+        # the calls running, innermost last, each a list of
+        # [key, start time, time in callees, stack of keys, primitive?]
+        self.stack = []
+        # how many calls to each function are running
+        self.running = {}
+        # the exclusive time of each stack of calls
+        self.stacks = {}
+        self.previous = None
+
+    def start(self):
+        """
+        Start recording, replacing any profiler already running until
+        ``stop``.
+        """
+        global active
+        self.previous = active
+        active = self
+
+    def stop(self):
+        """
+        Stop recording.
+        """
+        global active
+        active = self.previous
+        self.previous = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def enter(self, func):
+        """
+        Note the start of a call to ``func``.
+        """
+        now = self.clock()
+        key = _key(func)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = FunctionStats(func)
+        stats.calls += 1
+        running = self.running.get(key, 0)
+        self.running[key] = running + 1
+        primitive = not running
+        if primitive:
+            stats.primitive_calls += 1
+        if self.stack:
+            caller = self.stack[-1]
+            path = caller[3] + (key, )
+            caller_key = caller[0]
+        else:
+            path = (key, )
+            caller_key = None
+        edge = stats.callers.get(caller_key)
+        if edge is None:
+            edge = stats.callers[caller_key] = [0, 0, 0.0, 0.0]
+        edge[0] += 1
+        if primitive:
+            edge[1] += 1
+        self.stack.append([key, now, 0.0, path, primitive])
+
+    def exit(self):
+        """
+        Note the end of the innermost call running.
+        """
+        now = self.clock()
+        key, start, inner, path, primitive = self.stack.pop()
+        elapsed = now - start
+        own = elapsed - inner
+        stats = self.stats[key]
+        stats.exclusive += own
+        self.running[key] -= 1
+        caller_key = self.stack[-1][0] if self.stack else None
+        edge = stats.callers[caller_key]
+        edge[2] += own
+        if primitive:
+            stats.inclusive += elapsed
+            edge[3] += elapsed
+        self.stacks[path] = self.stacks.get(path, 0.0) + own
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def tail(self, func):
+        """
+        Note a tail call to ``func`` by the innermost call running.
+        """
+        if self.stack and self.stack[-1][0] == _key(func):
+            self.stats[self.stack[-1][0]].tail_calls += 1
+            return
+        if self.stack:
+            self.exit()
+        self.enter(func)
+
+    def call(self, func, args):
+        """
+        Call ``func`` with ``args``, recording the call.
+        """
+        self.enter(func)
+        try:
+            return func(*args)
+        finally:
+            self.exit()
+
+    def unwind(self, depth):
+        """
+        End the calls running beyond the first ``depth``, such as after an
+        error escaped from them.
+        """
+        while len(self.stack) > depth:
+            self.exit()
+
+    def names(self):
+        """
+        Name each function profiled: by the global variable it is bound to,
+        its own name for builtins, otherwise by its parameters.
+        """
+        names = {}
+        if self.stg is not None:
+            for name, var in reversed(list(self.stg.local.items())):
+                names[_key(var.value)] = str(name)
+        for key, stats in self.stats.items():
+            name = names.get(key)
+            if name is None:
+                func = stats.function
+                if isinstance(func, UserFunction):
+                    name = '(lambda ({}))'.format(' '.join(func.params))
+                else:
+                    name = getattr(func, '__name__', repr(func))
+            stats.name = name
+        return {key: stats.name for key, stats in self.stats.items()}
+
+    def results(self, sort='exclusive'):
+        """
+        Return the ``FunctionStats`` of each function called, sorted by
+        ``sort`` (one of ``sort_keys``; the largest first, except by name).
+        """
+        if sort not in self.sort_keys:
+            raise ValueError("can't sort by {!r}".format(sort))
+        self.names()
+        results = list(self.stats.values())
+        if sort == 'name':
+            results.sort(key=lambda stats: stats.name)
+        else:
+            results.sort(key=lambda stats: getattr(stats, sort),
+                         reverse=True)
+        return results
+
+    def report(self, file=None, sort='exclusive', limit=None):
+        """
+        Print a table of the results to ``file`` (standard error by
+        default), at most ``limit`` rows of them.
+        """
+        if file is None:
+            file = sys.stderr
+        print('{:>9} {:>9} {:>11} {:>11} {:>11}  {}'.format(
+            'calls', 'tail', 'inclusive', 'exclusive', 'per call',
+            'function'), file=file)
+        for stats in self.results(sort)[:limit]:
+            calls = str(stats.calls)
+            if stats.primitive_calls != stats.calls:
+                calls = '{}/{}'.format(stats.calls, stats.primitive_calls)
+            print('{:>9} {:>9} {:>11.6f} {:>11.6f} {:>11.6f}  {}'.format(
+                calls, stats.tail_calls, stats.inclusive, stats.exclusive,
+                stats.exclusive / stats.calls, stats.name), file=file)
+
+    def location(self, func):
+        """
+        Return the file name and line where the user function ``func`` was
+        defined, or ``('<slyther>', 0)`` if it is not known.
+        """
+        if self.srcmap is not None and func.body is not NIL:
+            span = self.srcmap.span(func.body.car)
+            if span is not None:
+                return span.filename or '<slyther>', span.line
+        return '<slyther>', 0
+
+    def pstats(self):
+        """
+        Return the results as the dictionary ``pstats.Stats`` works with,
+        keyed by ``(file name, line, function name)``.
+
+        Functions which would have the same key (such as two lambdas with
+        the same parameters, when the lines they were defined on are not
+        known) are told apart by putting the ``id`` of all but the first in
+        place of the line.
+        """
+        names = self.names()
+        labels = {}
+        taken = set()
+        for key, stats in self.stats.items():
+            if key[1] == 'builtin':
+                label = ('~', 0, names[key])
+            else:
+                label = self.location(stats.function) + (names[key], )
+            if label in taken:
+                label = (label[0], key[0], label[2])
+            taken.add(label)
+            labels[key] = label
+        table = {}
+        for key, stats in self.stats.items():
+            callers = {labels[caller]: (edge[0], edge[1], edge[2], edge[3])
+                       for caller, edge in stats.callers.items()
+                       if caller is not None}
+            table[labels[key]] = (stats.primitive_calls, stats.calls,
+                                  stats.exclusive, stats.inclusive, callers)
+        return table
+
+    def write_pstats(self, path):
+        """
+        Save the results to ``path`` in the format written by ``cProfile``,
+        which ``pstats.Stats(path)`` reads.
+        """
+        import marshal
+        with open(path, 'wb') as f:
+            marshal.dump(self.pstats(), f)
+
+    def write_collapsed(self, path):
+        """
+        Save the exclusive time (in microseconds) of each stack of calls to
+        ``path``, one ``caller;callee;... time`` line per stack, as read by
+        ``flamegraph.pl`` and similar tools.
+        """
+        names = self.names()
+        lines = sorted(
+            '{} {}\n'.format(';'.join(names[key] for key in stack),
+                             round(own * 1e6))
+            for stack, own in self.stacks.items())
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
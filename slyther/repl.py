@@ -1,6 +1,3 @@
-from prompt_toolkit import prompt
-from prompt_toolkit.history import FileHistory
-
 def repl(interpreter, debug=False):
     """
     Take an interpreter object (see ``slyther/interpreter.py``) and give a REPL
@@ -33,6 +30,10 @@ def repl(interpreter, debug=False):
     is set to ``True``, as it allows for easy post-mortem debugging with pdb
     or pudb.
     """
+    # prompt_toolkit is slow to import, so keep it out of startup when the
+    # REPL is not used
+    from prompt_toolkit import prompt
+    from prompt_toolkit.history import FileHistory
     while True:
         try:
             expr = prompt('>', history=FileHistory('history.txt'),)
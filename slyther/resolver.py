@@ -0,0 +1,189 @@
+"""
+Lexical addressing for compiled SlytherLisp functions.
+
+When a function is compiled, every name it can bind (its parameters, then
+anything it ``define``-s) is given a slot in a ``Scope``. A variable
+reference in the body is resolved to a ``(depth, slot)`` pair: how many
+enclosing functions to walk out, and which slot to read there. At runtime
+each call allocates a fixed-size list, a *frame*, with the value of each
+slot followed by the frame of the enclosing function.
+
+>>> from slyther.parser import lisp
+>>> outer = Scope(lisp('(n)'), lisp('((define stop (* n n)) stop)'))
+>>> outer.names
+[n, stop]
+>>> inner = Scope(lisp('(x)'), NIL, outer)
+>>> inner.resolve('x')
+(0, 0)
+>>> inner.resolve('stop')
+(1, 1)
+>>> inner.resolve('print') is None
+True
+>>> frame = new_frame(inner, [10], new_frame(outer, [3], None))
+>>> lookup(frame, *inner.resolve('n'))
+3
+
+Names which do not resolve are global (or late-bound), and are looked up in
+the global table at runtime instead.
+"""
+from slyther.types import NIL, SExpression, Symbol, Variable
+
+__all__ = ['Scope', 'UNBOUND', 'new_frame', 'lookup', 'defined_names',
+           'SlotVariable', 'frame_bindings']
+
+
+class Unbound:
+    """
+    The type of ``UNBOUND``, the value of a slot which has not been
+    assigned yet (such as a ``define`` which has not run).
+    """
+    def __repr__(self):
+        return 'UNBOUND'
+
+
+UNBOUND = Unbound()
+
+
+def defined_names(body):
+    """
+    Return the names ``define``-d in ``body``, not counting those inside
+    nested ``lambda`` or ``let`` forms (which bind in their own scope).
+    """
+    names = []
+    todo = list(body)
+    while todo:
+        x = todo.pop()
+        if not isinstance(x, SExpression):
+            continue
+        if not isinstance(x.car, Symbol):
+            todo.extend(x)
+        elif x.car in ('define', 'define-memo') and x.cdr is not NIL:
+            key = x.cdr.car
+            if isinstance(key, SExpression):
+                names.append(key.car)
+                continue
+            names.append(key)
+        elif x.car in ('lambda', 'let'):
+            if x.car == 'let' and isinstance(x.cdr.car, SExpression):
+                todo.extend(item.cdr.car for item in x.cdr.car
+                            if isinstance(item, SExpression))
+            continue
+        todo.extend(x)
+    names.reverse()
+    return names
+
+
+class Scope:
+    """
+    The names bound by one function, in slot order: the parameters first,
+    then the names it defines. ``parent`` is the scope of the enclosing
+    function, or ``None`` for the top level. ``captured`` is set once a
+    frame of this scope may be referred to by something which outlives the
+    call (see ``capture``).
+    """
+    __slots__ = ('names', 'slots', 'nparams', 'parent', 'captured')
+
+    def __init__(self, params, body=NIL, parent=None):
+        self.names = []
+        self.slots = {}
+        for name in params:
+            self.add(name)
+        self.nparams = len(self.names)
+        for name in defined_names(body):
+            self.add(name)
+        self.parent = parent
+        self.captured = False
+
+    def capture(self):
+        """
+        Note that a frame of this scope (and so the frames it links to) is
+        referred to by a closure, so frames of this scope and those
+        enclosing it can no longer be reused by tail calls.
+        """
+        scope = self
+        while scope is not None and not scope.captured:
+            scope.captured = True
+            scope = scope.parent
+
+    def add(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.names)
+            self.names.append(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def resolve(self, name):
+        """
+        Return ``(depth, slot)`` for ``name``, or ``None`` if it is not
+        bound by this scope or any enclosing scope.
+        """
+        depth = 0
+        scope = self
+        while scope is not None:
+            slot = scope.slots.get(name)
+            if slot is not None:
+                return depth, slot
+            scope = scope.parent
+            depth += 1
+        return None
+
+
+def new_frame(scope, args, parent):
+    """
+    Allocate the frame for a call in ``scope``, binding ``args`` to the
+    parameters positionally.
+    """
+    nparams = scope.nparams
+    if len(args) > nparams:
+        args = args[:nparams]
+    frame = list(args)
+    frame.extend([UNBOUND] * (len(scope) - len(frame)))
+    frame.append(parent)
+    return frame
+
+
+def lookup(frame, depth, slot):
+    """
+    Read the value at ``(depth, slot)`` starting from ``frame``.
+    """
+    for _ in range(depth):
+        frame = frame[-1]
+    return frame[slot]
+
+
+class SlotVariable(Variable):
+    """
+    A ``Variable`` which reads and writes a frame slot, used to hand a
+    compiled frame to code which expects a ``LexicalVarStorage``.
+    """
+    __slots__ = ('frame', 'slot')
+
+    def __init__(self, frame, slot):
+        self.frame = frame
+        self.slot = slot
+
+    @property
+    def value(self):
+        return self.frame[self.slot]
+
+    @value.setter
+    def value(self, value):
+        self.frame[self.slot] = value
+
+
+def frame_bindings(scope, frame):
+    """
+    Return a dictionary of ``SlotVariable`` for every bound slot in
+    ``frame`` and its enclosing frames, innermost taking precedence.
+    """
+    chain = []
+    while scope is not None:
+        chain.append((scope, frame))
+        scope, frame = scope.parent, frame[-1]
+    bindings = {}
+    for scope, frame in reversed(chain):
+        for name, slot in scope.slots.items():
+            if frame[slot] is not UNBOUND:
+                bindings[name] = SlotVariable(frame, slot)
+    return bindings
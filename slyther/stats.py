@@ -0,0 +1,270 @@
+"""
+Counters of the work the interpreter does on its hot paths: how many
+expressions of each type ``lisp_eval`` evaluated, variable lookups,
+environments forked for closures (and how many variables they copied),
+frames allocated for calls, tail calls, macro expansions, builtin calls and
+cons cells made. Where the profiler says *which* functions take the time,
+these say *what* the engines spend it on:
+
+>>> from slyther.interpreter import Interpreter
+>>> from slyther.parser import lisp
+>>> interp = Interpreter()
+>>> interp.exec('(define (count-down n) (if (= n 0) 0 (count-down (- n 1))))')
+NIL
+>>> expr = lisp('(count-down 3)')
+>>> with counting():
+...     interp.eval(expr)
+0
+>>> for name, count in interp.stats().items():
+...     print(name, count)
+evaluations {'BuiltinFunction': 7, 'SExpression': 15, 'Symbol': 15, 'int': 9}
+lookups 15
+forks 0
+fork_entries 0
+frames 1
+user_calls 4
+tail_calls 3
+macro_expansions 4
+builtin_calls 7
+cons_cells 0
+
+Counting is off unless turned on with ``enable`` (or inside a ``with
+counting()`` block), and then costs nothing at all: rather than each hot
+path checking whether to count, ``enable`` swaps counting versions of the
+functions and methods involved into place, and ``disable`` swaps the
+originals back. The counts are kept until ``reset``. ``lisp_eval`` is
+swapped for ``slyther.evaluator.counting_eval`` by rebinding the name in
+each ``slyther`` module which calls it.
+
+The counts are kept for the whole process, not for each interpreter: every
+interpreter running while counting is enabled adds to the same counts.
+
+What is counted where:
+
+:``evaluations``: expressions evaluated by ``lisp_eval``, by type name
+    (each step of its loop, so the expansion of a macro and the body of a
+    function called in tail position count as well).
+:``lookups``: calls to ``LexicalVarStorage.__getitem__``. The compiled
+    engines resolve most names when compiling, so only count the rest.
+:``forks``, ``fork_entries``: calls to ``LexicalVarStorage.fork``, and the
+    local variables each copied.
+:``frames``: storage made by ``UserFunction.bind`` and frames made by
+    ``CompiledFunction.make_frame``.
+:``user_calls``: calls to user functions, by ``lisp_eval`` or through
+    ``UserFunction.__call__``.
+:``tail_calls``: calls made in tail position by ``lisp_eval`` (in place of
+    the call running) and ``TailCall`` trampolines of the ``'closure'``
+    engine.
+:``macro_expansions``, ``builtin_calls``: calls to builtin macros and
+    functions through ``BuiltinCallable.__call__``.
+:``cons_cells``: ``ConsCell`` and ``ConsList`` cells made, including by
+    ``ConsList.from_iterable``.
+
+The ``'bytecode'`` engine runs calls and tail calls inside its virtual
+machine, so for it only the lookups, forks, builtin calls and cons cells
+are counted.
+
+The hits and misses of the ``'closure'`` engine's inline caches for global
+variables are counted while counting is enabled as well, separately for
+each interpreter (see ``Interpreter.cache_stats``).
+"""
+import sys
+from contextlib import contextmanager
+
+from slyther.types import (ConsCell, ConsList, LexicalVarStorage, Macro,
+                           UserFunction, BuiltinCallable)
+
+__all__ = ['Counters', 'counters', 'enable', 'disable', 'enabled', 'reset',
+           'counting', 'snapshot']
+
+
+class Counters:
+    """
+    The counts collected while counting is enabled.
+    """
+    __slots__ = ('evaluations', 'lookups', 'forks', 'fork_entries', 'frames',
+                 'user_calls', 'tail_calls', 'macro_expansions',
+                 'builtin_calls', 'cons_cells')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # keyed by type, which is cheaper than its name
+        self.evaluations = {}
+        self.lookups = 0
+        self.forks = 0
+        self.fork_entries = 0
+        self.frames = 0
+        self.user_calls = 0
+        self.tail_calls = 0
+        self.macro_expansions = 0
+        self.builtin_calls = 0
+        self.cons_cells = 0
+
+    def __repr__(self):
+        return 'Counters({})'.format(', '.join(
+            '{}={!r}'.format(name, value)
+            for name, value in snapshot(self).items()))
+
+
+counters = Counters()
+
+# (owner, attribute, original) of each thing swapped in by ``enable``
+_swapped = []
+
+
+def _counting_getitem(getitem):
+    def __getitem__(self, key):
+        counters.lookups += 1
+        return getitem(self, key)
+    return __getitem__
+
+
+def _counting_fork(fork):
+    def fork_(self):
+        counters.forks += 1
+        counters.fork_entries += len(self.local)
+        return fork(self)
+    return fork_
+
+
+def _counting_frames(make):
+    def make_(self, args):
+        counters.frames += 1
+        return make(self, args)
+    return make_
+
+
+def _counting_user_call(call):
+    def __call__(self, *args):
+        counters.user_calls += 1
+        return call(self, *args)
+    return __call__
+
+
+def _counting_builtin_call(call):
+    def __call__(self, *args, **kwargs):
+        if isinstance(self, Macro):
+            counters.macro_expansions += 1
+        else:
+            counters.builtin_calls += 1
+        return call(self, *args, **kwargs)
+    return __call__
+
+
+def _counting_init(init):
+    def __init__(self, *args, **kwargs):
+        counters.cons_cells += 1
+        init(self, *args, **kwargs)
+    return __init__
+
+
+def _counting_from_iterable(from_iterable):
+    func = from_iterable.__func__
+
+    def from_iterable_(cls, it):
+        # other iterables are made with ``cls(...)``, counted already
+        if isinstance(it, (list, tuple)):
+            counters.cons_cells += len(it)
+        return func(cls, it)
+    return classmethod(from_iterable_)
+
+
+def _counting_tail_call(init):
+    def __init__(self, func, args):
+        counters.tail_calls += 1
+        init(self, func, args)
+    return __init__
+
+
+def enable():
+    """
+    Start counting. Does nothing if counting already.
+    """
+    # avoid circular imports
+    from slyther import evaluator, compiler
+    if _swapped:
+        return
+    swaps = [
+        (LexicalVarStorage, '__getitem__', _counting_getitem),
+        (LexicalVarStorage, 'fork', _counting_fork),
+        (UserFunction, 'bind', _counting_frames),
+        (compiler.CompiledFunction, 'make_frame', _counting_frames),
+        (UserFunction, '__call__', _counting_user_call),
+        (BuiltinCallable, '__call__', _counting_builtin_call),
+        (ConsCell, '__init__', _counting_init),
+        (ConsList, '__init__', _counting_init),
+        (ConsList, 'from_iterable', _counting_from_iterable),
+        (compiler.TailCall, '__init__', _counting_tail_call),
+    ]
+    for owner, name, counting in swaps:
+        original = owner.__dict__[name]
+        _swapped.append((owner, name, original))
+        setattr(owner, name, counting(original))
+    _swapped.append((compiler, 'count_caches', compiler.count_caches))
+    compiler.count_caches = True
+    # modules call lisp_eval (and it calls itself) by its name in the
+    # module, so bind that name to the counting version in each of them
+    plain = evaluator.lisp_eval
+    for name, module in list(sys.modules.items()):
+        if ((name == 'slyther' or name.startswith('slyther.'))
+                and getattr(module, 'lisp_eval', None) is plain):
+            _swapped.append((module, 'lisp_eval', plain))
+            module.lisp_eval = evaluator.counting_eval
+
+
+def disable():
+    """
+    Stop counting, keeping the counts.
+    """
+    while _swapped:
+        owner, name, original = _swapped.pop()
+        setattr(owner, name, original)
+
+
+def enabled():
+    """
+    Return whether counting is enabled.
+    """
+    return bool(_swapped)
+
+
+def reset():
+    """
+    Set all the counts back to zero, the inline cache counts of the
+    ``'closure'`` engine included.
+    """
+    from slyther import compiler
+    counters.reset()
+    compiler.reset_cache_stats()
+
+
+@contextmanager
+def counting():
+    """
+    Count inside a ``with`` block, from zero. Counting stays enabled after
+    the block if it was before it.
+    """
+    was_enabled = enabled()
+    reset()
+    enable()
+    try:
+        yield counters
+    finally:
+        if not was_enabled:
+            disable()
+
+
+def snapshot(counts=None):
+    """
+    Return the counts (``counters`` by default) as a dictionary.
+    """
+    if counts is None:
+        counts = counters
+    result = {'evaluations': {
+        t.__name__: count for t, count in sorted(
+            counts.evaluations.items(), key=lambda item: item[0].__name__)}}
+    for name in Counters.__slots__[1:]:
+        result[name] = getattr(counts, name)
+    return result
@@ -1,5 +1,5 @@
 import collections.abc as abc
-from typing import Dict
+from array import array
 from functools import partial, update_wrapper
 
 
@@ -16,15 +16,13 @@ class ConsCell:
     >>> cell.car
     4
     """
+    __slots__ = ('car', 'cdr')
+
     def __init__(self, car, cdr):
         self.car = car
         self.cdr = cdr
 
     def __eq__(self, other):
-        if isinstance(self, type(other)):
-            return other.car == self.car and other.cdr == other.cdr
-        else:
-            return False
         """
         Two cons cells are equal if each of their ``car`` and
         ``cdr`` are equal:
@@ -46,8 +44,14 @@ class ConsCell:
 
         Should return ``False`` if ``other`` is not an instance of a
         ``ConsCell``.
+
+        >>> a == (1, 2)
+        False
+
+        Cells are compared without recursion, so however long or deeply
+        nested, comparing them cannot overflow the stack.
         """
-        return "(cons {!r} {!r})".format(self.car, self.cdr)
+        return isinstance(other, ConsCell) and _equal(self, other)
 
     def __repr__(self):
         """
@@ -67,6 +71,23 @@ class ConsCell:
         return "(cons {!r} {!r})".format(self.car, self.cdr)
 
 
+# Lists built by ``from_iterable`` (and so ``list`` and the parser) are
+# frozen: each cell records its length, stamped with the epoch below.
+# Assigning the ``cdr`` of a frozen cell starts a new epoch, which
+# invalidates every recorded length at once, since we cannot find the cells
+# which point at the one that changed. Cells which were never frozen leave
+# those slots unset, and the slot setters are used directly since
+# ``ConsList.__setattr__`` is slow.
+#
+# Only frozen lists can be hashed, and hashing a list locks it: its head
+# records the hash and every cell records ``None`` (unless it has a hash of
+# its own), and the ``car`` and ``cdr`` of a locked cell cannot be assigned,
+# so the recorded hashes never go stale.
+_epoch = 0
+_set_car = ConsCell.car.__set__
+_set_cdr = ConsCell.cdr.__set__
+
+
 class ConsList(ConsCell, abc.Sequence):
     """
     A ``ConsList`` inherits from a ``ConsCell``, but the ``cdr`` must
@@ -82,6 +103,8 @@ class ConsList(ConsCell, abc.Sequence):
         ...
     TypeError: cdr must be a ConsList
     """
+    __slots__ = ('_len', '_epoch', '_hash')
+
     def __init__(self, car, cdr=None):
         """
         If the ``cdr`` was not provided, assume to be ``NIL``.
@@ -90,14 +113,76 @@ class ConsList(ConsCell, abc.Sequence):
         >>> cell.cdr
         NIL
         """
-        self.car = car
+        _set_car(self, car)
         if (cdr is None):
-            self.cdr = NIL
+            _set_cdr(self, NIL)
         elif isinstance(cdr, ConsList):
-            self.cdr = cdr
+            _set_cdr(self, cdr)
         else:
             raise TypeError("cdr must be a ConsList")
 
+    def __setattr__(self, name, value):
+        """
+        Assigning the ``cdr`` of a frozen cell invalidates the recorded
+        lengths. The ``car`` has no bearing on the length.
+
+        >>> lst = ConsList.from_iterable([1, 2, 3])
+        >>> tail = lst.cdr
+        >>> tail.cdr = NIL
+        >>> len(lst), len(tail)
+        (2, 1)
+
+        Neither can be assigned once the list has been hashed, as that would
+        change its hash:
+
+        >>> table = {lst: 'found'}
+        >>> tail.car = 5
+        Traceback (most recent call last):
+            ...
+        TypeError: can't assign the car of a hashed list
+        """
+        global _epoch
+        if name == 'car' or name == 'cdr':
+            try:
+                self._hash
+            except AttributeError:
+                pass
+            else:
+                raise TypeError(
+                    "can't assign the {} of a hashed list".format(name))
+            if name == 'cdr':
+                try:
+                    if self._epoch == _epoch:
+                        _epoch += 1
+                except AttributeError:
+                    pass
+        object.__setattr__(self, name, value)
+
+    def freeze(self):
+        """
+        Record the length of this list and each of its tails, so ``len`` is
+        O(1) until a ``cdr`` of a frozen cell is assigned. Return ``self``.
+
+        >>> lst = ConsList(1, ConsList(2)).freeze()
+        >>> len(lst), len(lst.cdr)
+        (2, 1)
+
+        :Time complexity: O(n), where n is the length of the list.
+        :Space complexity: O(1)
+        """
+        size = 0
+        cell = self
+        while cell is not NIL:
+            size += 1
+            cell = cell.cdr
+        cell = self
+        while cell is not NIL:
+            _set_len(cell, size)
+            _set_epoch(cell, _epoch)
+            size -= 1
+            cell = cell.cdr
+        return self
+
     @classmethod
     def from_iterable(cls, it):
         """
@@ -116,6 +201,19 @@ class ConsList(ConsCell, abc.Sequence):
         :Space complexity: O(n) ``ConsList`` objects,
                            O(1) everything else (including stack frames!)
         """
+        if isinstance(it, (list, tuple)):
+            # cons from the back, recording lengths as we go
+            cell = NIL
+            size = 0
+            for item in reversed(it):
+                size += 1
+                new_cell = object.__new__(cls)
+                _set_car(new_cell, item)
+                _set_cdr(new_cell, cell)
+                _set_len(new_cell, size)
+                _set_epoch(new_cell, _epoch)
+                cell = new_cell
+            return cell
         gen = iter(it)  # turn the it into generator
         try:
             cell = cls(next(gen))
@@ -123,9 +221,10 @@ class ConsList(ConsCell, abc.Sequence):
             return NIL
         next_cell = cell
         for i in gen:
-            next_cell.cdr = cls(i)  # move to the next generator
-            next_cell = next_cell.cdr
-        return cell  # return the cell
+            new_cell = cls(i)
+            _set_cdr(next_cell, new_cell)  # move to the next generator
+            next_cell = new_cell
+        return cell.freeze()  # return the cell
 
     def __getitem__(self, idx):
         """
@@ -201,9 +300,17 @@ class ConsList(ConsCell, abc.Sequence):
 
         Note: Your implementation is subject to the following constraints:
 
-        :Time complexity: O(n), where n is the length of the list.
+        :Time complexity: O(n), where n is the length of the list,
+                          O(1) if the list is frozen.
         :Space complexity: O(1)
         """
+        try:
+            if self._epoch == _epoch:
+                return self._len
+            # a frozen list which was mutated, record the new length
+            return self.freeze()._len
+        except AttributeError:
+            pass
         size = 0
         while self is not NIL:
             size += 1
@@ -304,21 +411,64 @@ class ConsList(ConsCell, abc.Sequence):
         False
         >>> SExpression.from_iterable(l2) == NIL
         False
-        """
-        while self is not NIL and other is not NIL:
-            if isinstance(self, type(other)):
-                if self.car != other.car:
-                    return False
+        >>> SExpression.from_iterable(l2) == l2
+        True
+        >>> l2 == 'abc'
+        False
 
-            self = self.cdr
-            other = other.cdr
+        Neither long nor deeply nested lists are compared by recursion, so
+        comparing them cannot overflow the stack:
 
-        if self is NIL and other is not NIL:
-            return False
-        if other is NIL and self is not NIL:
-            return False
+        >>> l1, l2 = (ConsList.from_iterable(range(10 ** 5)) for _ in 'ab')
+        >>> l1 == l2
+        True
+        >>> deep1, deep2 = NIL, NIL
+        >>> for _ in range(10 ** 5):
+        ...     deep1, deep2 = ConsList(deep1), ConsList(deep2)
+        >>> deep1 == deep2
+        True
 
-        return True
+        :Time complexity: O(n), where n is the number of cells in both
+                          lists, O(1) if they are frozen and their lengths
+                          or hashes differ.
+        :Space complexity: O(d), where d is how deeply they are nested.
+        """
+        return isinstance(other, ConsCell) and _equal(self, other)
+
+    def __hash__(self):
+        """
+        Hash the list by its elements, so equal lists hash the same and
+        lists can be used as dictionary keys (as long as their elements
+        can). Only frozen lists (see ``freeze``), and the lists nested in
+        them, can be hashed. Hashing a list locks it, so that it cannot
+        change under a dictionary key: assigning the ``car`` or ``cdr`` of
+        any of its cells raises ``TypeError`` from then on. The hash is
+        recorded, so hashing it again is O(1).
+
+        >>> lst = ConsList.from_iterable([1, ConsList(2).freeze(), 'x'])
+        >>> hash(lst) == hash(SExpression.from_iterable(
+        ...     [1, ConsList(2).freeze(), 'x']))
+        True
+        >>> {lst: 'found'}[ConsList.from_iterable(
+        ...     [1, ConsList(2).freeze(), 'x'])]
+        'found'
+        >>> hash(ConsList(1))
+        Traceback (most recent call last):
+            ...
+        TypeError: unhashable type: unfrozen 'ConsList'
+        >>> hash(ConsList(Vector()).freeze())
+        Traceback (most recent call last):
+            ...
+        TypeError: unhashable type: 'Vector'
+
+        :Time complexity: O(n), where n is the number of cells in the list
+                          (and any nested in it), O(1) once recorded.
+        :Space complexity: O(d), where d is how deeply it is nested.
+        """
+        known = _known_hash(self)
+        if known is not None:
+            return known
+        return _hash_list(self)
 
     def __repr__(self):
         """
@@ -331,10 +481,17 @@ class ConsList(ConsCell, abc.Sequence):
         return '(list {})'.format(list_object)
 
 
+_set_len = ConsList._len.__set__
+_set_epoch = ConsList._epoch.__set__
+_set_hash = ConsList._hash.__set__
+
+
 class NilType(ConsList):
     """
     The type for the global ``NIL`` object.
     """
+    __slots__ = ()
+
     def __new__(cls):
         """
         If already constructed, don't make another. Just
@@ -348,8 +505,16 @@ class NilType(ConsList):
         """
         The ``car`` and ``cdr`` of ``NIL`` are ``NIL``.
         """
-        self.car = self
-        self.cdr = self
+        _set_car(self, self)
+        _set_cdr(self, self)
+        _set_len(self, 0)
+        _set_epoch(self, -1)
+
+    def freeze(self):
+        return self
+
+    def __len__(self):
+        return 0
 
     def __bool__(self):
         """
@@ -363,6 +528,9 @@ class NilType(ConsList):
         """
         return self is other
 
+    def __hash__(self):
+        return _EMPTY_HASH
+
     def __repr__(self):
         """
         Represent ourselves
@@ -371,9 +539,145 @@ class NilType(ConsList):
         return 'NIL'
 
 
+_EMPTY_HASH = hash(())
+
 NIL = NilType()
 
 
+def _hashable(lst):
+    # make sure ``lst`` is frozen, with its lengths up to date
+    if _known_len(lst) is None:
+        try:
+            lst._epoch
+        except AttributeError:
+            raise TypeError("unhashable type: unfrozen {!r}".format(
+                type(lst).__name__)) from None
+        lst.freeze()
+
+
+def _lock(head, h):
+    # record the hash of ``head``, locking each of its cells
+    cell = head.cdr
+    while cell is not NIL:
+        try:
+            cell._hash
+        except AttributeError:
+            _set_hash(cell, None)
+        cell = cell.cdr
+    _set_hash(head, h)
+
+
+def _hash_list(lst):
+    """
+    Hash ``lst`` by its elements, the lists nested in it first (without
+    recursion), recording the hash of each and locking them (see
+    ``ConsList.__hash__``). Raises ``TypeError`` if any of them is not
+    frozen.
+    """
+    _hashable(lst)
+    # (head, cell, items so far) of each list whose element is being hashed
+    stack = []
+    head = cell = lst
+    items = []
+    while True:
+        while cell is not NIL:
+            item = cell.car
+            # (ConsList is an ABC, so checking for it is slow)
+            if (isinstance(item, ConsCell) and item is not NIL
+                    and isinstance(item, ConsList)):
+                known = _known_hash(item)
+                if known is None:
+                    break
+                item = known
+            items.append(item)
+            cell = cell.cdr
+        else:
+            h = hash(tuple(items))
+            _lock(head, h)
+            if not stack:
+                return h
+            head, cell, items = stack.pop()
+            items.append(h)
+            cell = cell.cdr
+            continue
+        _hashable(item)
+        stack.append((head, cell, items))
+        head = cell = item
+        items = []
+
+
+def _known_len(lst):
+    # the recorded length of ``lst``, or ``None``
+    try:
+        if lst._epoch == _epoch:
+            return lst._len
+    except AttributeError:
+        pass
+    return None
+
+
+def _known_hash(lst):
+    # the recorded hash of ``lst``, or ``None``
+    try:
+        return lst._hash
+    except AttributeError:
+        return None
+
+
+def _equal(x, y):
+    """
+    Compare ``x`` and ``y`` (cons cells, lists and quoted expressions by
+    their contents, anything else by ``==``) without recursion: the nested
+    pairs left to compare are kept on a stack instead. Like ``==`` on each
+    element, not even the same object is taken to be equal to itself (so a
+    list holding ``nan`` is not equal to itself).
+    """
+    nested = (ConsCell, Quoted)
+    pending = []
+    while True:
+        if isinstance(x, ConsList) and isinstance(y, ConsList):
+            for known in (_known_len, _known_hash):
+                a, b = known(x), known(y)
+                if a is not None and b is not None and a != b:
+                    return False
+            # the cdr of a list is always a list, so only NIL ends it
+            while x is not NIL and y is not NIL:
+                a = x.car
+                b = y.car
+                if isinstance(a, nested):
+                    pending.append((a, b))
+                elif isinstance(b, nested) or a != b:
+                    return False
+                x = x.cdr
+                y = y.cdr
+        while True:
+            if x is NIL or y is NIL:
+                if x is not y:
+                    return False
+                break
+            if isinstance(x, ConsCell):
+                if (not isinstance(y, ConsCell)
+                        or isinstance(x, ConsList) != isinstance(y, ConsList)):
+                    return False
+                a, b = x.car, y.car
+                if isinstance(a, nested):
+                    pending.append((a, b))
+                elif isinstance(b, nested) or a != b:
+                    return False
+                x, y = x.cdr, y.cdr
+            elif isinstance(x, Quoted):
+                if not isinstance(y, Quoted):
+                    return False
+                x, y = x.elem, y.elem
+            elif isinstance(y, nested) or x != y:
+                return False
+            else:
+                break
+        if not pending:
+            return True
+        x, y = pending.pop()
+
+
 class Boolean:
     """
     Type for a boolean with SlytherLisp evaluable representation.
@@ -413,6 +717,8 @@ class SExpression(ConsList):
     >>> SExpression(4)
     (4)
     """
+    __slots__ = ()
+
     def __repr__(self):
         return '({})'.format(' '.join(map(repr, self)))
 
@@ -443,6 +749,78 @@ def cons(car, cdr) -> ConsCell:
         return ConsCell(car, cdr)
 
 
+class Vector(abc.Sequence):
+    """
+    A fixed length container with O(1) random access. Vectors where every
+    element is an ``int`` (or every element is a ``float``) are stored in
+    an ``array.array``; storing anything else falls back to a ``list``.
+
+    >>> v = Vector([1, 2, 3])
+    >>> v
+    #(1 2 3)
+    >>> v.items
+    array('q', [1, 2, 3])
+    >>> v[1] = 2.5
+    >>> v.items
+    [1, 2.5, 3]
+    >>> len(v), v[2]
+    (3, 3)
+    >>> Vector([1, 2.5, 3]) == v
+    True
+    """
+    __slots__ = ('items', )
+
+    typecodes = {int: 'q', float: 'd'}
+    types = {code: t for t, code in typecodes.items()}
+
+    def __init__(self, items=()):
+        items = list(items)
+        self.items = items
+        if items:
+            kinds = set(map(type, items))
+            if len(kinds) == 1 and kinds <= self.typecodes.keys():
+                try:
+                    self.items = array(self.typecodes[kinds.pop()], items)
+                except OverflowError:
+                    pass
+
+    def __getitem__(self, idx):
+        return self.items[idx]
+
+    def __setitem__(self, idx, value):
+        items = self.items
+        if type(items) is array:
+            try:
+                if type(value) is self.types[items.typecode]:
+                    items[idx] = value
+                    return
+            except OverflowError:
+                pass
+            items = self.items = list(items)
+        items[idx] = value
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __bool__(self):
+        """ Like lists, only ``NIL`` is falsy. """
+        return True
+
+    def __eq__(self, other):
+        if not isinstance(other, Vector):
+            return False
+        return len(self) == len(other) and all(
+            a == b for a, b in zip(self.items, other.items))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '#({})'.format(' '.join(map(repr, self.items)))
+
+
 class Variable:
     """
     A simple wrapper to reference an object. The reference may change using the
@@ -455,30 +833,149 @@ class Variable:
     Note: ``Variable`` will never appear in an abstract syntax tree. Its sole
     purpose is to be used with the ``LexicalVariableStorage``.
     """
+    __slots__ = ('value',)
+
     def __init__(self, value):
-        self.set(value)
+        self.value = value
 
     def set(self, value):
         self.value = value
 
 
+class Environment(dict):
+    """
+    A single frame of lexically scoped variables, linked to the frame
+    which encloses it. Only the bindings of this frame are stored in
+    the dictionary itself; lookups which miss walk outward through
+    ``parent`` without copying anything.
+
+    >>> outer = {'x': Variable(10), 'y': Variable(11)}
+    >>> env = Environment({'y': Variable(12)}, outer)
+    >>> env['x'].value
+    10
+    >>> env['y'].value
+    12
+    >>> 'x' in env
+    True
+    >>> env['foo']
+    Traceback (most recent call last):
+        ...
+    KeyError: 'foo'
+
+    For everything other than lookup, an ``Environment`` behaves like the
+    union of all of its frames (innermost taking precedence), so that it
+    can still be used anywhere a ``fork()``-ed dictionary used to be:
+
+    >>> for k, v in env.items():
+    ...     print(k, v.value)
+    x 10
+    y 12
+    """
+    __slots__ = ('parent',)
+
+    def __init__(self, bindings=(), parent=None):
+        super().__init__(bindings)
+        self.parent = parent
+
+    def __missing__(self, key):
+        env = self.parent
+        while isinstance(env, Environment):
+            var = dict.get(env, key)
+            if var is not None:
+                return var
+            env = env.parent
+        if env is None:
+            raise KeyError(key)
+        return env[key]
+
+    def frames(self):
+        """
+        Iterate over each frame, from the innermost outward.
+        """
+        env = self
+        while isinstance(env, Environment):
+            yield env
+            env = env.parent
+        if env is not None:
+            yield env
+
+    def flatten(self) -> dict:
+        """
+        Return a plain dictionary of every visible binding.
+        """
+        union = {}
+        for frame in reversed(list(self.frames())):
+            union.update(dict.items(frame))
+        return union
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return any(dict.__contains__(f, key) if isinstance(f, Environment)
+                   else key in f for f in self.frames())
+
+    def __iter__(self):
+        return iter(self.flatten())
+
+    def __len__(self):
+        return len(self.flatten())
+
+    def keys(self):
+        return self.flatten().keys()
+
+    def values(self):
+        return self.flatten().values()
+
+    def items(self):
+        return self.flatten().items()
+
+    def copy(self):
+        return self.flatten()
+
+    def __eq__(self, other):
+        if isinstance(other, Environment):
+            other = other.flatten()
+        return self.flatten() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.flatten())
+
+
 class LexicalVarStorage:
     """
     Storage for lexically scoped variables. Has two parts:
 
-    * An ``environ`` part: a dictionary of the containing
-      environment (closure).
+    * An ``environ`` part: the containing environment (closure), either
+      an ``Environment`` chain or a plain dictionary.
     * A ``local`` part: a dictionary of the local variables
       in the function.
+
+    ``version`` counts the calls to ``put``, so that caches of what a name
+    refers to can tell when a new variable may shadow it, and ``captured``
+    is set once ``fork`` has been called, after which the variables in
+    ``local`` may be shared with a closure.
     """
-    def __init__(self, environ: Dict[str, Variable]):
+    def __init__(self, environ: dict):
         self.environ = environ
         self.local = {}
+        self.version = 0
+        self.captured = False
 
-    def fork(self) -> Dict[str, Variable]:
+    def fork(self) -> dict:
         """
-        Return the union of the ``local`` part and the ``environ``
-        part. Should not modify either part.
+        Capture the current scope for a closure. Only the ``local`` frame
+        is copied (so that later ``put`` calls are not visible to the
+        closure); the enclosing frames are linked, not copied. Should not
+        modify either part.
 
         >>> environ = {k: Variable(v) for k, v in (('x', 10), ('y', 11))}
         >>> stg = LexicalVarStorage(environ)
@@ -490,10 +987,8 @@ class LexicalVarStorage:
         y 12
         z 13
         """
-        union = {}
-        union.update(self.environ)
-        union.update(self.local)
-        return union
+        self.captured = True
+        return Environment(self.local, self.environ)
 
     def put(self, name: str, value) -> None:
         """
@@ -501,6 +996,7 @@ class LexicalVarStorage:
         it a value ``value``.
         """
         self.local[name] = Variable(value)
+        self.version += 1
 
     def __getitem__(self, key: str) -> Variable:
         """
@@ -528,28 +1024,35 @@ class LexicalVarStorage:
             ...
         KeyError: "Undefined variable 'bar'"
         """
-
-        new_dict = self.fork()
-
-        if key in new_dict.keys():
-            val = new_dict[key]
-            return val
-        else:
-            raise KeyError("Undefined variable '{}'".format(key))
+        var = self.local.get(key)
+        if var is not None:
+            return var
+        try:
+            return self.environ[key]
+        except KeyError:
+            raise KeyError("Undefined variable '{}'".format(key)) from None
 
 
 class Quoted:
     """
     A simple wrapper for a quoted element in the abstract syntax tree.
+    ``value`` keeps what it evaluates to once ``lisp_eval`` has made it,
+    so that it is only made once.
     """
+    __slots__ = ('elem', 'value')
+
     def __init__(self, elem):
         self.elem = elem
+        self.value = None
 
     def __repr__(self):
         return "'{!r}".format(self.elem)
 
     def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.elem == other.elem
+        return isinstance(other, Quoted) and _equal(self, other)
+
+    def __hash__(self):
+        return hash((Quoted, self.elem))
 
 
 class Symbol(str):
@@ -591,8 +1094,12 @@ class UserFunction(Function):
       the function is called.
     * ``environ`` is a dictionary created by calling ``.fork()`` on a
       ``LexicalVarStorage`` when the function was created.
+    * ``folded`` is the body with constants folded, which is run in its
+      place while set (see ``slyther.folding``).
 
     """
+    folded = None
+
     def __init__(self, params: SExpression, body: SExpression, environ: dict):
         """
         >>> from slyther.parser import lisp
@@ -628,17 +1135,72 @@ class UserFunction(Function):
         """
         # avoid circular imports
         from slyther.evaluator import lisp_eval
+        from slyther.profiler import active
+        storage = self.bind(args)
+        if active is None:
+            return lisp_eval(self.enter(storage), storage)
+        active.enter(self)
+        try:
+            return lisp_eval(self.enter(storage), storage)
+        finally:
+            active.exit()
+
+    def enter(self, storage: LexicalVarStorage):
+        """
+        Evaluate all but the last expression of the body in ``storage``,
+        returning the last for the caller to evaluate (in tail position).
+        """
+        from slyther.evaluator import lisp_eval
+        body = self.folded
+        if body is None:
+            body = self.body
+        if body is NIL:
+            return NIL
+        while body.cdr is not NIL:
+            lisp_eval(body.car, storage)
+            body = body.cdr
+        return body.car
+
+    def bind(self, args) -> LexicalVarStorage:
+        """
+        Create the storage for a call with ``args``: a new local part
+        holding each parameter, on top of ``environ``.
+        """
         storage = LexicalVarStorage(self.environ)
-        for x, y in zip(args, self.params):
-            storage.put(y, x)
-        r = NIL
-        length = len(self.body)
-        for index, z in enumerate(self.body):
-            if index == length - 1:
-                return (z, storage)
-            else:
-                r = lisp_eval(z, storage)
-        return r
+        storage.local = {name: Variable(value)
+                         for name, value in zip(self.params, args)}
+        return storage
+
+    def rebind(self, storage: LexicalVarStorage, args) -> bool:
+        """
+        For a call of this function in tail position of its own body, try
+        to reuse the ``storage`` made by ``bind`` for the running call:
+        assign ``args`` to the existing parameter variables rather than
+        making new ones. This is only possible when no closure has captured
+        ``storage``, and returns whether it was.
+
+        >>> from slyther.parser import lisp
+        >>> f = UserFunction(lisp('(n)'), lisp('(n)'), {})
+        >>> stg = f.bind([1])
+        >>> f.rebind(stg, [2]), stg['n'].value
+        (True, 2)
+        >>> closure = stg.fork()
+        >>> f.rebind(stg, [3]), closure['n'].value
+        (False, 2)
+        """
+        if storage.captured or len(args) != len(self.params):
+            return False
+        local = storage.local
+        for name, value in zip(self.params, args):
+            local[name].value = value
+        return True
+
+    def __getstate__(self):
+        # the names the folded body relies on are only watched in this
+        # process, so it is left out and the original body runs instead
+        state = dict(self.__dict__)
+        state.pop('folded', None)
+        return state
 
     def __repr__(self):
         """
@@ -657,13 +1219,18 @@ class Macro(abc.Callable):
 
 class BuiltinCallable(abc.Callable):
     """
-    Base class for builtin callables (functions and macros)
+    Base class for builtin callables (functions and macros). ``pure`` is set
+    on those which have no side effects and always return the same result
+    for the same arguments, so that calls of them with constant arguments
+    can be folded (see ``slyther.folding``).
     """
+    pure = False
     py_translations = {
         bool: Boolean,
         str: String,
         list: ConsList.from_iterable,
         tuple: ConsList.from_iterable,
+        array: Vector,
     }
 
     def __new__(cls, arg=None, name=None):
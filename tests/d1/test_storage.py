@@ -33,3 +33,27 @@ def test_fork(environ, local):
 
     for k, v in stg.local.items():
         assert fork[k] is v
+
+
+@given(stg_dictionaries, stg_dictionaries, stg_dictionaries)
+def test_chained_lookup(outer, middle, local):
+    stg = LexicalVarStorage(outer)
+    stg.local = middle
+    inner = LexicalVarStorage(stg.fork())
+    inner.local = local
+    for frame in (outer, middle, local):
+        for k in frame:
+            expect = local.get(k, middle.get(k, outer.get(k)))
+            assert inner[k] is expect
+
+
+def test_fork_isolated_from_later_puts():
+    stg = LexicalVarStorage({'x': Variable(1)})
+    stg.put('y', 2)
+    closure = stg.fork()
+    stg.put('z', 3)
+    stg['y'].set(20)
+    assert closure['y'].value == 20
+    assert 'z' not in closure
+    with pytest.raises(KeyError):
+        closure['z']
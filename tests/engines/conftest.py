@@ -0,0 +1,7 @@
+import pytest
+from slyther.interpreter import Interpreter
+
+
+@pytest.fixture(params=Interpreter.engines)
+def interp(request):
+    return Interpreter(request.param)
@@ -0,0 +1,143 @@
+import sys
+import pytest
+from slyther.interpreter import Interpreter
+import slyther.stats
+from slyther.types import ConsList, NIL
+
+engines = [e for e in Interpreter.engines if e != 'ast']
+
+programs = [
+    ('(+ 1 2 (* 3 4))', 15),
+    ("'(1 (2 3) x)", "(list 1 (list 2 3) x)"),
+    ('''(define (fib n)
+          (if (< n 2)
+              n
+              (+ (fib (- n 1)) (fib (- n 2)))))
+        (fib 15)''', 610),
+    ('''(define (count-up n acc)
+          (if (= n 0) acc (count-up (- n 1) (+ acc 1))))
+        (count-up 5000 0)''', 5000),
+    ('''(define (prng seed)
+          (lambda ()
+            (set! seed (remainder (* 16807 seed) 2147483647))
+            seed))
+        (define rng1 (prng 1))
+        (define rng2 (prng 1))
+        (rng1) (rng1)
+        (list (rng1) (rng2))''', "(list 1622650073 16807)"),
+    ('''(define x 10)
+        (let ((x 20) (y 30)) (+ x y))''', 50),
+    ('''(define (f x)
+          (cond ((< x 5) 'small) ((< x 10) 'medium) (#t 'large)))
+        (list (f 1) (f 7) (f 12))''', "(list small medium large)"),
+    ('(list (and) (or) (and 1 2) (or #f 3) (and 1 #f 2) (or #f #f))',
+     "(list NIL NIL 2 3 #f #f)"),
+    ("(eval (cons '+ '(1 2 3)))", 6),
+    ('''(define (isqrt n)
+          (define (isqrt-iter guess)
+            (let ((next (/ (+ guess (/ n guess)) 2)))
+              (if (< (abs (- next guess)) 1)
+                  (floor next)
+                  (isqrt-iter next))))
+          (isqrt-iter (/ n 2)))
+        (isqrt 1000000)''', 1000),
+    ('''(define (twice f) (lambda (x) (f (f x))))
+        ((twice (lambda (x) (* x 3))) 7)''', 63),
+    ('''(define (shadow if) (if 1 2))
+        (shadow +)''', 3),
+    ('''(define (counter)
+          (define n 0)
+          (lambda () (let ((step 1)) (set! n (+ n step)) n)))
+        (define c (counter))
+        (c) (c)
+        (c)''', 3),
+    ('''(define (f x)
+          (define y (* x 2))
+          (eval '(+ x y)))
+        (f 4)''', 12),
+    ('''(define v (list->vector '(3 1 2)))
+        (define (sum-vector v i acc)
+          (if (= i (vector-length v))
+              acc
+              (sum-vector v (+ i 1) (+ acc (vector-ref v i)))))
+        (vector-set! v 0 10)
+        (list (sum-vector v 0 0) (vector->list #(1 x)))''',
+     "(list 13 (list 1 x))"),
+]
+
+
+def run(engine, code):
+    interp = Interpreter(engine=engine)
+    result = interp.exec(code)
+    if isinstance(result, ConsList) and result is not NIL:
+        return repr(result)
+    return result
+
+
+@pytest.mark.parametrize('engine', engines)
+@pytest.mark.parametrize('code,expected', programs)
+def test_engine_matches_ast(engine, code, expected):
+    assert run('ast', code) == expected
+    assert run(engine, code) == expected
+
+
+@pytest.mark.parametrize('engine', engines)
+def test_undefined_variable(engine):
+    with pytest.raises(KeyError):
+        Interpreter(engine=engine).exec('(+ 1 undefined-thing)')
+
+
+@pytest.mark.parametrize('engine', Interpreter.engines)
+def test_non_tail_recursion(engine):
+    limit = sys.getrecursionlimit()
+    interp = Interpreter(engine)
+    interp.exec('(define (s n) (if (= n 0) 0 (+ 1 (s (- n 1)))))')
+    # about as deep as lisp_eval gets within the recursion limit
+    depth = limit * 7 // 10
+    assert interp.exec('(s {})'.format(depth)) == depth
+    with pytest.raises(KeyError):
+        interp.exec('(s nope)')
+    assert sys.getrecursionlimit() == limit
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        Interpreter(engine='nope')
+
+
+def test_bytecode_disassembly():
+    from slyther.bytecode import compile_code, dis
+    from slyther.parser import lisp
+    interp = Interpreter()
+    code = compile_code(lisp('(define (f x) (and x (f x)))'), interp.stg)
+    listing = dis(code)
+    assert 'MAKE_CLOSURE' in listing
+    assert 'DEFINE_FUNCTION' in listing
+    inner = dis(code.consts[0].code)
+    assert 'JUMP_IF_FALSE_OR_POP' in inner
+    assert 'TAIL_CALL' in inner
+
+
+def test_inline_cache():
+    interp = Interpreter(engine='closure')
+    interp.exec('''
+        (define (divides? a b) (= (remainder b a) 0))
+        (define (count-divisors n x acc)
+          (if (> x n)
+              acc
+              (count-divisors n (+ x 1)
+                              (if (divides? x n) (+ acc 1) acc))))''')
+    with slyther.stats.counting():
+        assert interp.exec('(count-divisors 360 1 0)') == 24
+    stats = interp.cache_stats()
+    assert stats['misses'] <= 10
+    assert stats['hits'] > 100 * stats['misses']
+    # only counted while counting, and only for this interpreter
+    interp.exec('(count-divisors 360 1 0)')
+    assert interp.cache_stats() == stats
+    assert Interpreter(engine='closure').cache_stats() == {
+        'hits': 0, 'misses': 0}
+
+    # redefining a builtin invalidates the cache
+    interp.exec('(define (remainder a b) 1)')
+    assert interp.exec('(count-divisors 360 1 0)') == 0
@@ -0,0 +1,161 @@
+import io
+import time
+import pytest
+from slyther.interpreter import Interpreter
+from slyther.types import Boolean, ConsList
+from slyther.evaluator import lisp_eval
+from slyther.parser import lisp
+import slyther.builtins
+import slyther.image
+
+
+@pytest.fixture
+def interp():
+    return Interpreter()
+
+
+def test_folds_constants(interp):
+    interp.exec('(define (f x) (+ x (* 2 3) (- 10)))')
+    f = interp.exec('f')
+    add, x, six, minus_ten = f.folded.car
+    assert add is slyther.builtins.add
+    assert (x, six, minus_ten) == ('x', 6, -10)
+    assert interp.exec('(f 1)') == -3
+
+
+def test_lambda_folded(interp):
+    f = interp.exec('(lambda (x) (< x (* 2 512)))')
+    assert f.folded.car.cdr.cdr.car == 1024
+
+
+def test_nothing_to_fold(interp):
+    interp.exec('(define (f x) (print x))')
+    assert interp.exec('f').folded is None
+
+
+def test_quoted_shared(interp):
+    interp.exec("(define (f) '(1 (2 3)))")
+    first = interp.exec('(f)')
+    assert isinstance(first, ConsList)
+    assert interp.exec('(f)') is first
+    assert repr(first) == '(list 1 (list 2 3))'
+
+
+def test_costly_calls_left_for_runtime(interp):
+    start = time.perf_counter()
+    interp.exec('''
+    (define (f) (if #f (expt 7 300000000) 0))
+    (define (g) (* (* 1099511627776 1099511627776) 2))''')
+    assert time.perf_counter() - start < 0.5
+    product = interp.exec('g').folded.car
+    assert list(product)[1:] == [2 ** 80, 2]
+    assert interp.exec('(f)') == 0
+
+
+def test_only_numbers_and_booleans_folded(interp):
+    start = time.perf_counter()
+    interp.exec('(define (f) (* "ab" 100000000)) (define (g) (< 1 2.5))')
+    assert time.perf_counter() - start < 0.5
+    assert list(interp.exec('f').folded.car)[1:] == ['ab', 100000000]
+    assert interp.exec('g').folded.car is Boolean(True)
+
+
+@pytest.mark.parametrize('engine', Interpreter.engines)
+def test_every_engine_invalidates(engine):
+    interp = Interpreter(engine)
+    # functions made by lisp_eval (as for macros only known at runtime) are
+    # folded whatever the engine
+    lisp_eval(lisp('(define (f x) (* (+ x 1) 2))'), interp.stg)
+    f = interp.exec('f')
+    assert f.folded is not None
+    interp.exec('(set! + -)')
+    assert f.folded is None
+    assert interp.exec('(f 5)') == 8
+    lisp_eval(lisp('(define (g x) (* x 2))'), interp.stg)
+    g = interp.exec('g')
+    interp.exec('(define * +)')
+    assert g.folded is None
+
+
+def test_errors_left_for_runtime(interp):
+    interp.exec('(define (f) (/ 1 0))')
+    with pytest.raises(ZeroDivisionError):
+        interp.exec('(f)')
+
+
+@pytest.mark.parametrize('code', [
+    '(define (f +) (+ 1 2))',
+    '(define (f) (define (+ a b) a) (+ 1 2))',
+    '(define (f) (let ((+ -)) (+ 1 2)))',
+    '(define (f) (set! + -) (+ 1 2))',
+])
+def test_shadowed_names_not_folded(interp, code):
+    interp.exec(code)
+    assert interp.exec('f').folded is None
+
+
+def test_shadowed_results(interp):
+    interp.exec('(define (f +) (+ 1 2)) (define (g) (let ((+ -)) (+ 1 2)))')
+    assert interp.exec('(f *)') == 2
+    assert interp.exec('(g)') == -1
+
+
+def test_set_invalidates(interp):
+    interp.exec('(define (f x) (+ x 1))')
+    f = interp.exec('f')
+    assert f.folded is not None
+    interp.exec('(set! + -)')
+    assert f.folded is None
+    assert interp.exec('(f 5)') == 4
+
+
+def test_define_invalidates(interp):
+    interp.exec('''
+    (define (outer)
+      (define (inner) (+ 1 2))
+      (define + *)
+      (inner))''')
+    assert interp.exec('(outer)') == 3
+    interp.exec('(define (f) 1) (define (g) (* 2 3))')
+    g = interp.exec('g')
+    assert g.folded is not None
+    interp.exec('(define * +)')
+    assert g.folded is None
+
+
+def test_cond_clauses(interp):
+    interp.exec('(define (f not) (cond (not 1) (#t (+ 1 1))))')
+    assert interp.exec('(f #f)') == 2
+    assert interp.exec('(f #t)') == 1
+
+
+def test_aliases_resolved(interp):
+    interp.exec('(define plus +) (define (f x) (plus x 1))')
+    assert interp.exec('f').folded.car.car is slyther.builtins.add
+    interp.exec('(set! plus -)')
+    assert interp.exec('(f 5)') == 4
+
+
+def test_image_drops_folded(interp):
+    interp.exec('(define (f x) (+ x (* 2 3)))')
+    f = io.BytesIO()
+    slyther.image.dump(interp, f)
+    f.seek(0)
+    restored = slyther.image.load(f)
+    assert restored.exec('f').folded is None
+    assert restored.exec('(f 1)') == 7
+
+
+def test_locations_kept():
+    interp = Interpreter(locations=True)
+    with pytest.raises(KeyError) as info:
+        interp.exec('(define (f)\n  (+ (* 2 3)\n     nope))\n(f)', 'f.scm')
+    assert info.value.location.line == 2
+
+
+def test_fold_reused_only_for_same_builtins(interp):
+    interp.exec('(define (g op) (define (h) (op 10 2)) h)')
+    assert interp.exec('((g +))') == 12
+    assert interp.exec('((g -))') == 8
+    assert interp.exec('((g +))') == 12
+    assert interp.exec('((g list))') == interp.exec('(list 10 2)')
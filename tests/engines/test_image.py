@@ -0,0 +1,90 @@
+import io
+import pytest
+import slyther
+from slyther.image import ImageError, dump, load
+from slyther.interpreter import Interpreter
+
+prelude = '''
+(define (prng seed)
+  (lambda ()
+    (set! seed (remainder (* 16807 seed) 2147483647))
+    seed))
+(define rng (prng 1))
+(rng)
+(define (count-up n acc)
+  (if (= n 0) acc (count-up (- n 1) (+ acc 1))))
+(define flags (list #t #f NIL "s" 'q 2.5))
+(define v #(1 2 3))
+'''
+
+
+def round_trip(interp):
+    f = io.BytesIO()
+    dump(interp, f)
+    f.seek(0)
+    return load(f)
+
+
+@pytest.mark.parametrize('engine', Interpreter.engines)
+def test_round_trip(engine):
+    interp = Interpreter(engine)
+    interp.exec(prelude)
+    restored = round_trip(interp)
+    assert restored.engine == engine
+    assert repr(restored.exec('(rng)')) == '282475249'
+    # the original is unaffected
+    assert repr(interp.exec('(rng)')) == '282475249'
+    assert restored.exec('(count-up 3000 0)') == 3000
+    assert repr(restored.exec('flags')) == '(list #t #f NIL "s" q 2.5)'
+    assert restored.exec('(car flags)') is interp.exec('(car flags)')
+    assert restored.exec('(vector-ref v 2)') == 3
+    assert restored.exec('(+ 1 2)') == 3
+
+
+def test_long_list():
+    interp = Interpreter()
+    interp.stg.put('big', slyther.types.ConsList.from_iterable(range(10**5)))
+    assert len(round_trip(interp).exec('big')) == 10**5
+
+
+def test_shared_tails():
+    interp = Interpreter()
+    interp.exec("""(define a '(1 2 3 4))
+                   (define b (cdr (cdr a)))
+                   (define c (cons 0 b))""")
+    restored = round_trip(interp)
+    a, b, c = (restored.exec(name) for name in 'abc')
+    assert a.cdr.cdr is b
+    assert c.cdr is b
+    assert len(a) == 4
+
+
+def test_shared_variables():
+    interp = Interpreter()
+    interp.exec('''(define n 0)
+                   (define (bump) (set! n (+ n 1)) n)''')
+    restored = round_trip(interp)
+    restored.exec('(bump)')
+    assert restored.exec('n') == 1
+
+
+def test_version_mismatch(monkeypatch):
+    f = io.BytesIO()
+    dump(Interpreter(), f)
+    monkeypatch.setattr(slyther, '__version__', '0.0.1')
+    f.seek(0)
+    with pytest.raises(ImageError):
+        load(f)
+    with pytest.raises(ImageError):
+        load(io.BytesIO(b'(print 1)'))
+
+
+def test_files(tmp_path):
+    interp = Interpreter()
+    interp.exec('(define x 42)')
+    path = str(tmp_path / 'x.img')
+    interp.save_image(path)
+    assert Interpreter.from_image(path).exec('x') == 42
+    restored = Interpreter.from_image(path, 'bytecode', max_depth=50)
+    assert (restored.engine, restored.max_depth) == ('bytecode', 50)
+    assert restored.exec('x') == 42
@@ -0,0 +1,50 @@
+import pytest
+from slyther.interpreter import Interpreter
+
+depth = '(define (depth n) (if (= n 0) 0 (+ 1 (depth (- n 1)))))'
+
+
+def test_deep_recursion():
+    interp = Interpreter('bytecode')
+    interp.exec(depth)
+    assert interp.exec('(depth 100000)') == 100000
+
+
+def test_deep_list_building():
+    interp = Interpreter('bytecode')
+    interp.exec('''
+        (define (build n) (if (= n 0) NIL (cons n (build (- n 1)))))
+        (define (sum l) (if (nil? l) 0 (+ (car l) (sum (cdr l)))))''')
+    assert interp.exec('(sum (build 100000))') == 100000 * 100001 // 2
+
+
+def test_max_depth():
+    interp = Interpreter('bytecode', max_depth=100)
+    interp.exec(depth)
+    assert interp.exec('(depth 100)') == 100
+    with pytest.raises(RecursionError) as info:
+        interp.exec('(depth 101)')
+    assert 'of 100 calls' in str(info.value.__cause__)
+    # the interpreter is still usable afterwards
+    assert interp.exec('(depth 10)') == 10
+
+
+def test_max_depth_ignores_tail_calls():
+    interp = Interpreter('bytecode', max_depth=10)
+    interp.exec('''(define (loop n acc)
+                     (if (= n 0) acc (loop (- n 1) (+ acc 1))))''')
+    assert interp.exec('(loop 1000 0)') == 1000
+
+
+def test_no_max_depth():
+    interp = Interpreter('bytecode', max_depth=None)
+    interp.exec(depth)
+    assert interp.exec('(depth 50000)') == 50000
+
+
+def test_max_depth_set_later():
+    interp = Interpreter('bytecode')
+    interp.exec(depth)
+    interp.max_depth = 5
+    with pytest.raises(RecursionError):
+        interp.exec('(depth 10)')
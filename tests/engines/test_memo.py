@@ -0,0 +1,102 @@
+import io
+import pytest
+from slyther.interpreter import Interpreter
+from slyther.memo import Memoized
+import slyther.image
+
+fib = '''
+(define-memo (fib n)
+  (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))
+'''
+
+
+def test_define_memo(interp):
+    interp.exec(fib)
+    assert isinstance(interp.exec('fib'), Memoized)
+    assert interp.exec('(fib 90)') == 2880067194370816120
+    assert interp.exec('(memo-size fib)') == 91
+
+
+def test_counts(interp):
+    interp.exec(fib)
+    interp.exec('(fib 10)')
+    f = interp.exec('fib')
+    assert (f.hits, f.misses) == (8, 11)
+    interp.exec('(fib 10)')
+    assert f.hits == 9
+    assert interp.exec('(memo-hit-rate fib)') == 9 / 20
+    interp.exec('(memo-clear! fib)')
+    assert (f.hits, f.misses, len(f.cache)) == (0, 0, 0)
+    assert interp.exec('(memo-hit-rate fib)') == 0.0
+
+
+def test_least_recently_used_evicted(interp):
+    interp.exec('''
+    (define calls 0)
+    (define (count x) (set! calls (+ calls 1)) x)
+    (define f (memoize count 2))
+    (f 1) (f 2) (f 1) (f 3)''')
+    assert interp.exec('calls') == 3
+    interp.exec('(f 1)')
+    assert interp.exec('calls') == 3
+    interp.exec('(f 2)')
+    assert interp.exec('calls') == 4
+
+
+def test_resize(interp):
+    interp.exec('(define f (memoize - NIL)) (f 1) (f 2) (f 3)')
+    assert interp.exec('(memo-size f)') == 3
+    interp.exec('(memo-resize! f 1)')
+    assert list(interp.exec('f').cache) == [((int, 3),)]
+    with pytest.raises(ValueError):
+        interp.exec('(memo-resize! f -1)')
+
+
+def test_keys(interp):
+    interp.exec('''
+    (define calls 0)
+    (define (count x) (set! calls (+ calls 1)) x)
+    (define f (memoize count))''')
+    interp.exec("(f '(1 2)) (f (list 1 2)) (f (cons 1 (cons 2 NIL)))")
+    assert interp.exec('calls') == 1
+    interp.exec('(f 1) (f 1.0) (f "a") (f \'a)')
+    assert interp.exec('calls') == 5
+    with pytest.raises(TypeError):
+        interp.exec('(f (make-vector 1))')
+
+
+def test_errors(interp):
+    with pytest.raises(TypeError):
+        interp.exec('(memoize 5)')
+    with pytest.raises(TypeError):
+        interp.exec('(memo-size +)')
+    with pytest.raises(TypeError):
+        interp.exec('(define-memo x 5)')
+
+
+def test_inner_define_memo(interp):
+    interp.exec('''
+    (define (ways n)
+      (define-memo (go k) (if (< k 2) 1 (+ (go (- k 1)) (go (- k 2)))))
+      (go n))''')
+    assert interp.exec('(ways 100)') == 573147844013817084101
+
+
+def test_image(interp):
+    interp.exec(fib)
+    interp.exec('(fib 20)')
+    f = io.BytesIO()
+    slyther.image.dump(interp, f)
+    f.seek(0)
+    restored = slyther.image.load(f)
+    assert restored.exec('(memo-size fib)') == 21
+    assert restored.exec('(fib 60)') == 1548008755920
+
+
+def test_list_element_types(interp):
+    interp.exec('(define-memo (show l) l)')
+    for code in ("'(1)", "'(1.0)", "'(a)", "'(\"a\")", "'((1))",
+                 "'((1.0))"):
+        assert repr(interp.exec('(show {})'.format(code))) == repr(
+            interp.exec(code))
+    assert interp.exec('(memo-size show)') == 6
@@ -0,0 +1,160 @@
+import pstats
+import sys
+import pytest
+from slyther.interpreter import Interpreter
+from slyther.__main__ import main
+import slyther.profiler
+
+program = '''
+(define (count-down n) (if (= n 0) 0 (count-down (- n 1))))
+(define (fact n) (if (= n 0) 1 (* n (fact (- n 1)))))
+(define (apply-twice f x) (f (f x)))
+(define (ping n pong) (if (= n 0) 0 (pong (- n 1) ping)))
+(define (pong n ping) (if (= n 0) 1 (ping (- n 1) pong)))
+'''
+
+
+@pytest.fixture
+def interp(interp):
+    # the interpreter for each engine, from conftest.py
+    interp.exec(program)
+    return interp
+
+
+def counts(profile):
+    return {stats.name: (stats.calls, stats.primitive_calls,
+                         stats.tail_calls)
+            for stats in profile.results()}
+
+
+def test_counts(interp):
+    with interp.profile() as profile:
+        interp.exec('(count-down 10) (fact 5)')
+    assert counts(profile) == {
+        'count-down': (1, 1, 10),
+        'fact': (6, 1, 0),
+        '=': (17, 17, 0),
+        '-': (15, 15, 0),
+        '*': (5, 5, 0),
+    }
+
+
+def test_closures_counted_together(interp):
+    with interp.profile() as profile:
+        interp.exec('(define (times k) (lambda (x) (* x k)))'
+                    '(apply-twice (times 2) 3) (apply-twice (times 3) 4)')
+    assert counts(profile)['(lambda (x))'] == (4, 4, 0)
+
+
+def test_mutual_tail_calls(interp):
+    with interp.profile() as profile:
+        assert interp.exec('(ping 1000 pong)') == 0
+    assert counts(profile)['ping'] == (501, 501, 0)
+    assert counts(profile)['pong'] == (500, 500, 0)
+    # each call replaced the last, rather than nesting in it
+    assert max(len(stack) for stack in profile.stacks) == 2
+
+
+def test_times(interp):
+    with interp.profile() as profile:
+        interp.exec('(fact 20)')
+    results = {stats.name: stats for stats in profile.results()}
+    fact = results['fact']
+    assert 0 < fact.exclusive < fact.inclusive
+    inner = sum(results[name].inclusive for name in ('=', '-', '*'))
+    assert fact.inclusive == pytest.approx(fact.exclusive + inner)
+
+
+def test_error_unwinds(interp):
+    interp.exec('(define (broken n) (if (= n 0) nope (+ 1 (broken '
+                '(- n 1)))))')
+    with interp.profile() as profile:
+        with pytest.raises(KeyError):
+            interp.exec('(broken 3)')
+        assert profile.stack == []
+        interp.exec('(fact 3)')
+    assert counts(profile)['broken'] == (4, 1, 0)
+    assert counts(profile)['fact'] == (4, 1, 0)
+
+
+def test_not_running(interp):
+    profile = interp.profile()
+    with profile:
+        assert slyther.profiler.active is profile
+    assert slyther.profiler.active is None
+    interp.exec('(fact 3)')
+    assert profile.results() == []
+
+
+def test_report(interp, capsys):
+    with interp.profile() as profile:
+        interp.exec('(fact 5)')
+    profile.report(sys.stdout, sort='calls', limit=2)
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 3
+    assert lines[0].split() == ['calls', 'tail', 'inclusive', 'exclusive',
+                                'per', 'call', 'function']
+    assert lines[1].split()[0] == '6/1'
+    with pytest.raises(ValueError):
+        profile.results(sort='nonsense')
+
+
+def test_pstats(interp, tmp_path):
+    with interp.profile() as profile:
+        interp.exec('(fact 5)')
+    path = tmp_path / 'fact.prof'
+    profile.write_pstats(str(path))
+    stats = pstats.Stats(str(path)).stats
+    cc, nc, tt, ct, callers = stats[('<slyther>', 0, 'fact')]
+    assert (cc, nc) == (1, 6)
+    assert tt <= ct
+    assert callers[('<slyther>', 0, 'fact')][0] == 5
+    assert stats[('~', 0, '*')][4][('<slyther>', 0, 'fact')][0] == 5
+
+
+def test_pstats_keys_distinct(interp):
+    with interp.profile() as profile:
+        interp.exec('((lambda (x) x) 1) ((lambda (x) (- x)) 1)')
+    stats = profile.pstats()
+    assert sorted(name for _, _, name in stats) == [
+        '(lambda (x))', '(lambda (x))', '-']
+
+
+def test_pstats_located():
+    interp = Interpreter(locations=True)
+    interp.exec('(define (a)\n  ((lambda (x) (+ x 1)) 1))', 'a.scm')
+    interp.exec('\n(define (b)\n  ((lambda (x)\n     (- x 1)) 1))', 'b.scm')
+    with interp.profile() as profile:
+        interp.exec('(a) (b)')
+    stats = profile.pstats()
+    assert ('a.scm', 2, '(lambda (x))') in stats
+    assert ('b.scm', 4, '(lambda (x))') in stats
+    assert ('b.scm', 3, 'b') in stats
+
+
+def test_collapsed(interp, tmp_path):
+    with interp.profile() as profile:
+        interp.exec('(fact 2)')
+    path = tmp_path / 'fact.folded'
+    profile.write_collapsed(str(path))
+    stacks = [line.rsplit(' ', 1)[0]
+              for line in path.read_text().splitlines()]
+    assert stacks == sorted([
+        'fact', 'fact;*', 'fact;-', 'fact;=',
+        'fact;fact', 'fact;fact;*', 'fact;fact;-', 'fact;fact;=',
+        'fact;fact;fact', 'fact;fact;fact;=',
+    ])
+
+
+def test_command_line(tmp_path, monkeypatch, capsys):
+    source = tmp_path / 'fact.scm'
+    source.write_text(program + '(print (fact 5))\n')
+    folded = tmp_path / 'fact.folded'
+    monkeypatch.setattr(sys, 'argv', [
+        'slyther', '--no-cache', '--profile', '--profile-collapsed',
+        str(folded), str(source)])
+    main()
+    out, err = capsys.readouterr()
+    assert out == '120\n'
+    assert 'fact' in err.splitlines()[1]
+    assert folded.read_text().startswith('fact ')
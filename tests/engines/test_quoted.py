@@ -0,0 +1,21 @@
+import pytest
+from slyther.interpreter import Interpreter
+
+
+def test_quoted_shared(interp):
+    interp.exec("(define (f) '(1 (2 3) 'x))")
+    first = interp.exec('(f)')
+    assert repr(first) == "(list 1 (list 2 3) 'x)"
+    assert interp.exec('(f)') is first
+
+
+def test_each_node_has_its_own(interp):
+    first, second = interp.exec("(list '(1 2) '(1 2))")
+    assert first == second
+    assert first is not second
+
+
+def test_atoms(interp):
+    assert interp.exec("'x") == 'x'
+    assert interp.exec("'()") is interp.exec('NIL')
+    assert interp.exec("''5") == next(interp.parse("'5"))
@@ -0,0 +1,164 @@
+import sys
+import pytest
+from slyther.interpreter import Interpreter
+from slyther.__main__ import main
+from slyther.types import (ConsCell, ConsList, LexicalVarStorage,
+                           UserFunction, BuiltinCallable)
+import slyther.evaluator
+import slyther.builtins
+import slyther.compiler
+import slyther.bytecode
+import slyther.interpreter
+import slyther.stats
+
+program = '''
+(define (count-down n) (if (= n 0) 0 (count-down (- n 1))))
+(define (fact n) (if (= n 0) 1 (* n (fact (- n 1)))))
+(define (adder k) (lambda (x) (+ x k)))
+'''
+
+
+@pytest.fixture
+def interp(interp):
+    # the interpreter for each engine, from conftest.py
+    interp.exec(program)
+    return interp
+
+
+def test_disabled_by_default(interp):
+    slyther.stats.reset()
+    interp.exec('(fact 5)')
+    assert not slyther.stats.enabled()
+    assert interp.stats()['builtin_calls'] == 0
+    assert interp.stats()['evaluations'] == {}
+
+
+def test_originals_restored():
+    swapped = [
+        (LexicalVarStorage, '__getitem__'),
+        (LexicalVarStorage, 'fork'),
+        (UserFunction, 'bind'),
+        (UserFunction, '__call__'),
+        (BuiltinCallable, '__call__'),
+        (ConsCell, '__init__'),
+        (ConsList, '__init__'),
+        (ConsList, 'from_iterable'),
+        (slyther.compiler.CompiledFunction, 'make_frame'),
+        (slyther.compiler.TailCall, '__init__'),
+    ]
+    originals = [owner.__dict__[name] for owner, name in swapped]
+    plain = slyther.evaluator.lisp_eval
+    callers = [slyther.evaluator, slyther.builtins, slyther.compiler,
+               slyther.bytecode, slyther.interpreter]
+    with slyther.stats.counting():
+        for module in callers:
+            assert module.lisp_eval is slyther.evaluator.counting_eval
+        # enabling again does not wrap twice
+        slyther.stats.enable()
+    assert [owner.__dict__[name] for owner, name in swapped] == originals
+    for module in callers:
+        assert module.lisp_eval is plain
+
+
+def test_same_results(interp):
+    expected = interp.exec('(fact 10)')
+    with slyther.stats.counting():
+        assert interp.exec('(fact 10)') == expected
+        assert interp.exec('((adder 2) 3)') == 5
+        with pytest.raises(KeyError):
+            interp.exec('(nope)')
+
+
+def test_builtin_calls(interp):
+    with slyther.stats.counting():
+        interp.exec('(fact 5)')
+    stats = interp.stats()
+    # = six times, - and * five times each
+    assert stats['builtin_calls'] == 16
+
+
+def test_evaluations():
+    interp = Interpreter()
+    interp.exec(program)
+    with slyther.stats.counting():
+        interp.exec('(count-down 3)')
+    stats = interp.stats()
+    # = and - were folded into the body (see slyther.folding), so are not
+    # looked up
+    assert stats['evaluations'] == {'BuiltinFunction': 7, 'SExpression': 15,
+                                    'Symbol': 15, 'int': 9}
+    assert stats['lookups'] == 15
+    assert stats['macro_expansions'] == 4
+    assert stats['user_calls'] == 4
+    assert stats['tail_calls'] == 3
+    # the tail calls reused the frame of the first call
+    assert stats['frames'] == 1
+
+
+def test_counts_shared_by_interpreters():
+    first, second = Interpreter(), Interpreter('closure')
+    with slyther.stats.counting():
+        first.exec('(+ 1 2)')
+        second.exec('(* 3 4)')
+    assert first.stats() == second.stats()
+    assert first.stats()['builtin_calls'] == 2
+
+
+def test_frames():
+    interp = Interpreter()
+    interp.exec(program)
+    with slyther.stats.counting():
+        interp.exec('(fact 5)')
+    assert interp.stats()['frames'] == 6
+    assert interp.stats()['tail_calls'] == 0
+
+
+def test_closure_engine():
+    interp = Interpreter('closure')
+    interp.exec(program)
+    with slyther.stats.counting():
+        interp.exec('(count-down 3) (fact 5)')
+    stats = interp.stats()
+    # the calls at top level are in tail position too
+    assert stats['tail_calls'] == 2 + 3
+    assert stats['frames'] == 1 + 6
+
+
+def test_forks(interp):
+    with slyther.stats.counting():
+        interp.exec('(let ((a 1) (b 2)) (lambda (x) (+ a b x)))')
+    if interp.engine == 'ast':
+        stats = interp.stats()
+        assert stats['forks'] >= 1
+        assert stats['fork_entries'] >= 2
+
+
+def test_cons_cells(interp):
+    forms = list(interp.parse('(cons 1 (list 2 3 4))'))
+    with slyther.stats.counting():
+        for form in forms:
+            interp.eval(form)
+    assert interp.stats()['cons_cells'] == 4
+
+
+def test_counting_keeps_enabled():
+    slyther.stats.enable()
+    try:
+        with slyther.stats.counting():
+            pass
+        assert slyther.stats.enabled()
+    finally:
+        slyther.stats.disable()
+    assert not slyther.stats.enabled()
+
+
+def test_command_line(tmp_path, monkeypatch, capsys):
+    source = tmp_path / 'fact.scm'
+    source.write_text(program + '(print (fact 5))\n')
+    monkeypatch.setattr(sys, 'argv', [
+        'slyther', '--no-cache', '--stats', str(source)])
+    main()
+    out, err = capsys.readouterr()
+    assert out == '120\n'
+    assert 'builtin_calls' in err
+    assert not slyther.stats.enabled()
@@ -0,0 +1,83 @@
+import pytest
+from slyther.interpreter import Interpreter
+from slyther.bytecode import BytecodeFunction
+from slyther.compiler import CompiledFunction
+from slyther.types import BuiltinFunction, Function, UserFunction
+
+# what allocates the storage or frame for a call, by engine
+allocators = {
+    'ast': (UserFunction, 'bind'),
+    'closure': (CompiledFunction, 'make_frame'),
+    'bytecode': (BytecodeFunction, 'bind'),
+}
+
+
+def count_calls(monkeypatch, engine):
+    cls, name = allocators[engine]
+    original = getattr(cls, name)
+    calls = []
+
+    def counting(self, *args):
+        calls.append(self)
+        return original(self, *args)
+    monkeypatch.setattr(cls, name, counting)
+    return calls
+
+
+def test_self_tail_call_reuses_frame(interp, monkeypatch):
+    interp.exec('''(define (count-down n acc)
+                     (if (= n 0) acc (count-down (- n 1) (+ acc 1))))''')
+    calls = count_calls(monkeypatch, interp.engine)
+    assert interp.exec('(count-down 5000 0)') == 5000
+    assert len(calls) <= 2
+
+
+def test_mutual_tail_calls(interp):
+    interp.exec('''(define (ping n k) (if (= n 0) 'ping (k (- n 1) ping)))
+                   (define (pong n k) (if (= n 0) 'pong (k (- n 1) pong)))''')
+    assert repr(interp.exec('(ping 3001 pong)')) == 'pong'
+
+
+def test_captured_frame_not_reused(interp):
+    interp.exec('''(define (collect n acc)
+                     (if (= n 0)
+                         acc
+                         (collect (- n 1) (cons (lambda () n) acc))))
+                   (define thunks (collect 3 NIL))''')
+    thunks = ['thunks', '(cdr thunks)', '(cdr (cdr thunks))']
+    assert [interp.exec('((car {}))'.format(x)) for x in thunks] == [1, 2, 3]
+
+
+def test_internal_defines_and_let(interp):
+    interp.exec('''(define (isqrt n)
+                     (define (isqrt-iter guess)
+                       (let ((next (/ (+ guess (/ n guess)) 2)))
+                         (if (< (abs (- next guess)) 1)
+                             (floor next)
+                             (isqrt-iter next))))
+                     (isqrt-iter (/ n 2)))
+                   (define (sum-squares n acc)
+                     (define sq (* n n))
+                     (if (= n 0) acc (sum-squares (- n 1) (+ acc sq))))''')
+    assert interp.exec('(isqrt 1000000)') == 1000
+    assert interp.exec('(sum-squares 100 0)') == 338350
+
+
+def test_user_function_called_from_python(interp):
+    f = interp.exec('(define (f n) (if (= n 0) (list 1 2) (f (- n 1)))) f')
+    assert repr(f(100)) == '(list 1 2)'
+
+
+def test_builtin_calling_user_function(interp):
+    interp.stg.put('apply1', BuiltinFunction(lambda f, x: f(x)))
+    interp.exec('(define (double x) (+ x x))')
+    assert interp.exec('(+ 1 (apply1 double 20))') == 41
+
+
+def test_function_returning_tuple(interp):
+    class Pair(Function):
+        def __call__(self, *args):
+            return args
+
+    interp.stg.put('pair', Pair())
+    assert interp.exec('(pair 1 2)') == (1, 2)
@@ -0,0 +1,17 @@
+from slyther.types import String
+from slyther.parser import parse_strlit
+
+
+def test_no_escapes_fast_path():
+    result = parse_strlit('"line one\nline two"')
+    assert type(result) is String
+    assert result == 'line one\nline two'
+
+
+def test_newlines_kept_with_escapes():
+    assert parse_strlit('"a\\tb\nc\\\nd"') == 'a\tb\nc\\\nd'
+
+
+def test_long_literal():
+    body = ('x' * 1000 + r'\n') * 1000
+    assert parse_strlit('"' + body + '"') == ('x' * 1000 + '\n') * 1000
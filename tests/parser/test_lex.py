@@ -0,0 +1,18 @@
+import pytest
+from slyther.types import Symbol
+from slyther.parser import lex, LParen, RParen
+
+
+def test_hash_symbol_at_start():
+    assert list(lex('#t\n(f)')) == [Symbol('#t'), LParen(), Symbol('f'),
+                                    RParen()]
+
+
+def test_shebang_without_newline():
+    assert list(lex('#!/usr/bin/env slyther')) == []
+
+
+@pytest.mark.parametrize('code', ['"abc', '.5.', '(a .b)', '\\"'])
+def test_malformed(code):
+    with pytest.raises(SyntaxError):
+        list(lex(code))
@@ -0,0 +1,94 @@
+import io
+import pytest
+import slyther.locations
+from slyther.interpreter import Interpreter
+from slyther.locations import SourceMap, Span
+from slyther.parser import lex, parse
+
+code = '''#!/usr/bin/env slyther
+; "a comment"
+(define (f x)
+  (+ x "two\nlines" (g x)))
+(f 1)
+'''
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_spans(stream):
+    srcmap = SourceMap()
+    source = io.StringIO(code) if stream else code
+    forms = list(parse(lex(source, chunk_size=3, srcmap=srcmap), srcmap))
+    define = forms[0]
+    assert srcmap.span(define) == Span(3, 1, 37, 77)
+    call = define.cdr.cdr.car.cdr.cdr.cdr.car
+    assert srcmap.span(call) == Span(5, 8, 70, 75)
+    assert srcmap.span(forms[1]).line == 6
+
+
+@pytest.mark.parametrize('engine', Interpreter.engines)
+def test_runtime_errors_located(engine):
+    interp = Interpreter(engine, locations=True)
+    with pytest.raises(KeyError) as info:
+        interp.exec(code, 'prog.scm')
+    assert info.value.location.line in (5, 6)
+    assert 'prog.scm, line' in info.value.__notes__[0]
+
+
+def test_syntax_error_located():
+    interp = Interpreter(locations=True)
+    with pytest.raises(SyntaxError) as info:
+        interp.exec('(+ 1\n  (- 2 1)))', 'bad.scm')
+    assert (info.value.filename, info.value.lineno) == ('bad.scm', 2)
+    assert info.value.offset == 11
+
+
+def test_disabled_by_default():
+    interp = Interpreter()
+    assert interp.srcmap is None
+    with pytest.raises(KeyError) as info:
+        interp.exec('(car nope)')
+    assert not hasattr(info.value, 'location')
+
+
+def test_spans_kept_across_parses():
+    interp = Interpreter(locations=True)
+    interp.exec('(define (f)\n  (car nope))', 'lib.scm')
+    with pytest.raises(KeyError) as info:
+        interp.exec('(define x 1)\n(f)', 'main.scm')
+    assert info.value.location == Span(2, 3, 14, 24, 'lib.scm')
+    assert 'lib.scm, line 2' in info.value.__notes__[0]
+
+
+def test_old_sources_evicted():
+    srcmap = SourceMap(max_nodes=4)
+    forms = []
+    for i in range(4):
+        srcmap.reset('{}.scm'.format(i))
+        forms.extend(parse(lex('(f (g 1) (h 2))', srcmap=srcmap), srcmap))
+    srcmap.reset('4.scm')
+    assert srcmap.size == len(srcmap.nodes) == 3
+    assert srcmap.span(forms[0]) is None
+    assert srcmap.span(forms[3]).filename == '3.scm'
+
+
+def test_maps_not_shared():
+    located, plain = Interpreter(locations=True), Interpreter()
+    located.exec('(define (f) (car nope))', 'f.scm')
+    plain.stg.put('f', located.exec('f'))
+    with pytest.raises(KeyError) as info:
+        plain.exec('(f)')
+    assert not hasattr(info.value, 'location')
+
+
+def test_note_in_args_without_add_note(monkeypatch):
+    srcmap = SourceMap('old.scm')
+    node = next(parse(lex('(car nope)', srcmap=srcmap), srcmap))
+
+    class OldKeyError:
+        # like an exception before Python 3.11, which has no add_note
+        args = ('nope',)
+    exc = OldKeyError()
+    monkeypatch.setattr(slyther.locations, 'current', srcmap)
+    slyther.locations.locate(exc, node)
+    assert exc.location == Span(1, 1, 0, 10, 'old.scm')
+    assert exc.args == ('nope', '  at old.scm, line 1, column 1')
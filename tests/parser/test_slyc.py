@@ -0,0 +1,143 @@
+import os
+import pytest
+from hypothesis import given, strategies as st
+import slyther
+from slyther.cache import (dumps, loads, cache_path, read_cache,
+                           CacheWriter)
+from slyther.interpreter import Interpreter
+from slyther.parser import lex, parse
+from slyther.types import (NIL, SExpression, Symbol, String, Quoted,
+                           Vector)
+
+atoms = st.one_of(
+    st.just(NIL),
+    st.integers(),
+    st.floats(allow_nan=False),
+    st.text().map(String),
+    st.sampled_from(['define', 'x', 'λ', '+']).map(Symbol))
+forms = st.recursive(
+    atoms,
+    lambda children: st.one_of(
+        st.lists(children, min_size=1).map(SExpression.from_iterable),
+        st.lists(children).map(Vector),
+        children.map(Quoted)))
+
+
+@given(st.lists(forms))
+def test_round_trip(values):
+    result = loads(dumps(values))
+    assert result == values
+    assert list(map(repr, result)) == list(map(repr, values))
+
+
+def test_types_preserved():
+    values = [SExpression.from_iterable([Symbol('a'), String('a')]),
+              Quoted(Symbol('a')), NIL, 2 ** 100, -3, 1.0]
+    result = loads(dumps(values))
+    assert type(result[0].car) is Symbol
+    assert type(result[0].cdr.car) is String
+    assert type(result[1]) is Quoted
+    assert result[2] is NIL
+    assert result[3:] == [2 ** 100, -3, 1.0]
+    assert type(result[5]) is float
+
+
+def test_deep_nesting():
+    code = '(' * 10000 + ')' * 10000
+    data = dumps(parse(lex(code)))
+    assert dumps(loads(data)) == data
+
+
+def test_unserializable():
+    with pytest.raises(TypeError):
+        dumps([SExpression.from_iterable([object()])])
+
+
+code = '''#!/usr/bin/env slyther
+(define (sq x) (* x x))
+(list "sq" (sq -12) 'λ)
+'''
+
+
+def test_exec_file_cached(tmp_path):
+    path = tmp_path / 'prog.scm'
+    path.write_text(code, encoding='utf-8')
+    expected = '(list "sq" 144 λ)'
+    assert repr(Interpreter().exec_file(str(path))) == expected
+    cache = cache_path(str(path))
+    assert os.path.dirname(cache) == str(tmp_path / '__slycache__')
+    assert os.path.exists(cache)
+    assert repr(Interpreter().exec_file(str(path))) == expected
+    # a stale cache is not used
+    path.write_text(code.replace('-12', '3'), encoding='utf-8')
+    assert repr(Interpreter().exec_file(str(path))) == '(list "sq" 9 λ)'
+
+
+def test_cache_dir(tmp_path):
+    path = tmp_path / 'prog.scm'
+    path.write_text(code, encoding='utf-8')
+    Interpreter().exec_file(str(path), cache_dir=str(tmp_path / 'c'))
+    assert os.listdir(str(tmp_path / 'c')) == ['prog.scm.slyc']
+    assert not (tmp_path / '__slycache__').exists()
+    Interpreter().exec_file(str(path), cache=False)
+    assert not (tmp_path / '__slycache__').exists()
+
+
+def test_version_mismatch(tmp_path, monkeypatch):
+    path = tmp_path / 'prog.scm'
+    path.write_text(code, encoding='utf-8')
+    Interpreter().exec_file(str(path))
+    source = path.read_bytes()
+    assert read_cache(str(path), source) is not None
+    monkeypatch.setattr(slyther, '__version__', '0.0.1')
+    assert read_cache(str(path), source) is None
+
+
+def test_corrupt_cache(tmp_path):
+    path = tmp_path / 'prog.scm'
+    path.write_text(code, encoding='utf-8')
+    Interpreter().exec_file(str(path))
+    cache = cache_path(str(path))
+    with open(cache, 'r+b') as f:
+        f.truncate(os.path.getsize(cache) - 3)
+    assert read_cache(str(path), path.read_bytes()) is None
+    assert repr(Interpreter().exec_file(str(path))) == '(list "sq" 144 λ)'
+
+
+def test_output_before_syntax_error(tmp_path, capsys):
+    path = tmp_path / 'prog.scm'
+    path.write_text('(print "before")\n(print "x"))', encoding='utf-8')
+    for _ in range(2):
+        with pytest.raises(SyntaxError):
+            Interpreter().exec_file(str(path))
+        assert capsys.readouterr().out == 'before\nx\n'
+    assert not os.path.exists(cache_path(str(path)))
+
+
+def test_written_as_run(tmp_path, monkeypatch):
+    path = tmp_path / 'prog.scm'
+    program = code + '(sq 2)\n' * 20
+    path.write_text(program, encoding='utf-8')
+    monkeypatch.setattr(CacheWriter, 'buffer_size', 16)
+    assert Interpreter().exec_file(str(path)) == 4
+    source = path.read_bytes()
+    assert read_cache(str(path), source) == list(parse(lex(program)))
+
+
+def test_error_leaves_old_cache(tmp_path):
+    path = tmp_path / 'prog.scm'
+    path.write_text(code, encoding='utf-8')
+    Interpreter().exec_file(str(path))
+    source = path.read_bytes()
+    with pytest.raises(ZeroDivisionError):
+        with CacheWriter(str(path), source) as writer:
+            writer.write(NIL)
+            1 / 0
+    assert read_cache(str(path), source) == list(parse(lex(code)))
+    assert os.listdir(str(tmp_path / '__slycache__')) == ['prog.scm.slyc']
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.scm'
+    path.write_text('', encoding='utf-8')
+    assert Interpreter().exec_file(str(path)) is NIL
@@ -0,0 +1,43 @@
+import pytest
+from slyther.types import Quoted, SExpression, Vector, NIL
+from slyther.parser import lisp, lex, parse
+
+
+def test_deep_nesting():
+    depth = 10000
+    se = lisp('(' * depth + ')' * depth)
+    for _ in range(depth - 1):
+        assert len(se) == 1
+        se = se.car
+    assert se is NIL
+
+
+def test_quotes_per_frame():
+    se = lisp("('a ''(b '#(c)) 'd)")
+    assert isinstance(se.car, Quoted)
+    inner = se.cdr.car
+    assert isinstance(inner.elem, Quoted)
+    assert isinstance(inner.elem.elem, SExpression)
+    assert inner.elem.elem.cdr.car.elem == Vector(['c'])
+    assert se.cdr.cdr.car.elem == 'd'
+
+
+def test_elements_yielded_as_completed():
+    forms = parse(lex("1 '(2) 3 ("))
+    assert next(forms) == 1
+    assert repr(next(forms)) == "'(2)"
+    assert next(forms) == 3
+    with pytest.raises(SyntaxError):
+        next(forms)
+
+
+@pytest.mark.parametrize('code,message', [
+    ('(a))', 'too many closing parens'),
+    ("(a ')", 'invalid quotation'),
+    ("')", 'invalid quotation'),
+    ('(a', 'incomplete parse'),
+    ("'", 'incomplete parse'),
+])
+def test_errors(code, message):
+    with pytest.raises(SyntaxError, match=message):
+        list(parse(lex(code)))
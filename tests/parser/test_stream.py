@@ -0,0 +1,47 @@
+import io
+import mmap
+import pytest
+from slyther.interpreter import Interpreter
+from slyther.parser import lex
+
+code = '''#!/usr/bin/env slyther
+; comment spanning (a chunk boundary)
+(define greeting "hello ; not a comment")
+(define (sq x) (* x x))
+(list greeting (sq -12) 3.5 'λ)
+'''
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 1 << 16])
+def test_stream_matches_string(chunk_size):
+    expected = list(map(repr, lex(code)))
+    assert list(map(repr, lex(io.StringIO(code), chunk_size))) == expected
+    data = io.BytesIO(code.encode('utf-8'))
+    assert list(map(repr, lex(data, chunk_size))) == expected
+
+
+def test_mmap(tmp_path):
+    path = tmp_path / 'prog.scm'
+    path.write_text(code, encoding='utf-8')
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        assert list(map(repr, lex(m, 7))) == list(map(repr, lex(code)))
+
+
+def test_exec_file(tmp_path):
+    path = tmp_path / 'prog.scm'
+    path.write_text(code, encoding='utf-8')
+    result = Interpreter().exec_file(str(path))
+    assert repr(result) == '(list "hello ; not a comment" 144 3.5 λ)'
+
+
+def test_forms_evaluated_as_parsed():
+    interp = Interpreter()
+    with pytest.raises(SyntaxError):
+        interp.exec_stream(io.StringIO('(define x 1) (define y 2) ) ('))
+    assert interp.exec('(+ x y)') == 3
+
+
+def test_unclosed_string_in_stream():
+    with pytest.raises(SyntaxError):
+        list(lex(io.StringIO('(print "abc'), 2))
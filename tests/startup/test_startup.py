@@ -0,0 +1,49 @@
+import sys
+from benchmarks.startup import BUDGET, HEAVY, run
+from slyther.interpreter import Interpreter
+import slyther.builtins
+
+
+def heavy(times):
+    return [name for name in times
+            if name in HEAVY or name.split('.')[0] in HEAVY]
+
+
+def test_run_file(tmp_path):
+    path = tmp_path / 'hello.scm'
+    path.write_text('(define x (+ 1 2))\n')
+    times, total = run([str(path)])
+    assert 'slyther.interpreter' in times
+    assert heavy(times) == []
+    assert total / 1000 < BUDGET
+
+
+def test_engines_imported_when_chosen(tmp_path):
+    path = tmp_path / 'hello.scm'
+    path.write_text('(define x (+ 1 2))\n')
+    lazy = ('slyther.compiler', 'slyther.bytecode', 'slyther.stats')
+    times, _ = run([str(path)])
+    assert [name for name in lazy if name in times] == []
+    times, _ = run(['--engine', 'bytecode', str(path)])
+    assert 'slyther.bytecode' in times
+
+
+def test_no_cache(tmp_path):
+    path = tmp_path / 'hello.scm'
+    path.write_text('(define x (+ 1 2))\n')
+    times, _ = run(['--no-cache', str(path)])
+    assert 'hashlib' not in times
+    assert heavy(times) == []
+
+
+def test_plot_help_does_not_import_matplotlib(capsys):
+    Interpreter().exec('(plot-scatter NIL NIL "--h")')
+    assert 'matplotlib' not in sys.modules
+
+
+def test_builtin_table():
+    stg = Interpreter().stg
+    for name, func in slyther.builtins.table.items():
+        assert stg[name].value is func
+        assert func.__name__ == name
+    assert stg['vector-ref'].value is slyther.builtins.vector_ref
@@ -0,0 +1,79 @@
+import json
+import sys
+import pytest
+from benchmarks import suite
+from slyther.interpreter import Interpreter
+
+
+@pytest.mark.parametrize('engine', Interpreter.engines)
+@pytest.mark.parametrize('program', suite.programs,
+                         ids=[program.name for program in suite.programs])
+def test_programs(program, engine):
+    # checks the result, raising AssertionError if it is wrong
+    run = suite.program_benchmark(program, engine, 0.1)
+    run()
+
+
+def test_wrong_result():
+    program = suite.programs[0]._replace(expected=lambda n: -1)
+    with pytest.raises(AssertionError):
+        suite.program_benchmark(program, 'ast', 0.1)
+
+
+def test_missing_definition():
+    program = suite.programs[0]._replace(defines=['fib', 'nope'])
+    with pytest.raises(LookupError):
+        suite.program_benchmark(program, 'ast', 0.1)
+
+
+def test_micro_benchmarks():
+    micro = suite.micro_benchmarks(0.01)
+    assert tuple(micro) == suite.micro_names
+    for name, func in micro.items():
+        func()
+
+
+def test_only_selected_set_up(monkeypatch):
+    made = []
+
+    def program_benchmark(program, engine, scale):
+        made.append(program.name)
+        return lambda: None
+    monkeypatch.setattr(suite, 'program_benchmark', program_benchmark)
+    monkeypatch.setattr(suite, 'micro_benchmarks', None)
+    names = [name for name, _ in suite.benchmarks(['ast'], 0.01, ['gcd'])]
+    assert names == ['gcd/ast'] and made == ['gcd']
+
+
+def test_compare():
+    def results(times, scale=1.0):
+        return {'scale': scale,
+                'results': {name: {'best': t} for name, t in times.items()}}
+    baseline = results({'a': 1.0, 'b': 1.0, 'gone': 1.0})
+    current = results({'a': 1.1, 'b': 1.5, 'new': 1.0})
+    assert suite.compare(current, baseline, 0.25) == [
+        ('a', 1.0, 1.1, pytest.approx(1.1), False),
+        ('b', 1.0, 1.5, 1.5, True),
+    ]
+    with pytest.raises(ValueError):
+        suite.compare(results({}, 0.5), baseline, 0.25)
+
+
+def test_command_line(tmp_path, monkeypatch, capsys):
+    saved = tmp_path / 'baseline.json'
+    args = ['suite', '--scale', '0.05', '--repeat', '1', '--only', 'gcd',
+            '--engine', 'closure']
+    monkeypatch.setattr(sys, 'argv', args + ['--json', str(saved)])
+    assert suite.main() == 0
+    baseline = json.loads(saved.read_text())
+    assert list(baseline['results']) == ['gcd/closure']
+
+    monkeypatch.setattr(sys, 'argv', args + ['--baseline', str(saved),
+                                             '--threshold', '100'])
+    assert suite.main() == 0
+
+    baseline['results']['gcd/closure']['best'] /= 1000
+    saved.write_text(json.dumps(baseline))
+    monkeypatch.setattr(sys, 'argv', args + ['--baseline', str(saved)])
+    assert suite.main() == 1
+    assert 'REGRESSED' in capsys.readouterr().out
@@ -0,0 +1,108 @@
+import pytest
+from slyther.types import (ConsCell, ConsList, SExpression, Quoted, Symbol,
+                           Vector, NIL)
+from slyther.parser import lisp
+
+
+def nested(depth, leaf):
+    # frozen at each level, like lists built by ``list``
+    result = ConsList.from_iterable([leaf])
+    for _ in range(depth):
+        result = ConsList.from_iterable([result])
+    return result
+
+
+def test_cons_cells_compare_cdr():
+    assert ConsCell(1, 2) == ConsCell(1, 2)
+    assert ConsCell(1, 2) != ConsCell(1, 3)
+    assert ConsCell(ConsCell(1, 2), 3) == ConsCell(ConsCell(1, 2), 3)
+    assert ConsCell(1, NIL) != ConsList(1)
+    assert ConsCell(1, ConsList(2)) != ConsCell(1, NIL)
+
+
+@pytest.mark.parametrize('other', ['abc', 1, None, (1, 2), Vector([1, 2])])
+def test_other_types_unequal(other):
+    lst = ConsList.from_iterable([1, 2])
+    assert lst != other
+    assert other != lst
+    assert ConsCell(1, 2) != other
+
+
+def chain(n, last):
+    # cons cells (not lists) nested by their cdr
+    result = last
+    for i in range(n):
+        result = ConsCell(i, result)
+    return result
+
+
+def test_long_and_deep():
+    n = 20000
+    assert ConsList.from_iterable(range(n)) == ConsList.from_iterable(range(n))
+    assert nested(n, 1) == nested(n, 1)
+    assert nested(n, 1) != nested(n, 2)
+    assert nested(n, 1) != nested(n + 1, 1)
+    assert chain(n, 1) == chain(n, 1)
+    assert chain(n, 1) != chain(n, 2)
+    assert hash(nested(n, 1)) == hash(nested(n, 1))
+
+
+def test_quoted():
+    assert lisp("'(1 (2 'x))") == lisp("'(1 (2 'x))")
+    assert lisp("'(1 (2 'x))") != lisp("'(1 (2 'y))")
+    assert hash(lisp("'(1 (a))")) == hash(lisp("'(1 (a))"))
+    assert Quoted(Symbol('a')) != Symbol('a')
+
+
+def test_hash_matches_equality():
+    table = {lisp('(1 (2 3) "s")'): 'found'}
+    assert table[ConsList.from_iterable(
+        [1, ConsList.from_iterable([2, 3]), 's'])] == 'found'
+    assert len({ConsList(1).freeze(), SExpression(1).freeze(),
+                ConsList(1.0).freeze()}) == 1
+    assert hash(NIL) == hash(NIL) and NIL in {NIL}
+
+
+def test_unhashable_elements():
+    for lst in (ConsList(Vector()), ConsList(ConsCell(1, 2))):
+        with pytest.raises(TypeError):
+            hash(lst.freeze())
+    with pytest.raises(TypeError):
+        hash(ConsCell(1, 2))
+
+
+def test_only_frozen_lists_hashable():
+    for lst in (ConsList(1), ConsList.from_iterable([ConsList(1)])):
+        with pytest.raises(TypeError, match='unfrozen'):
+            hash(lst)
+        # and they were not locked
+        lst.car = 2
+
+
+def test_hashed_lists_locked():
+    lst = ConsList.from_iterable([1, ConsList.from_iterable([2, 3]), 4])
+    table = {lst: 'found'}
+    for cell, name in ((lst, 'car'), (lst.cdr.cdr, 'cdr'),
+                       (lst.cdr.car.cdr, 'car')):
+        with pytest.raises(TypeError):
+            setattr(cell, name, 5)
+    assert table[lst] == 'found'
+    assert list(table) == [ConsList.from_iterable(
+        [1, ConsList.from_iterable([2, 3]), 4])]
+    # lists which are not hashed can still change
+    other = ConsList.from_iterable([1, 2])
+    other.car = 5
+    assert hash(other) == hash(ConsList.from_iterable([5, 2]))
+
+
+def test_stale_frozen_list_hashed():
+    lst = ConsList.from_iterable([1, 2])
+    lst.cdr = ConsList(3)
+    assert hash(lst) == hash(ConsList.from_iterable([1, 3]))
+    assert len(lst) == 2
+
+
+def test_elements_compared_even_if_same():
+    nan = float('nan')
+    for x in (ConsCell(1, nan), ConsList.from_iterable([1, ConsList(nan)])):
+        assert x != x
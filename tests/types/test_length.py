@@ -0,0 +1,37 @@
+from slyther.types import ConsList, SExpression, NIL
+from slyther.parser import lisp
+from slyther.builtins import list_
+
+
+def test_built_lists_are_frozen():
+    for lst in (ConsList.from_iterable(range(5)), list_(*range(5)),
+                lisp('(0 1 2 3 4)')):
+        assert lst._len == 5
+        assert lst.cdr.cdr._len == 3
+        assert len(lst) == 5
+
+
+def test_cdr_assignment_invalidates():
+    lst = lisp('(1 2 (3 4 5) 6)')
+    other = ConsList.from_iterable(range(3))
+    inner = lst.cdr.cdr.car
+    inner.cdr = NIL
+    assert len(inner) == 1
+    assert len(lst) == 4
+    lst.cdr.cdr.cdr = SExpression(7, SExpression(8))
+    assert len(lst) == 5
+    assert len(lst.cdr) == 4
+    assert len(other) == 3
+
+
+def test_car_assignment_keeps_length():
+    lst = ConsList.from_iterable(range(3))
+    lst.car = ConsList.from_iterable(range(10))
+    assert len(lst) == 3
+
+
+def test_unfrozen_tail_of_frozen_list():
+    tail = ConsList(2)
+    lst = ConsList(1, tail).freeze()
+    tail.cdr = ConsList(3)
+    assert len(lst) == 3
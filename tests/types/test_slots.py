@@ -0,0 +1,21 @@
+import pytest
+from slyther.types import (ConsCell, ConsList, SExpression, Quoted,
+                           Variable, NIL, NilType)
+
+
+@pytest.mark.parametrize('obj', [
+    ConsCell(1, 2),
+    ConsList(1, NIL),
+    SExpression(1, NIL),
+    Quoted(1),
+    Variable(1),
+    NIL,
+])
+def test_no_instance_dict(obj):
+    assert not hasattr(obj, '__dict__')
+
+
+def test_nil_singleton():
+    assert NilType() is NIL
+    assert len(NIL) == 0
+    assert list(ConsList.from_iterable([1, 2])) == [1, 2]
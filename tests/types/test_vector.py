@@ -0,0 +1,40 @@
+import pytest
+from hypothesis import given
+import hypothesis.strategies as st
+from slyther.types import Vector
+from slyther.parser import lisp, lex, VectorParen, RParen
+
+
+@given(st.lists(st.one_of(st.integers(), st.floats(allow_nan=False),
+                          st.text())))
+def test_roundtrip(lst):
+    vec = Vector(lst)
+    assert list(vec) == lst
+    assert len(vec) == len(lst)
+
+
+def test_homogeneous_storage():
+    assert Vector([1, 2]).items.typecode == 'q'
+    assert Vector([1.0, 2.0]).items.typecode == 'd'
+    assert isinstance(Vector([1, 2.0]).items, list)
+    assert isinstance(Vector([2 ** 70]).items, list)
+
+
+def test_set_keeps_type():
+    vec = Vector([1, 2])
+    vec[0] = 2.0
+    assert vec[0] == 2.0 and type(vec[0]) is float
+    vec = Vector([1, 2])
+    vec[1] = 2 ** 70
+    assert vec[1] == 2 ** 70
+    vec = Vector([1, 2])
+    vec[1] = 5
+    assert vec.items.typecode == 'q'
+
+
+def test_literal():
+    assert list(lex('#(1)')) == [VectorParen(), 1, RParen()]
+    assert lisp('#(1 2 3)') == Vector([1, 2, 3])
+    assert lisp("'#()").elem == Vector()
+    with pytest.raises(SyntaxError):
+        lisp('#(1 2')